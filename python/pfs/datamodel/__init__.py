@@ -9,3 +9,13 @@ from .identity import *
 from .drp import *
 from .fluxTable import *
 from .utils import *
+from .parallel import *
+from .covariance import *
+from .wavelengthPolynomial import *
+from .interpolate import *
+from .coadd import *
+from .archive import *
+from .catalog import *
+from .metadata import *
+from .skyIndex import *
+from .pfsConfigSeries import *
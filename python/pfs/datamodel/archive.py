@@ -0,0 +1,477 @@
+import glob
+import io
+import os
+import socket
+import sqlite3
+import uuid
+
+from .utils import calculatePfsVisitHash
+
+__all__ = ("SpectrumArchive",)
+
+
+def _toSigned(value):
+    """Convert an unsigned 64-bit integer to signed, for storage in SQLite"""
+    value = int(value)
+    return value - 2**64 if value >= 2**63 else value
+
+
+def _toUnsigned(value):
+    """Convert a signed 64-bit integer from SQLite to unsigned"""
+    return value + 2**64 if value < 0 else value
+
+
+class SpectrumArchive:
+    """Appendable archive of many spectra of individual objects
+
+    Spectra of the `pfs.datamodel.PfsSimpleSpectrum` family (e.g.,
+    `pfs.datamodel.PfsSingle`, `pfs.datamodel.PfsObject`) are packed into
+    large chunk files instead of a file per spectrum, with an SQLite index
+    keyed by the target identity (``catId``, ``tract``, ``patch``,
+    ``objId``) and the hash of the contributing visits (``pfsVisitHash``).
+
+    Each spectrum is stored as the bytes of the FITS file that its
+    ``writeFits`` method would produce, so conversion to and from the usual
+    per-object products is lossless; files may be added verbatim with
+    ``appendFile`` and extracted verbatim with ``extract``.
+
+    Multiple processes may append to the same archive at once: each instance
+    writes its own chunk files (named by host, process and a random
+    identifier), and the index is updated in SQLite transactions. Instances
+    should not be shared between processes; pickling an instance produces a
+    new instance for the same archive.
+
+    Replacing spectra leaves their old data in the chunk files; the space may
+    be reclaimed with ``compact``.
+
+    Parameters
+    ----------
+    dirName : `str`
+        Directory containing the archive; created if it doesn't exist.
+    chunkSize : `int`, optional
+        Approximate maximum size (bytes) of each chunk file.
+    """
+    indexFilename = "index.sqlite"  # Filename for the index, within the archive directory
+    chunkFormat = "chunk-%(host)s-%(pid)d-%(unique)s.dat"  # Format for chunk filenames
+    chunkPattern = "chunk-*.dat"  # Glob pattern matching chunk filenames
+    keyColumns = ("catId", "tract", "patch", "objId", "pfsVisitHash")  # Columns identifying a spectrum
+
+    def __init__(self, dirName, chunkSize=2**30):
+        self.dirName = dirName
+        self.chunkSize = chunkSize
+        os.makedirs(dirName, exist_ok=True)
+        self._connection = sqlite3.connect(os.path.join(dirName, self.indexFilename), timeout=60.0)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS spectra ("
+                "catId INTEGER NOT NULL, tract INTEGER NOT NULL, patch TEXT NOT NULL, "
+                "objId INTEGER NOT NULL, pfsVisitHash INTEGER NOT NULL, className TEXT NOT NULL, "
+                "nVisit INTEGER NOT NULL, visit INTEGER NOT NULL, "
+                "chunk TEXT NOT NULL, offset INTEGER NOT NULL, size INTEGER NOT NULL, "
+                "PRIMARY KEY (catId, tract, patch, objId, pfsVisitHash, className)) WITHOUT ROWID"
+            )
+        self._writer = None  # Chunk file being written
+        self._readers = {}  # Chunk files open for reading, indexed by name
+
+    def __reduce__(self):
+        """How to pickle"""
+        return type(self), (self.dirName, self.chunkSize)
+
+    def close(self):
+        """Close all files"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        for fd in self._readers.values():
+            fd.close()
+        self._readers = {}
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self):
+        """Context manager entry"""
+        return self
+
+    def __exit__(self, *args):
+        """Context manager exit: close all files"""
+        self.close()
+        return False
+
+    def __len__(self):
+        """Number of spectra in the archive"""
+        return self._connection.execute("SELECT COUNT(*) FROM spectra").fetchone()[0]
+
+    def __contains__(self, identity):
+        """Is a spectrum with this identity in the archive?"""
+        return len(self._lookup(identity)) > 0
+
+    @staticmethod
+    def _getKey(spectrum):
+        """Determine the index columns for a spectrum
+
+        Parameters
+        ----------
+        spectrum : `pfs.datamodel.PfsSimpleSpectrum`
+            Spectrum of interest.
+
+        Returns
+        -------
+        key : `dict` (`str`: POD)
+            Values for the index columns (excluding the location).
+        """
+        target = spectrum.target
+        observations = getattr(spectrum, "observations", None)
+        if observations is not None and len(observations) > 0:
+            pfsVisitHash = observations.calculateVisitHash()
+            visits = set(observations.visit)
+            nVisit = len(visits)
+            visit = int(visits.pop()) if nVisit == 1 else -1
+        else:
+            pfsVisitHash = 0
+            nVisit = 0
+            visit = -1
+        return dict(catId=int(target.catId), tract=int(target.tract), patch=str(target.patch),
+                    objId=_toSigned(target.objId), pfsVisitHash=_toSigned(pfsVisitHash),
+                    className=type(spectrum).__name__, nVisit=nVisit, visit=visit)
+
+    def _lookup(self, identity, className=None):
+        """Find spectra matching an identity
+
+        Parameters
+        ----------
+        identity : `dict` (`str`: POD)
+            Keyword-value pairs identifying the spectrum: ``catId``,
+            ``tract``, ``patch``, ``objId``, and optionally either of
+            ``pfsVisitHash`` or ``visit`` (for a single visit).
+        className : `str`, optional
+            Name of the spectrum class.
+
+        Returns
+        -------
+        rows : `list` of `tuple`
+            Class name, chunk filename, offset and size for each match.
+        """
+        conditions = ["catId = ?", "tract = ?", "patch = ?", "objId = ?"]
+        values = [int(identity["catId"]), int(identity["tract"]), str(identity["patch"]),
+                  _toSigned(identity["objId"])]
+        if "pfsVisitHash" in identity:
+            conditions.append("pfsVisitHash = ?")
+            values.append(_toSigned(identity["pfsVisitHash"]))
+        elif "visit" in identity:
+            conditions.append("pfsVisitHash = ?")
+            values.append(_toSigned(calculatePfsVisitHash([identity["visit"]])))
+        if className is not None:
+            conditions.append("className = ?")
+            values.append(className)
+        query = "SELECT className, chunk, offset, size FROM spectra WHERE " + " AND ".join(conditions)
+        return self._connection.execute(query, values).fetchall()
+
+    def _writeBytes(self, data):
+        """Write data to the current chunk file
+
+        Parameters
+        ----------
+        data : `bytes`
+            Data to write.
+
+        Returns
+        -------
+        chunk : `str`
+            Filename of the chunk (without directory).
+        offset : `int`
+            Offset of the data within the chunk.
+        """
+        if self._writer is not None and self._writer.tell() + len(data) > self.chunkSize:
+            self._writer.close()
+            self._writer = None
+        if self._writer is None:
+            chunk = self.chunkFormat % dict(host=socket.gethostname(), pid=os.getpid(),
+                                            unique=uuid.uuid4().hex[:12])
+            self._writer = open(os.path.join(self.dirName, chunk), "ab")
+        offset = self._writer.tell()
+        self._writer.write(data)
+        return os.path.basename(self._writer.name), offset
+
+    def _readBytes(self, chunk, offset, size):
+        """Read data from a chunk file
+
+        Parameters
+        ----------
+        chunk : `str`
+            Filename of the chunk (without directory).
+        offset : `int`
+            Offset of the data within the chunk.
+        size : `int`
+            Size of the data.
+
+        Returns
+        -------
+        data : `bytes`
+            Data read.
+        """
+        if self._writer is not None and os.path.basename(self._writer.name) == chunk:
+            self._writer.flush()
+        if chunk not in self._readers:
+            self._readers[chunk] = open(os.path.join(self.dirName, chunk), "rb")
+        fd = self._readers[chunk]
+        fd.seek(offset)
+        return fd.read(size)
+
+    def _insert(self, entries, overwrite=False):
+        """Write data and add them to the index
+
+        Parameters
+        ----------
+        entries : iterable of (`dict`, `bytes`)
+            Index columns and data for each spectrum.
+        overwrite : `bool`, optional
+            Replace existing entries with the same identity? Otherwise, an
+            existing entry (or a duplicate within ``entries``) raises
+            `RuntimeError`, and none of the entries are added to the index.
+        """
+        rows = []
+        try:
+            for key, data in entries:
+                if not overwrite and self._lookup(key, key["className"]):
+                    raise RuntimeError("Spectrum is already in archive: %s" % (key,))
+                chunk, offset = self._writeBytes(data)
+                rows.append(dict(key, chunk=chunk, offset=offset, size=len(data)))
+            if not rows:
+                return
+            self._writer.flush()
+            columns = list(rows[0].keys())
+            statement = "%s INTO spectra (%s) VALUES (%s)" % (
+                "INSERT OR REPLACE" if overwrite else "INSERT",
+                ", ".join(columns), ", ".join(":" + cc for cc in columns))
+            try:
+                with self._connection:
+                    self._connection.executemany(statement, rows)
+            except sqlite3.IntegrityError as exc:
+                # The primary key catches duplicates within the batch, and those added by other writers
+                raise RuntimeError("Spectrum is already in archive: %s" % (exc,)) from exc
+        except Exception:
+            self._discard(rows)
+            raise
+
+    def _discard(self, rows):
+        """Remove data that was written to the chunk files but not indexed
+
+        Only this instance writes to its chunk files, so the chunks can be
+        truncated to where the data starts.
+
+        Parameters
+        ----------
+        rows : iterable of `dict`
+            Index columns for the data, including the location.
+        """
+        starts = {}
+        for row in rows:
+            starts[row["chunk"]] = min(row["offset"], starts.get(row["chunk"], row["offset"]))
+        for chunk, offset in starts.items():
+            if self._writer is not None and os.path.basename(self._writer.name) == chunk:
+                self._writer.truncate(offset)
+                self._writer.seek(0, io.SEEK_END)
+            else:
+                os.truncate(os.path.join(self.dirName, chunk), offset)
+
+    def compact(self):
+        """Reclaim unused space in the chunk files
+
+        Spectra that have been replaced (with ``overwrite=True``), and data
+        from writers that were interrupted, leave unused bytes in the chunk
+        files. The spectra in any chunk file with unused bytes are copied to
+        new chunk files, and the old chunk file is deleted.
+
+        This must not be run while other processes are using the archive.
+
+        Returns
+        -------
+        reclaimed : `int`
+            Number of bytes reclaimed.
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        used = dict(self._connection.execute("SELECT chunk, SUM(size) FROM spectra GROUP BY chunk"))
+        unused = {}
+        for filename in glob.glob(os.path.join(self.dirName, self.chunkPattern)):
+            chunk = os.path.basename(filename)
+            size = os.path.getsize(filename)
+            if size > used.get(chunk, 0):
+                unused[chunk] = size - used.get(chunk, 0)
+
+        updates = []
+        query = "SELECT offset, size FROM spectra WHERE chunk = ? ORDER BY offset"
+        for chunk in sorted(unused):
+            for offset, size in self._connection.execute(query, (chunk,)).fetchall():
+                newChunk, newOffset = self._writeBytes(self._readBytes(chunk, offset, size))
+                updates.append((newChunk, newOffset, chunk, offset))
+        if self._writer is not None:
+            self._writer.flush()
+        statement = "UPDATE spectra SET chunk = ?, offset = ? WHERE chunk = ? AND offset = ?"
+        with self._connection:
+            self._connection.executemany(statement, updates)
+        for chunk in unused:
+            reader = self._readers.pop(chunk, None)
+            if reader is not None:
+                reader.close()
+            os.remove(os.path.join(self.dirName, chunk))
+        return sum(unused.values())
+
+    def append(self, spectrum, overwrite=False):
+        """Add a spectrum to the archive
+
+        Parameters
+        ----------
+        spectrum : `pfs.datamodel.PfsSimpleSpectrum`
+            Spectrum to add.
+        overwrite : `bool`, optional
+            Replace an existing spectrum with the same identity?
+        """
+        self.appendMany([spectrum], overwrite=overwrite)
+
+    def appendMany(self, spectra, overwrite=False):
+        """Add many spectra to the archive
+
+        The index is updated in a single transaction.
+
+        Parameters
+        ----------
+        spectra : iterable of `pfs.datamodel.PfsSimpleSpectrum`
+            Spectra to add.
+        overwrite : `bool`, optional
+            Replace existing spectra with the same identity?
+        """
+        def generate():
+            """Generate index columns and data for each spectrum"""
+            for spectrum in spectra:
+                buffer = io.BytesIO()
+                spectrum._makeHduList().writeto(buffer)
+                yield self._getKey(spectrum), buffer.getvalue()
+
+        self._insert(generate(), overwrite=overwrite)
+
+    def appendFile(self, filename, FiberArrayClass, overwrite=False):
+        """Add a spectrum file to the archive, verbatim
+
+        Parameters
+        ----------
+        filename : `str`
+            Filename of spectrum.
+        FiberArrayClass : `type`
+            Class of the spectrum (e.g., `pfs.datamodel.PfsObject`).
+        overwrite : `bool`, optional
+            Replace an existing spectrum with the same identity?
+        """
+        with open(filename, "rb") as fd:
+            data = fd.read()
+        spectrum = FiberArrayClass.readFits(io.BytesIO(data))
+        self._insert([(self._getKey(spectrum), data)], overwrite=overwrite)
+
+    def _getData(self, identity, FiberArrayClass=None):
+        """Retrieve the data for a spectrum
+
+        Parameters
+        ----------
+        identity : `dict` (`str`: POD)
+            Keyword-value pairs identifying the spectrum: ``catId``,
+            ``tract``, ``patch``, ``objId``, and optionally either of
+            ``pfsVisitHash`` or ``visit`` (for a single visit).
+        FiberArrayClass : `type`, optional
+            Class of the spectrum, in case the identity is ambiguous.
+
+        Returns
+        -------
+        className : `str`
+            Name of the spectrum class.
+        data : `bytes`
+            FITS file contents.
+
+        Raises
+        ------
+        RuntimeError
+            If there isn't exactly one spectrum matching the identity.
+        """
+        className = FiberArrayClass.__name__ if FiberArrayClass is not None else None
+        rows = self._lookup(identity, className)
+        if len(rows) != 1:
+            raise RuntimeError("Number of spectra matching %s is not unity (%d)" % (identity, len(rows)))
+        className, chunk, offset, size = rows[0]
+        return className, self._readBytes(chunk, offset, size)
+
+    def read(self, identity, FiberArrayClass=None):
+        """Read a spectrum from the archive
+
+        Parameters
+        ----------
+        identity : `dict` (`str`: POD)
+            Keyword-value pairs identifying the spectrum: ``catId``,
+            ``tract``, ``patch``, ``objId``, and optionally either of
+            ``pfsVisitHash`` or ``visit`` (for a single visit).
+        FiberArrayClass : `type`, optional
+            Class of the spectrum. Defaults to the class of the spectrum when
+            it was archived, found in `pfs.datamodel.drp`.
+
+        Returns
+        -------
+        spectrum : `pfs.datamodel.PfsSimpleSpectrum`
+            Spectrum read from the archive.
+        """
+        className, data = self._getData(identity, FiberArrayClass)
+        if FiberArrayClass is None:
+            from . import drp
+            FiberArrayClass = getattr(drp, className)
+        return FiberArrayClass.readFits(io.BytesIO(data))
+
+    def extract(self, identity, filename, FiberArrayClass=None):
+        """Write a spectrum from the archive to a file, verbatim
+
+        Parameters
+        ----------
+        identity : `dict` (`str`: POD)
+            Keyword-value pairs identifying the spectrum: ``catId``,
+            ``tract``, ``patch``, ``objId``, and optionally either of
+            ``pfsVisitHash`` or ``visit`` (for a single visit).
+        filename : `str`
+            Filename to which to write.
+        FiberArrayClass : `type`, optional
+            Class of the spectrum, in case the identity is ambiguous.
+        """
+        _, data = self._getData(identity, FiberArrayClass)
+        with open(filename, "wb") as fd:
+            fd.write(data)
+
+    def query(self, **kwargs):
+        """List the spectra in the archive
+
+        Parameters
+        ----------
+        **kwargs
+            Values of ``catId``, ``tract``, ``patch``, ``objId``,
+            ``pfsVisitHash``, ``className``, ``nVisit`` or ``visit`` to
+            select.
+
+        Returns
+        -------
+        identities : `list` of `dict`
+            Identities of matching spectra, including the ``className``.
+        """
+        columns = self.keyColumns + ("className", "nVisit", "visit")
+        unknown = set(kwargs) - set(columns)
+        if unknown:
+            raise RuntimeError("Unrecognised columns: %s" % (sorted(unknown),))
+        values = {key: _toSigned(value) if key in ("objId", "pfsVisitHash") else value for
+                  key, value in kwargs.items()}
+        query = "SELECT %s FROM spectra" % (", ".join(columns),)
+        if values:
+            query += " WHERE " + " AND ".join("%s = :%s" % (key, key) for key in values)
+        identities = []
+        for row in self._connection.execute(query, values):
+            identity = dict(zip(columns, row))
+            identity["objId"] = _toUnsigned(identity["objId"])
+            identity["pfsVisitHash"] = _toUnsigned(identity["pfsVisitHash"])
+            if identity["visit"] < 0:
+                del identity["visit"]
+            identities.append(identity)
+        return identities
@@ -0,0 +1,296 @@
+import os
+import re
+import time
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from .archive import _toSigned, _toUnsigned
+
+__all__ = ("DataCatalog",)
+
+
+def _getConverters(filenameFormat, names=None):
+    """Determine how to convert the values parsed from a filename
+
+    The conversions are determined from the formatting directives in the
+    filename format, since values formatted as hex (e.g., ``objId``) can't be
+    converted with the types in the ``filenameKeys`` class attributes.
+
+    Parameters
+    ----------
+    filenameFormat : `str`
+        Format for the filename, e.g., ``pfsArm-%(visit)06d-...``.
+    names : iterable of `str`, optional
+        Names of the values, for a format with positional directives.
+
+    Returns
+    -------
+    converters : `list` of (`str`, callable)
+        Name and conversion function for each value.
+    """
+    directives = re.findall(r"%(?:\((\w+)\))?\d*([dsx])", filenameFormat)
+    if names is None:
+        names = [name for name, _ in directives]
+    convert = dict(d=int, s=str, x=lambda value: int(value, 16))
+    return [(name, convert[code]) for name, (_, code) in zip(names, directives)]
+
+
+def _getProducts():
+    """Return the data products recognised by the catalog
+
+    Returns
+    -------
+    products : `dict` (`str`: (`re.Pattern`, `list` of (`str`, callable)))
+        Filename regex and value conversions, indexed by product name (which
+        is also the filename prefix).
+    """
+    from . import drp
+    from .pfsConfig import PfsDesign, PfsConfig
+    products = {}
+    for cls in (drp.PfsArm, drp.PfsMerged, drp.PfsReference, drp.PfsSingle, drp.PfsObject):
+        name = cls.__name__[0].lower() + cls.__name__[1:]
+        products[name] = (re.compile(cls.filenameRegex), _getConverters(cls.filenameFormat))
+    products["pfsDesign"] = (re.compile(PfsDesign.fileNameRegex),
+                             _getConverters(PfsDesign.fileNameFormat, ["pfsDesignId"]))
+    products["pfsConfig"] = (re.compile(PfsConfig.fileNameRegex),
+                             _getConverters(PfsConfig.fileNameFormat, ["pfsDesignId", "visit0"]))
+    return products
+
+
+class DataCatalog:
+    """Persistent index of the data products in a directory tree
+
+    The directory tree is scanned (in parallel) for files whose names match
+    the filename patterns of the data products (``pfsArm``, ``pfsMerged``,
+    ``pfsReference``, ``pfsSingle``, ``pfsObject``, ``pfsDesign`` and
+    ``pfsConfig``), and the identity of each (parsed from the filename) is
+    recorded in an SQLite database, so that products can be found by
+    identity without listing directories.
+
+    Rescans are incremental: a directory is only listed again if its
+    modification time has changed since the previous scan (adding, removing
+    or renaming a file changes the modification time of its directory).
+
+    Parameters
+    ----------
+    filename : `str`
+        Filename of the SQLite database; created if it doesn't exist.
+    """
+    columns = ("visit", "arm", "spectrograph", "catId", "tract", "patch", "objId", "nVisit",
+               "pfsVisitHash", "pfsDesignId", "visit0")  # Identity columns
+    unsigned = ("objId", "pfsVisitHash", "pfsDesignId")  # Columns holding unsigned 64-bit integers
+    mtimeSlop = 2*10**9  # Directories modified within this time (nsec) of a scan are rescanned next time
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._products = _getProducts()
+        self._connection = sqlite3.connect(filename, timeout=60.0)
+        columns = ", ".join("%s %s" % (col, "TEXT" if col in ("arm", "patch") else "INTEGER") for
+                            col in self.columns)
+        with self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS directories ("
+                                     "path TEXT PRIMARY KEY, parent TEXT, mtime INTEGER NOT NULL)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS directories_parent ON directories (parent)")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS products (path TEXT PRIMARY KEY, "
+                                     "directory TEXT NOT NULL, product TEXT NOT NULL, %s)" % (columns,))
+            self._connection.execute("CREATE INDEX IF NOT EXISTS products_directory ON products (directory)")
+            for col in ("visit", "objId", "pfsDesignId"):
+                self._connection.execute("CREATE INDEX IF NOT EXISTS products_%s ON products (product, %s)" %
+                                         (col, col))
+
+    def __reduce__(self):
+        """How to pickle"""
+        return type(self), (self.filename,)
+
+    def close(self):
+        """Close the database"""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self):
+        """Context manager entry"""
+        return self
+
+    def __exit__(self, *args):
+        """Context manager exit: close the database"""
+        self.close()
+        return False
+
+    def __len__(self):
+        """Number of products in the catalog"""
+        return self._connection.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    def parseFilename(self, filename):
+        """Determine the product and identity from a filename
+
+        Parameters
+        ----------
+        filename : `str`
+            Filename (the directory is ignored).
+
+        Returns
+        -------
+        product : `str` or `None`
+            Name of the product (e.g., ``pfsSingle``), or `None` if the
+            filename isn't recognised.
+        identity : `dict` (`str`: POD) or `None`
+            Keyword-value pairs identifying the product.
+        """
+        filename = os.path.basename(filename)
+        product = filename.split("-", 1)[0]
+        if product not in self._products:
+            return None, None
+        regex, converters = self._products[product]
+        matches = regex.search(filename)
+        if not matches:
+            return None, None
+        return product, {name: convert(value) for (name, convert), value in zip(converters, matches.groups())}
+
+    def _scanDirectory(self, dirName, knownMtime, start):
+        """Scan a single directory
+
+        Parameters
+        ----------
+        dirName : `str`
+            Directory to scan.
+        knownMtime : `int` or `None`
+            Modification time (nsec) of the directory when previously scanned.
+        start : `int`
+            Time (nsec) at which the scan started.
+
+        Returns
+        -------
+        dirName : `str`
+            Directory scanned.
+        mtime : `int`
+            Modification time (nsec) to record for the directory; ``-1`` if
+            the directory must be rescanned next time.
+        subdirs : `list` of `str`, or `None`
+            Subdirectories; `None` if the directory is unchanged.
+        rows : `list` of `dict`, or `None`
+            Product entries for the index; `None` if the directory is
+            unchanged.
+        """
+        try:
+            mtime = os.stat(dirName).st_mtime_ns
+        except FileNotFoundError:
+            return dirName, None, [], []
+        if mtime == knownMtime:
+            return dirName, mtime, None, None
+        subdirs = []
+        rows = []
+        with os.scandir(dirName) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):  # Don't follow links, which may form loops
+                    subdirs.append(entry.path)
+                    continue
+                product, identity = self.parseFilename(entry.name)
+                if product is None:
+                    continue
+                row = dict.fromkeys(self.columns)
+                row.update({key: _toSigned(value) if key in self.unsigned else value for
+                            key, value in identity.items()})
+                row.update(path=entry.path, directory=dirName, product=product)
+                rows.append(row)
+        if mtime > start - self.mtimeSlop:
+            mtime = -1  # Directory may be modified again within the resolution of the timestamp
+        return dirName, mtime, subdirs, rows
+
+    def scan(self, root, workers=None):
+        """Scan a directory tree, updating the catalog
+
+        Symbolic links to directories are not followed.
+
+        Parameters
+        ----------
+        root : `str`
+            Root of the directory tree.
+        workers : `int`, optional
+            Number of threads to use for scanning directories. Defaults to a
+            small multiple of the number of CPUs.
+
+        Returns
+        -------
+        numScanned : `int`
+            Number of directories that were listed (i.e., new or modified).
+        """
+        root = os.path.abspath(root)
+        start = time.time_ns()
+        known = {}
+        children = {}
+        prefix = os.path.join(root, "")
+        query = "SELECT path, parent, mtime FROM directories WHERE path = ? OR substr(path, 1, ?) = ?"
+        for path, parent, mtime in self._connection.execute(query, (root, len(prefix), prefix)):
+            known[path] = mtime
+            children.setdefault(parent, []).append(path)
+
+        seen = set()
+        updates = []
+        pending = [root]
+        with ThreadPoolExecutor(workers) as executor:
+            while pending:
+                results = list(executor.map(self._scanDirectory, pending, [known.get(dd) for dd in pending],
+                                            [start]*len(pending)))
+                pending = []
+                for dirName, mtime, subdirs, rows in results:
+                    if mtime is None:
+                        continue  # Directory has disappeared
+                    seen.add(dirName)
+                    if subdirs is None:
+                        pending.extend(children.get(dirName, []))
+                        continue
+                    pending.extend(subdirs)
+                    updates.append((dirName, mtime, rows))
+
+        removed = [dd for dd in known if dd not in seen]
+        columns = ("path", "directory", "product") + self.columns
+        insert = "INSERT OR REPLACE INTO products (%s) VALUES (%s)" % (
+            ", ".join(columns), ", ".join(":" + cc for cc in columns))
+        with self._connection:
+            for dirName in removed:
+                self._connection.execute("DELETE FROM products WHERE directory = ?", (dirName,))
+                self._connection.execute("DELETE FROM directories WHERE path = ?", (dirName,))
+            for dirName, mtime, rows in updates:
+                self._connection.execute("DELETE FROM products WHERE directory = ?", (dirName,))
+                self._connection.executemany(insert, rows)
+                parent = os.path.dirname(dirName) if dirName != root else None
+                self._connection.execute("INSERT OR REPLACE INTO directories (path, parent, mtime) "
+                                         "VALUES (?, ?, ?)", (dirName, parent, mtime))
+        return len(updates)
+
+    def find(self, product=None, **kwargs):
+        """Find products in the catalog
+
+        Parameters
+        ----------
+        product : `str`, optional
+            Name of product (e.g., ``pfsSingle``).
+        **kwargs
+            Values of identity columns (e.g., ``objId``, ``visit``) to select.
+
+        Returns
+        -------
+        results : `list` of `dict`
+            For each product found, the ``path``, ``product`` name and
+            identity (keyword-value pairs).
+        """
+        unknown = set(kwargs) - set(self.columns)
+        if unknown:
+            raise RuntimeError("Unrecognised identity columns: %s" % (sorted(unknown),))
+        values = {key: _toSigned(value) if key in self.unsigned else value for key, value in kwargs.items()}
+        if product is not None:
+            values["product"] = product
+        columns = ("path", "product") + self.columns
+        query = "SELECT %s FROM products" % (", ".join(columns),)
+        if values:
+            query += " WHERE " + " AND ".join("%s = :%s" % (key, key) for key in values)
+        query += " ORDER BY path"
+        results = []
+        for row in self._connection.execute(query, values):
+            result = {key: value for key, value in zip(columns, row) if value is not None}
+            for key in self.unsigned:
+                if key in result:
+                    result[key] = _toUnsigned(result[key])
+            results.append(result)
+        return results
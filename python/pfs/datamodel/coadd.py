@@ -0,0 +1,310 @@
+import numpy as np
+
+from .utils import astropyHeaderFromDict, astropyHeaderToDict, createImageHDU
+from .masks import MaskHelper
+from .target import Target
+from .observations import Observations
+from .wavelengthArray import WavelengthArray
+from .interpolate import calculateInterpolation, _interpolateFlux, _interpolateMask, _interpolateCovariance
+
+__all__ = ("CoaddAccumulator",)
+
+
+class CoaddAccumulator:
+    """Streaming accumulator for coadding spectra of a single target
+
+    Spectra (e.g., `pfs.datamodel.PfsSingle`) are added one at a time, and
+    only running sums are retained: the inverse-variance weighted sums of the
+    flux and sky, the sum of weights, the weighted sums of the covariance
+    bands, and the bitwise OR (over good pixels) and AND (over all pixels) of
+    the masks. The coadd (e.g., a `pfs.datamodel.PfsObject`) may be produced
+    at any time, and the state may be persisted so that a coadd can be updated
+    with a new visit without reading the previous inputs.
+
+    The coadd flux is the inverse-variance weighted mean of the inputs, and
+    the covariance is propagated from the covariance bands of the inputs.
+    Inputs with a different wavelength sampling are resampled (with linear
+    interpolation) onto the wavelength array of the accumulator.
+
+    Parameters
+    ----------
+    target : `pfs.datamodel.Target`
+        Target of the coadd.
+    wavelength : `numpy.ndarray` of `float`
+        Wavelength array of the coadd (e.g., a
+        `pfs.datamodel.WavelengthArray`).
+    flags : `pfs.datamodel.MaskHelper`
+        Helper for dealing with symbolic names for mask values.
+    badMask : iterable of `str`, optional
+        Mask planes for which pixels are excluded from the coadd.
+    metadata : `dict` (`str`: POD), optional
+        Keyword-value pairs for the header.
+    """
+    noData = "NO_DATA"  # Mask plane for pixels without good data
+    numBands = 3  # Number of covariance bands
+
+    def __init__(self, target, wavelength, flags, badMask=("BAD", "SAT", "CR", "NO_DATA"), metadata=None):
+        self.target = target
+        self.wavelength = wavelength
+        self.flags = flags.copy()
+        self.flags.add(self.noData)
+        self.badMask = list(badMask)
+        self.metadata = metadata if metadata is not None else {}
+
+        length = len(wavelength)
+        self.fluxSum = np.zeros(length, dtype=float)
+        self.skySum = np.zeros(length, dtype=float)
+        self.weightSum = np.zeros(length, dtype=float)
+        self.covarSum = np.zeros((self.numBands, length), dtype=float)
+        self.maskOr = np.zeros(length, dtype=np.int32)
+        self.maskAnd = np.full(length, -1, dtype=np.int32)
+        self._observations = []
+
+    @classmethod
+    def fromSpectrum(cls, spectrum, badMask=("BAD", "SAT", "CR", "NO_DATA"), metadata=None):
+        """Construct an accumulator and add the first spectrum
+
+        The target, wavelength sampling and mask planes are taken from the
+        spectrum.
+
+        Parameters
+        ----------
+        spectrum : `pfs.datamodel.PfsFiberArray`
+            Spectrum to add.
+        badMask : iterable of `str`, optional
+            Mask planes for which pixels are excluded from the coadd.
+        metadata : `dict` (`str`: POD), optional
+            Keyword-value pairs for the header.
+
+        Returns
+        -------
+        self : `CoaddAccumulator`
+            Accumulator containing the spectrum.
+        """
+        self = cls(spectrum.target, spectrum.wavelength, spectrum.flags, badMask, metadata)
+        self.add(spectrum)
+        return self
+
+    def __len__(self):
+        """Number of observations accumulated"""
+        return sum(len(obs) for obs in self._observations)
+
+    def __repr__(self):
+        """Representation"""
+        return "%s(%s, %d observations)" % (self.__class__.__name__, self.target, len(self))
+
+    @property
+    def length(self):
+        """Number of pixels"""
+        return len(self.wavelength)
+
+    @property
+    def observations(self):
+        """Observations accumulated (`pfs.datamodel.Observations`)"""
+        if len(self._observations) != 1:
+            self._observations = [self._concatenateObservations(self._observations)]
+        return self._observations[0]
+
+    @staticmethod
+    def _concatenateObservations(observationsList):
+        """Concatenate a list of observations
+
+        Parameters
+        ----------
+        observationsList : iterable of `pfs.datamodel.Observations`
+            Observations to concatenate.
+
+        Returns
+        -------
+        observations : `pfs.datamodel.Observations`
+            Concatenated observations.
+        """
+        observationsList = list(observationsList)
+
+        def concatenate(attr, shape, dtype):
+            """Concatenate an array attribute"""
+            arrays = [getattr(obs, attr) for obs in observationsList]
+            if not arrays:
+                return np.zeros(shape, dtype=dtype)
+            return np.concatenate(arrays)
+
+        return Observations(
+            visit=concatenate("visit", 0, np.int32),
+            arm=[arm for obs in observationsList for arm in obs.arm],
+            spectrograph=concatenate("spectrograph", 0, np.int32),
+            pfsDesignId=concatenate("pfsDesignId", 0, np.int64),
+            fiberId=concatenate("fiberId", 0, np.int32),
+            pfiNominal=concatenate("pfiNominal", (0, 2), np.float32),
+            pfiCenter=concatenate("pfiCenter", (0, 2), np.float32),
+        )
+
+    def add(self, spectrum):
+        """Add a spectrum to the coadd
+
+        Parameters
+        ----------
+        spectrum : `pfs.datamodel.PfsFiberArray`
+            Spectrum to add (e.g., a `pfs.datamodel.PfsSingle`); it must be
+            of our target.
+
+        Raises
+        ------
+        RuntimeError
+            If the spectrum is of a different target, or an observation has
+            already been added, or the mask planes are inconsistent.
+        """
+        if spectrum.target.identity != self.target.identity:
+            raise RuntimeError("Target mismatch: %s vs %s" % (spectrum.target, self.target))
+        existing = set()
+        for obs in self._observations:
+            existing.update(zip(obs.visit, obs.arm, obs.spectrograph))
+        observations = spectrum.observations
+        duplicates = existing & set(zip(observations.visit, observations.arm, observations.spectrograph))
+        if duplicates:
+            raise RuntimeError("Observations have already been added: %s" % (sorted(duplicates),))
+        self.flags = MaskHelper.fromMerge([self.flags, spectrum.flags])
+
+        flux = spectrum.flux
+        sky = spectrum.sky
+        mask = spectrum.mask
+        covar = spectrum.covar
+        if len(spectrum.wavelength) != self.length or np.any(spectrum.wavelength != self.wavelength):
+            interpolation = calculateInterpolation(spectrum.wavelength, self.wavelength)
+            flux = _interpolateFlux(interpolation, flux)[0]
+            sky = _interpolateFlux(interpolation, sky)[0]
+            mask = _interpolateMask(interpolation, mask, self.flags[self.noData])[0]
+            covar = _interpolateCovariance(interpolation, covar[np.newaxis, :self.numBands])[0]
+
+        variance = covar[0]
+        good = np.isfinite(flux) & np.isfinite(variance) & (variance > 0)
+        badMask = [name for name in self.badMask if name in self.flags]
+        if badMask:
+            good &= (mask & self.flags.get(*badMask)) == 0
+        weight = np.zeros(self.length, dtype=float)
+        weight[good] = 1.0/variance[good]
+
+        self.fluxSum += np.where(good, flux, 0.0)*weight
+        self.skySum += np.where(good, sky, 0.0)*weight
+        self.weightSum += weight
+        for band in range(min(self.numBands, covar.shape[0])):
+            num = self.length - band
+            values = np.where(good[:num] & good[band:], covar[band, :num], 0.0)
+            self.covarSum[band, :num] += weight[:num]*weight[band:]*values
+
+        dtype = np.result_type(self.maskOr.dtype, mask.dtype)
+        self.maskOr = self.maskOr.astype(dtype, copy=False)
+        self.maskAnd = self.maskAnd.astype(dtype, copy=False)
+        self.maskOr |= np.where(good, mask, 0).astype(dtype)
+        self.maskAnd &= mask.astype(dtype)
+        self._observations.append(spectrum.observations)
+
+    def getCoadd(self, FiberArrayClass=None, metadata=None):
+        """Produce the coadd of the spectra added so far
+
+        Parameters
+        ----------
+        FiberArrayClass : `type`, optional
+            Subclass of `pfs.datamodel.PfsFiberArray` to produce. Defaults to
+            `pfs.datamodel.PfsObject`.
+        metadata : `dict` (`str`: POD), optional
+            Keyword-value pairs for the header; defaults to our ``metadata``.
+
+        Returns
+        -------
+        coadd : ``FiberArrayClass``
+            Coadded spectrum.
+        """
+        if FiberArrayClass is None:
+            from .drp import PfsObject
+            FiberArrayClass = PfsObject
+        good = self.weightSum > 0
+        weightSum = np.where(good, self.weightSum, 1.0)
+        flux = np.where(good, self.fluxSum/weightSum, 0.0)
+        sky = np.where(good, self.skySum/weightSum, 0.0)
+        covar = np.zeros((self.numBands, self.length), dtype=float)
+        for band in range(min(self.numBands, self.length)):
+            num = self.length - band
+            select = good[:num] & good[band:]
+            covar[band, :num] = np.where(select, self.covarSum[band, :num]/(weightSum[:num]*weightSum[band:]),
+                                         0.0)
+
+        noData = self.flags[self.noData]
+        if len(self) > 0:
+            mask = np.where(good, self.maskOr, self.maskAnd | noData)
+        else:
+            mask = np.full(self.length, noData, dtype=self.maskOr.dtype)
+
+        return FiberArrayClass(
+            self.target,
+            self.observations,
+            self.wavelength,
+            flux.astype(np.float32),
+            mask.astype(self.maskOr.dtype),
+            sky.astype(np.float32),
+            covar.astype(np.float32),
+            np.zeros((1, 1), dtype=np.float32),
+            self.flags.copy(),
+            dict(metadata if metadata is not None else self.metadata),
+        )
+
+    def writeFits(self, filename):
+        """Write the state of the accumulator to a FITS file
+
+        Parameters
+        ----------
+        filename : `str`
+            Filename of FITS file.
+        """
+        import astropy.io.fits
+        fits = astropy.io.fits.HDUList()
+        header = dict(self.metadata)
+        header.update(self.flags.toFitsHeader())
+        header["BADMASK"] = ",".join(self.badMask)
+        fits.append(astropy.io.fits.PrimaryHDU(header=astropyHeaderFromDict(header)))
+
+        wavelengthHeader = None
+        if isinstance(self.wavelength, WavelengthArray):
+            wavelengthHeader = self.wavelength.toFitsHeader()
+        fits.append(createImageHDU(np.asarray(self.wavelength), "WAVELENGTH", wavelengthHeader))
+        for attr in ("fluxSum", "skySum", "weightSum", "covarSum", "maskOr", "maskAnd"):
+            fits.append(createImageHDU(getattr(self, attr), attr.upper()))
+        self.target.toFits(fits)
+        self.observations.toFits(fits)
+        with open(filename, "wb") as fd:
+            fits.writeto(fd)
+
+    @classmethod
+    def readFits(cls, filename):
+        """Read the state of an accumulator from a FITS file
+
+        Parameters
+        ----------
+        filename : `str`
+            Filename of FITS file.
+
+        Returns
+        -------
+        self : `CoaddAccumulator`
+            Accumulator, ready for more spectra to be added.
+        """
+        import astropy.io.fits
+        with astropy.io.fits.open(filename) as fits:
+            metadata = astropyHeaderToDict(fits[0].header)
+            flags = MaskHelper.fromFitsHeader(metadata)
+            badMask = [name for name in metadata.pop("BADMASK").split(",") if name]
+            metadata = {key: value for key, value in metadata.items() if
+                        not key.startswith(MaskHelper.maskPlanePrefix) and
+                        key not in ("SIMPLE", "BITPIX", "NAXIS", "EXTEND")}
+
+            hdu = fits["WAVELENGTH"]
+            if "CTYPE1" in hdu.header:
+                wavelength = WavelengthArray.fromFitsHeader(hdu.header, len(hdu.data), hdu.data.dtype)
+            else:
+                wavelength = hdu.data
+
+            self = cls(Target.fromFits(fits), wavelength, flags, badMask, metadata)
+            for attr in ("fluxSum", "skySum", "weightSum", "covarSum", "maskOr", "maskAnd"):
+                data = fits[attr.upper()].data
+                setattr(self, attr, data.astype(data.dtype.newbyteorder("=")))
+            self._observations = [Observations.fromFits(fits)]
+        return self
@@ -0,0 +1,422 @@
+import numpy as np
+
+__all__ = ("BandedCovariance",)
+
+
+class BandedCovariance:
+    """Banded (near-diagonal) covariance matrix
+
+    This provides linear algebra operations on the near-diagonal part of a
+    covariance matrix as stored in the ``COVAR`` arrays of spectral products,
+    without materialising the full (dense) matrix. The layout is::
+
+        covar[..., 0, 0:]    Diagonal
+        covar[..., 1, 0:-1]  +-1 off diagonal
+        covar[..., 2, 0:-2]  +-2 off diagonal
+
+    i.e., ``covar[..., k, i]`` is the covariance between pixels ``i`` and
+    ``i + k``. Any leading dimensions (e.g., the fibers of a
+    `pfs.datamodel.PfsFiberArraySet`) are treated as a stack of independent
+    matrices, and all operations are vectorised over them.
+
+    Parameters
+    ----------
+    covar : `numpy.ndarray` of `float`, shape ``(..., numBands, length)``
+        Bands of the covariance matrix.
+    """
+    _chunkSize = 64  # Number of matrices to decompose at once
+
+    def __init__(self, covar):
+        self.covar = np.asarray(covar)
+        if self.covar.ndim < 2:
+            raise RuntimeError("Bad shape for covariance bands: %s" % (self.covar.shape,))
+        self.numBands = self.covar.shape[-2]
+        self.length = self.covar.shape[-1]
+        self._factors = None  # Cached decomposition
+
+    @property
+    def shape(self):
+        """Shape of the (dense) matrix, including any leading dimensions"""
+        return self.covar.shape[:-2] + (self.length, self.length)
+
+    @property
+    def variance(self):
+        """Diagonal of the matrix"""
+        return self.covar[..., 0, :]
+
+    def __len__(self):
+        """Number of pixels"""
+        return self.length
+
+    def __repr__(self):
+        """Representation"""
+        return "%s(shape=%s, numBands=%d)" % (self.__class__.__name__, self.shape, self.numBands)
+
+    def __getitem__(self, index):
+        """Select from the leading dimensions (e.g., fibers)"""
+        return type(self)(self.covar[index])
+
+    def element(self, row, col):
+        """Retrieve elements of the matrix
+
+        Parameters
+        ----------
+        row, col : array-like of `int`, shape ``(..., num)``
+            Row and column indices of the elements. These are broadcast
+            against each other and against any leading dimensions, so that
+            different elements may be retrieved for each matrix.
+
+        Returns
+        -------
+        values : `numpy.ndarray` of `float`, shape ``(..., num)``
+            Elements of the matrix; zero outside the bands.
+        """
+        row, col = np.broadcast_arrays(np.atleast_1d(row), np.atleast_1d(col))
+        band = np.abs(row - col)
+        first = np.minimum(row, col)
+        inside = (band < self.numBands) & (first >= 0) & (np.maximum(row, col) < self.length)
+        index = np.where(inside, band*self.length + first, 0)
+        leading = self.covar.shape[:-2]
+        flat = self.covar.reshape(leading + (-1,))
+        values = np.take_along_axis(flat, np.broadcast_to(index, leading + index.shape[-1:]), axis=-1)
+        return np.where(inside, values, 0.0)
+
+    def dot(self, vector):
+        """Matrix-vector product
+
+        Parameters
+        ----------
+        vector : `numpy.ndarray` of `float`, shape ``(..., length)``
+            Vector(s) to multiply.
+
+        Returns
+        -------
+        result : `numpy.ndarray` of `float`, shape ``(..., length)``
+            Product of the matrix and the vector(s).
+        """
+        vector = np.asarray(vector)
+        result = self.covar[..., 0, :]*vector
+        for kk in range(1, self.numBands):
+            band = self.covar[..., kk, :self.length - kk]
+            result[..., :-kk] += band*vector[..., kk:]
+            result[..., kk:] += band*vector[..., :-kk]
+        return result
+
+    def _factor(self):
+        """Calculate the decomposition of the matrix
+
+        The decomposition is cached. The matrices are decomposed (by block
+        cyclic reduction; see ``_reduce``) in chunks of ``_chunkSize``, which
+        keeps the working set small when there are many of them.
+
+        Returns
+        -------
+        factors : `list` of `tuple`
+            Decomposition of each chunk of matrices, from ``_reduce``.
+        """
+        if self._factors is not None:
+            return self._factors
+        covar = self.covar.reshape((-1, self.numBands, self.length))
+        self._factors = [_reduce(covar[start:start + self._chunkSize])
+                         for start in range(0, len(covar), self._chunkSize)]
+        return self._factors
+
+    def solve(self, vector):
+        """Solve the linear system ``C x = vector``
+
+        Parameters
+        ----------
+        vector : `numpy.ndarray` of `float`, shape ``(..., length)``
+            Right-hand side(s).
+
+        Returns
+        -------
+        solution : `numpy.ndarray` of `float`, shape ``(..., length)``
+            Solution(s).
+        """
+        factors = self._factor()
+        num = int(np.prod(self.covar.shape[:-2], dtype=int))
+        shape = np.broadcast_shapes(np.shape(vector), self.covar.shape[:-2] + (self.length,))
+        vector = np.broadcast_to(vector, shape).reshape((-1, num, self.length))
+        solution = np.empty(vector.shape, dtype=np.result_type(vector.dtype, self.covar.dtype, np.float64))
+        for start, (levels, top) in zip(range(0, num, self._chunkSize), factors):
+            stop = start + self._chunkSize
+            solution[:, start:stop] = _solveReduced(levels, top, vector[:, start:stop])
+        return solution.reshape(shape)
+
+    def chi2(self, residual):
+        """Calculate chi^2 for a residual vector
+
+        Parameters
+        ----------
+        residual : `numpy.ndarray` of `float`, shape ``(..., length)``
+            Residual vector(s).
+
+        Returns
+        -------
+        chi2 : `float` or `numpy.ndarray` of `float`
+            ``residual^T C^-1 residual`` for each residual.
+        """
+        return np.sum(residual*self.solve(residual), axis=-1)
+
+    def window(self, start, stop):
+        """Extract the covariance for a range of pixels
+
+        Parameters
+        ----------
+        start, stop : `int`
+            Range of pixels to extract (Python slice semantics).
+
+        Returns
+        -------
+        window : `BandedCovariance`
+            Covariance of the pixels in the range.
+        """
+        covar = self.covar[..., start:stop].copy()
+        length = covar.shape[-1]
+        for kk in range(1, self.numBands):
+            covar[..., kk, max(length - kk, 0):] = 0.0  # Partner pixel is outside the window
+        return type(self)(covar)
+
+    def toDense(self):
+        """Materialise the full matrix
+
+        Beware that this is expensive for long spectra: ``length**2`` elements
+        for each matrix.
+
+        Returns
+        -------
+        matrix : `numpy.ndarray` of `float`, shape ``(..., length, length)``
+            Full covariance matrix.
+        """
+        matrix = np.zeros(self.shape, dtype=self.covar.dtype)
+        index = np.arange(self.length)
+        matrix[..., index, index] = self.covar[..., 0, :]
+        for kk in range(1, self.numBands):
+            band = self.covar[..., kk, :self.length - kk]
+            matrix[..., index[kk:], index[:-kk]] = band
+            matrix[..., index[:-kk], index[kk:]] = band
+        return matrix
+
+    @classmethod
+    def fromDense(cls, matrix, numBands=3):
+        """Construct from a full matrix
+
+        Elements outside the bands are discarded.
+
+        Parameters
+        ----------
+        matrix : `numpy.ndarray` of `float`, shape ``(..., length, length)``
+            Full covariance matrix.
+        numBands : `int`, optional
+            Number of bands to retain (including the diagonal).
+
+        Returns
+        -------
+        self : `BandedCovariance`
+            Banded covariance.
+        """
+        matrix = np.asarray(matrix)
+        length = matrix.shape[-1]
+        covar = np.zeros(matrix.shape[:-2] + (numBands, length), dtype=matrix.dtype)
+        for kk in range(numBands):
+            covar[..., kk, :length - kk] = np.diagonal(matrix, offset=kk, axis1=-2, axis2=-1)
+        return cls(covar)
+
+
+def _transpose(matrix):
+    """Transpose a stack of small matrices
+
+    Parameters
+    ----------
+    matrix : `numpy.ndarray`, shape ``(rows, columns, ...)``
+        Stack of matrices, with the element indices first.
+
+    Returns
+    -------
+    transpose : `numpy.ndarray`, shape ``(columns, rows, ...)``
+        Stack of transposed matrices.
+    """
+    return np.swapaxes(matrix, 0, 1)
+
+
+def _multiply(left, right):
+    """Multiply stacks of small matrices
+
+    The element indices are first (rather than last, as for
+    `numpy.matmul`), so that numpy works on long contiguous vectors over the
+    stack rather than on many tiny matrices.
+
+    Parameters
+    ----------
+    left : `numpy.ndarray`, shape ``(rows, inner, ...)``
+        Stack of matrices on the left.
+    right : `numpy.ndarray`, shape ``(inner, columns, ...)``
+        Stack of matrices on the right; the stack dimensions are broadcast
+        against those of ``left``.
+
+    Returns
+    -------
+    product : `numpy.ndarray`, shape ``(rows, columns, ...)``
+        Stack of matrix products.
+    """
+    return np.einsum("ij...,jk...->ik...", left, right)
+
+
+def _invert(matrix):
+    """Invert a stack of small symmetric positive-definite matrices
+
+    This is Gauss-Jordan elimination (without pivoting, which is not required
+    for positive-definite matrices), vectorised over the stack.
+
+    Parameters
+    ----------
+    matrix : `numpy.ndarray`, shape ``(size, size, ...)``
+        Stack of matrices, with the element indices first.
+
+    Returns
+    -------
+    inverse : `numpy.ndarray`, shape ``(size, size, ...)``
+        Stack of inverse matrices.
+    """
+    size = len(matrix)
+    matrix = matrix.copy()
+    inverse = np.zeros_like(matrix)
+    inverse[np.arange(size), np.arange(size)] = 1.0
+    for kk in range(size):
+        scale = 1.0/matrix[kk, kk]
+        matrix[kk] *= scale
+        inverse[kk] *= scale
+        for ii in range(size):
+            if ii != kk:
+                factor = matrix[ii, kk].copy()
+                matrix[ii] -= factor*matrix[kk]
+                inverse[ii] -= factor*inverse[kk]
+    return inverse
+
+
+def _padBlocks(array, value=0.0):
+    """Pad a stack of blocks to an even number of blocks
+
+    Parameters
+    ----------
+    array : `numpy.ndarray`, shape ``(size, columns, numBlocks, ...)``
+        Stack of blocks, with the block index third.
+    value : `float`, optional
+        Value for the diagonal of the padding block (the off-diagonal
+        elements are zero).
+
+    Returns
+    -------
+    padded : `numpy.ndarray`, shape ``(size, columns, numPadded, ...)``
+        Stack of blocks, with an even number of blocks.
+    """
+    if array.shape[2] % 2 == 0:
+        return array
+    padding = np.zeros_like(array[:, :, :1])
+    if value != 0.0:
+        index = np.arange(len(array))
+        padding[index, index] = value
+    return np.concatenate((array, padding), axis=2)
+
+
+def _reduce(covar):
+    """Decompose banded matrices by block cyclic reduction
+
+    The pixels are grouped into blocks of the width of the band, so that each
+    matrix is block tridiagonal (padded to a whole number of blocks with the
+    identity). Each level of the reduction eliminates the odd blocks, halving
+    the size of the system, so there are only ``log2(numBlocks)`` sequential
+    steps, and each of them is vectorised over all the blocks of all the
+    matrices.
+
+    Parameters
+    ----------
+    covar : `numpy.ndarray` of `float`, shape ``(num, numBands, length)``
+        Bands of the matrices.
+
+    Returns
+    -------
+    levels : `list` of `tuple`
+        For each level of the reduction, the blocks below the diagonal
+        (``below[:, :, i]`` couples block ``i`` to block ``i - 1``) and the
+        inverses of the odd diagonal blocks, each with shape
+        ``(size, size, numBlocks, num)``.
+    top : `numpy.ndarray` of `float`, shape ``(size, size, 1, num)``
+        Inverse of the final, fully reduced, block.
+    """
+    num, numBands, length = covar.shape
+    size = max(numBands - 1, 1)
+    numBlocks = -(-length//size)
+    bands = np.zeros((numBands, numBlocks*size, num), dtype=np.result_type(covar.dtype, np.float64))
+    bands[0, length:] = 1.0
+    for kk in range(min(numBands, length)):
+        bands[kk, :length - kk] = covar[:, kk, :length - kk].T
+    bands = bands.reshape(numBands, numBlocks, size, num).transpose(0, 2, 1, 3)
+
+    diagonal = np.zeros((size, size, numBlocks, num), dtype=bands.dtype)
+    below = np.zeros_like(diagonal)
+    for kk in range(numBands):
+        for ii in range(kk, size):
+            diagonal[ii, ii - kk] = diagonal[ii - kk, ii] = bands[kk, ii - kk]
+        for ii in range(kk):  # Partner pixel is in the previous block
+            below[ii, size + ii - kk, 1:] = bands[kk, size + ii - kk, :-1]
+
+    levels = []
+    while diagonal.shape[2] > 1:
+        diagonal = _padBlocks(diagonal, 1.0)
+        below = _padBlocks(below)
+        left = below[:, :, 1::2]  # Odd blocks to the preceding even blocks
+        right = below[:, :, 2::2]  # Even blocks to the preceding odd blocks
+        inverse = _invert(diagonal[:, :, 1::2])
+        toLeft = _multiply(inverse, left)
+        toRight = _multiply(right, inverse[:, :, :-1])
+        diagonal = diagonal[:, :, 0::2] - _multiply(_transpose(left), toLeft)
+        diagonal[:, :, 1:] -= _multiply(toRight, _transpose(right))
+        levels.append((below, inverse))
+        below = np.zeros_like(diagonal)
+        below[:, :, 1:] = -_multiply(toRight, left[:, :, :-1])
+    return levels, _invert(diagonal)
+
+
+def _solveReduced(levels, top, vector):
+    """Solve linear systems decomposed by block cyclic reduction
+
+    Parameters
+    ----------
+    levels : `list` of `tuple`
+        Levels of the reduction, from ``_reduce``.
+    top : `numpy.ndarray` of `float`, shape ``(size, size, 1, num)``
+        Inverse of the final block, from ``_reduce``.
+    vector : `numpy.ndarray` of `float`, shape ``(extra, num, length)``
+        Right-hand sides.
+
+    Returns
+    -------
+    solution : `numpy.ndarray` of `float`, shape ``(extra, num, length)``
+        Solutions.
+    """
+    extra, num, length = vector.shape
+    size = len(top)
+    numBlocks = -(-length//size)
+    rhs = np.zeros((numBlocks*size, extra, num), dtype=top.dtype)
+    rhs[:length] = vector.transpose(2, 0, 1)
+    rhs = rhs.reshape(numBlocks, size, extra, num).transpose(1, 0, 2, 3)[:, np.newaxis]
+
+    reduced = []
+    for below, inverse in levels:  # Eliminate the odd blocks
+        rhs = _padBlocks(rhs)
+        odd = _multiply(inverse[..., np.newaxis, :], rhs[:, :, 1::2])
+        rhs = rhs[:, :, 0::2] - _multiply(_transpose(below[:, :, 1::2, np.newaxis]), odd)
+        rhs[:, :, 1:] -= _multiply(below[:, :, 2::2, np.newaxis], odd[:, :, :-1])
+        reduced.append(odd)
+    solution = _multiply(top[..., np.newaxis, :], rhs)
+    for (below, inverse), odd in zip(reversed(levels), reversed(reduced)):  # Recover the odd blocks
+        even = solution[:, :, :odd.shape[2]]
+        coupling = _multiply(below[:, :, 1::2, np.newaxis], even)
+        coupling[:, :, :-1] += _multiply(_transpose(below[:, :, 2::2, np.newaxis]), even[:, :, 1:])
+        odd -= _multiply(inverse[..., np.newaxis, :], coupling)
+        solution = np.stack((even, odd), axis=3).reshape(size, 1, -1, extra, num)
+
+    solution = solution[:, 0, :numBlocks].transpose(1, 0, 2, 3).reshape(numBlocks*size, extra, num)
+    return solution[:length].transpose(1, 2, 0)
@@ -1,6 +1,6 @@
 import numpy as np
 
-from .utils import astropyHeaderToDict, astropyHeaderFromDict
+from .utils import astropyHeaderToDict, astropyHeaderFromTemplate
 from .masks import MaskHelper
 
 __all__ = ["FluxTable"]
@@ -53,22 +53,30 @@ class FluxTable:
         """Return number of elements"""
         return len(self.wavelength)
 
-    def toFits(self, fits):
+    def toFits(self, fits, compactMask=False):
         """Write to a FITS file
 
         Parameters
         ----------
         fits : `astropy.io.fits.HDUList`
             Opened FITS file.
+        compactMask : `bool`, optional
+            Write the mask column with the narrowest integer type that can
+            hold it? The mask is widened to the in-memory type when read back.
         """
         from astropy.io.fits import BinTableHDU, Column
         header = self.flags.toFitsHeader()
+        mask = np.asarray(self.mask)
+        maskFormat = "K"
+        if compactMask:
+            mask = mask.astype(self.flags.getCompactType(mask), copy=False)
+            maskFormat = {1: "B", 2: "I", 4: "J", 8: "K"}[mask.dtype.itemsize]
         hdu = BinTableHDU.from_columns([
             Column("wavelength", "E", array=self.wavelength),
             Column("flux", "E", array=self.flux),
             Column("error", "E", array=self.error),
-            Column("mask", "K", array=self.mask),
-        ], header=astropyHeaderFromDict(header), name=self._hduName)
+            Column("mask", maskFormat, array=mask),
+        ], header=astropyHeaderFromTemplate(header), name=self._hduName)
         fits.append(hdu)
 
     @classmethod
@@ -88,4 +96,5 @@ class FluxTable:
         hdu = fits[cls._hduName]
         header = astropyHeaderToDict(hdu.header)
         flags = MaskHelper.fromFitsHeader(header)
-        return cls(hdu.data["wavelength"], hdu.data["flux"], hdu.data["error"], hdu.data["mask"], flags)
+        mask = flags.widen(hdu.data["mask"])
+        return cls(hdu.data["wavelength"], hdu.data["flux"], hdu.data["error"], mask, flags)
@@ -165,3 +165,7 @@ class Identity(types.SimpleNamespace):
         """
         return cls(identity["visit"], identity.get("arm", None), identity.get("spectrograph", None),
                    identity.get("pfsDesignId", None))
+
+    def __reduce__(self):
+        """How to pickle"""
+        return type(self), (self.visit, self._arm, self._spectrograph, self._pfsDesignId)
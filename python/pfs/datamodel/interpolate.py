@@ -0,0 +1,272 @@
+import numpy as np
+
+from .covariance import BandedCovariance
+
+__all__ = ("interpolateFlux", "interpolateMask", "interpolateCovariance", "resampleSpectra")
+
+
+def calculateInterpolation(fromWavelength, toWavelength):
+    """Calculate the parameters for linear interpolation
+
+    This is vectorised over all spectra: the search for the bracketing pixels
+    is performed with a single call to `numpy.searchsorted` on the flattened
+    wavelength arrays, each row offset so that the rows are in order.
+
+    Parameters
+    ----------
+    fromWavelength : `numpy.ndarray` of `float`, shape ``(numSpectra, length)``
+        Wavelength arrays of the input spectra; each row must be increasing.
+    toWavelength : `numpy.ndarray` of `float`, shape ``(numOut,)``
+        Wavelength array onto which to interpolate.
+
+    Returns
+    -------
+    index : `numpy.ndarray` of `int`, shape ``(numSpectra, numOut)``
+        Index of the lower bracketing input pixel.
+    frac : `numpy.ndarray` of `float`, shape ``(numSpectra, numOut)``
+        Weight of the upper bracketing input pixel; the lower pixel has weight
+        ``1 - frac``.
+    valid : `numpy.ndarray` of `bool`, shape ``(numSpectra, numOut)``
+        Does the output pixel fall within the range of the input?
+    """
+    fromWavelength = np.atleast_2d(np.asarray(fromWavelength, dtype=float))
+    toWavelength = np.asarray(toWavelength, dtype=float)
+    numSpectra, length = fromWavelength.shape
+    numOut = len(toWavelength)
+    if length < 2:
+        raise RuntimeError("Cannot interpolate spectra of length %d" % (length,))
+
+    lower = min(fromWavelength.min(initial=np.inf), toWavelength.min(initial=np.inf))
+    upper = max(fromWavelength.max(initial=-np.inf), toWavelength.max(initial=-np.inf))
+    offset = ((upper - lower) + 1.0)*np.arange(numSpectra)[:, np.newaxis] - lower
+    flatIndex = np.searchsorted((fromWavelength + offset).ravel(), (toWavelength + offset).ravel(),
+                                side="right")
+    index = flatIndex.reshape(numSpectra, numOut) - 1 - length*np.arange(numSpectra)[:, np.newaxis]
+    valid = (index >= 0) & (toWavelength <= fromWavelength[:, -1:])
+    index = np.clip(index, 0, length - 2)
+
+    lowWavelength = np.take_along_axis(fromWavelength, index, axis=1)
+    highWavelength = np.take_along_axis(fromWavelength, index + 1, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        frac = (toWavelength - lowWavelength)/(highWavelength - lowWavelength)
+    frac = np.where(valid, frac, 0.0)
+    return index, frac, valid
+
+
+def _interpolateFlux(interpolation, fromFlux, fill=0.0):
+    """Interpolate flux, given the interpolation parameters
+
+    Parameters
+    ----------
+    interpolation : `tuple`
+        Interpolation parameters, from ``calculateInterpolation``.
+    fromFlux : `numpy.ndarray` of `float`, shape ``(numSpectra, length)``
+        Flux to interpolate.
+    fill : `float`, optional
+        Value for output pixels outside the range of the input.
+
+    Returns
+    -------
+    toFlux : `numpy.ndarray` of `float`, shape ``(numSpectra, numOut)``
+        Interpolated flux.
+    """
+    index, frac, valid = interpolation
+    fromFlux = np.atleast_2d(fromFlux)
+    low = np.take_along_axis(fromFlux, index, axis=1)
+    high = np.take_along_axis(fromFlux, index + 1, axis=1)
+    return np.where(valid, low*(1.0 - frac) + high*frac, fill).astype(fromFlux.dtype)
+
+
+def _interpolateMask(interpolation, fromMask, fill=0):
+    """Interpolate mask, given the interpolation parameters
+
+    Parameters
+    ----------
+    interpolation : `tuple`
+        Interpolation parameters, from ``calculateInterpolation``.
+    fromMask : `numpy.ndarray` of `int`, shape ``(numSpectra, length)``
+        Mask to interpolate.
+    fill : `int`, optional
+        Value for output pixels outside the range of the input.
+
+    Returns
+    -------
+    toMask : `numpy.ndarray` of `int`, shape ``(numSpectra, numOut)``
+        Interpolated mask: the bitwise OR of the contributing input pixels.
+        This has the type of the input mask, unless that is too narrow to
+        hold the ``fill`` without using the sign bit, in which case it is
+        `numpy.int64`.
+    """
+    index, frac, valid = interpolation
+    fromMask = np.atleast_2d(fromMask)
+    dtype = fromMask.dtype
+    if int(fill) > np.iinfo(dtype).max:
+        dtype = np.dtype(np.int64)
+    low = np.where(frac < 1.0, np.take_along_axis(fromMask, index, axis=1), 0)
+    high = np.where(frac > 0.0, np.take_along_axis(fromMask, index + 1, axis=1), 0)
+    return np.where(valid, low | high, np.array(fill).astype(dtype)).astype(dtype)
+
+
+def _interpolateCovariance(interpolation, fromCovar, fill=0.0):
+    """Interpolate banded covariance, given the interpolation parameters
+
+    Each output pixel is a linear combination of two input pixels, so the
+    output covariance is the corresponding combination of four elements of
+    the input covariance.
+
+    Parameters
+    ----------
+    interpolation : `tuple`
+        Interpolation parameters, from ``calculateInterpolation``.
+    fromCovar : `numpy.ndarray` of `float`, shape ``(numSpectra, numBands, length)``
+        Bands of the covariance to interpolate.
+    fill : `float`, optional
+        Value for output pixels outside the range of the input.
+
+    Returns
+    -------
+    toCovar : `numpy.ndarray` of `float`, shape ``(numSpectra, numBands, numOut)``
+        Bands of the interpolated covariance.
+    """
+    index, frac, valid = interpolation
+    covariance = BandedCovariance(fromCovar)
+    numSpectra, numOut = index.shape
+    toCovar = np.zeros((numSpectra, covariance.numBands, numOut), dtype=covariance.covar.dtype)
+    for band in range(min(covariance.numBands, numOut)):
+        num = numOut - band
+        row = index[:, :num]
+        col = index[:, band:]
+        rowHigh = frac[:, :num]
+        rowLow = 1.0 - rowHigh
+        colHigh = frac[:, band:]
+        colLow = 1.0 - colHigh
+        values = (covariance.element(row, col)*rowLow*colLow +
+                  covariance.element(row, col + 1)*rowLow*colHigh +
+                  covariance.element(row + 1, col)*rowHigh*colLow +
+                  covariance.element(row + 1, col + 1)*rowHigh*colHigh)
+        toCovar[:, band, :num] = np.where(valid[:, :num] & valid[:, band:], values, fill)
+    return toCovar
+
+
+def interpolateFlux(fromWavelength, fromFlux, toWavelength, fill=0.0):
+    """Interpolate flux onto a new wavelength array
+
+    The interpolation is linear, and vectorised over all spectra.
+
+    Parameters
+    ----------
+    fromWavelength : `numpy.ndarray` of `float`, shape ``([numSpectra,] length)``
+        Wavelength arrays of the input spectra; each row must be increasing.
+    fromFlux : `numpy.ndarray` of `float`, shape ``([numSpectra,] length)``
+        Flux to interpolate.
+    toWavelength : `numpy.ndarray` of `float`, shape ``(numOut,)``
+        Wavelength array onto which to interpolate.
+    fill : `float`, optional
+        Value for output pixels outside the range of the input.
+
+    Returns
+    -------
+    toFlux : `numpy.ndarray` of `float`, shape ``([numSpectra,] numOut)``
+        Interpolated flux.
+    """
+    interpolation = calculateInterpolation(fromWavelength, toWavelength)
+    return _interpolateFlux(interpolation, fromFlux, fill).reshape(np.shape(fromFlux)[:-1] + (-1,))
+
+
+def interpolateMask(fromWavelength, fromMask, toWavelength, fill=0):
+    """Interpolate mask onto a new wavelength array
+
+    Each output pixel is the bitwise OR of the input pixels that contribute
+    to it, and vectorised over all spectra.
+
+    Parameters
+    ----------
+    fromWavelength : `numpy.ndarray` of `float`, shape ``([numSpectra,] length)``
+        Wavelength arrays of the input spectra; each row must be increasing.
+    fromMask : `numpy.ndarray` of `int`, shape ``([numSpectra,] length)``
+        Mask to interpolate.
+    toWavelength : `numpy.ndarray` of `float`, shape ``(numOut,)``
+        Wavelength array onto which to interpolate.
+    fill : `int`, optional
+        Value for output pixels outside the range of the input.
+
+    Returns
+    -------
+    toMask : `numpy.ndarray` of `int`, shape ``([numSpectra,] numOut)``
+        Interpolated mask.
+    """
+    interpolation = calculateInterpolation(fromWavelength, toWavelength)
+    return _interpolateMask(interpolation, fromMask, fill).reshape(np.shape(fromMask)[:-1] + (-1,))
+
+
+def interpolateCovariance(fromWavelength, fromCovar, toWavelength, fill=0.0):
+    """Interpolate banded covariance onto a new wavelength array
+
+    The covariance is propagated through the linear interpolation, and
+    vectorised over all spectra.
+
+    Parameters
+    ----------
+    fromWavelength : `numpy.ndarray` of `float`, shape ``([numSpectra,] length)``
+        Wavelength arrays of the input spectra; each row must be increasing.
+    fromCovar : `numpy.ndarray` of `float`, shape ``([numSpectra,] numBands, length)``
+        Bands of the covariance to interpolate.
+    toWavelength : `numpy.ndarray` of `float`, shape ``(numOut,)``
+        Wavelength array onto which to interpolate.
+    fill : `float`, optional
+        Value for output pixels outside the range of the input.
+
+    Returns
+    -------
+    toCovar : `numpy.ndarray` of `float`, shape ``([numSpectra,] numBands, numOut)``
+        Bands of the interpolated covariance.
+    """
+    interpolation = calculateInterpolation(fromWavelength, toWavelength)
+    fromCovar = np.asarray(fromCovar)
+    toCovar = _interpolateCovariance(interpolation, fromCovar.reshape((-1,) + fromCovar.shape[-2:]), fill)
+    return toCovar.reshape(fromCovar.shape[:-1] + (-1,))
+
+
+def resampleSpectra(spectra, wavelength, FiberArraySetClass=None, noData="NO_DATA"):
+    """Resample spectra onto a common wavelength array
+
+    All spectra are resampled at once (with linear interpolation): the flux
+    and sky are interpolated, the mask is the bitwise OR of the contributing
+    pixels, and the covariance is propagated through the interpolation.
+
+    Parameters
+    ----------
+    spectra : `pfs.datamodel.PfsFiberArraySet`
+        Spectra to resample; the wavelength array of each must be increasing.
+    wavelength : `numpy.ndarray` of `float`, shape ``(numOut,)``
+        Wavelength array onto which to resample (e.g., a
+        `pfs.datamodel.WavelengthArray`).
+    FiberArraySetClass : `type`, optional
+        Subclass of `pfs.datamodel.PfsFiberArraySet` to produce (e.g.,
+        `pfs.datamodel.PfsMerged`). Defaults to the class of ``spectra``.
+    noData : `str`, optional
+        Name of the mask plane to set for pixels outside the range of the
+        input.
+
+    Returns
+    -------
+    resampled : `pfs.datamodel.PfsFiberArraySet`
+        Resampled spectra.
+    """
+    if FiberArraySetClass is None:
+        FiberArraySetClass = type(spectra)
+    flags = spectra.flags.copy()
+    noDataValue = flags.add(noData)
+    interpolation = calculateInterpolation(spectra.wavelength, wavelength)
+    wavelength = np.asarray(wavelength)
+    return FiberArraySetClass(
+        spectra.identity,
+        spectra.fiberId.copy(),
+        np.array(np.broadcast_to(wavelength, (len(spectra), len(wavelength)))),
+        _interpolateFlux(interpolation, spectra.flux),
+        _interpolateMask(interpolation, spectra.mask, noDataValue),
+        _interpolateFlux(interpolation, spectra.sky),
+        _interpolateCovariance(interpolation, spectra.covar),
+        flags,
+        spectra.metadata.copy(),
+    )
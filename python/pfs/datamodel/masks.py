@@ -1,4 +1,4 @@
-from collections import Counter
+import numpy as np
 
 __all__ = ("MaskHelper",)
 
@@ -21,6 +21,7 @@ class MaskHelper:
     def __init__(self, **kwargs):
         self.flags = kwargs
         assert all(ii >= 0 and ii < self._maxSize and isinstance(ii, int) for ii in kwargs.values())
+        self._cache = None
 
     def __repr__(self):
         """Representation"""
@@ -32,7 +33,7 @@ class MaskHelper:
 
     def __getitem__(self, name):
         """Retrieve value for a single mask name"""
-        return 2**self.flags[name]
+        return self._getCache()[1][name]
 
     def __len__(self):
         """Number of bits used"""
@@ -44,7 +45,56 @@ class MaskHelper:
 
     def get(self, *args):
         """Retrieve value for multiple masks"""
-        return sum(self[name] for name in args)
+        values = self._getCache()[1]
+        result = 0
+        for name in args:
+            result |= values[name]
+        return result
+
+    def _getCache(self):
+        """Return the cached mask plane values
+
+        The cache is rebuilt whenever the mask planes change.
+
+        Returns
+        -------
+        flags : `dict` (`str`: `int`)
+            Copy of the mask planes (bit for each name) used for the cache.
+        values : `dict` (`str`: `int`)
+            Value of each mask plane.
+        arrays : `dict` (`numpy.dtype`: `numpy.ndarray`)
+            Values of the mask planes (in the order of ``flags``) for each
+            mask data type, as computed by ``_getPlaneValues``.
+        """
+        cache = getattr(self, "_cache", None)
+        if cache is None or cache[0] != self.flags:
+            flags = dict(self.flags)
+            cache = (flags, {name: 2**bit for name, bit in flags.items()}, {})
+            self._cache = cache
+        return cache
+
+    def _getPlaneValues(self, dtype):
+        """Return the values of all mask planes, in the data type of a mask
+
+        Parameters
+        ----------
+        dtype : `numpy.dtype`
+            Data type of the mask.
+
+        Returns
+        -------
+        names : `list` of `str`
+            Names of the mask planes.
+        values : `numpy.ndarray` of type ``dtype``
+            Value of each mask plane; zero for planes that can't be
+            represented by the data type.
+        """
+        flags, _, arrays = self._getCache()
+        dtype = np.dtype(dtype)
+        if dtype not in arrays:
+            values = [self._getPlaneValue(bit, dtype) for bit in flags.values()]
+            arrays[dtype] = np.array([0 if vv is None else vv for vv in values], dtype=dtype)
+        return list(flags), arrays[dtype]
 
     def copy(self):
         """Return a copy"""
@@ -100,30 +150,165 @@ class MaskHelper:
         return {self.maskPlanePrefix + key: value for key, value in self.flags.items()}
 
     @classmethod
-    def fromMerge(cls, helpers):
+    def fromMerge(cls, helpers, remap=False):
         """Construct from multiple `MaskHelper`s
 
-        There must be no discrepancies between the inputs.
+        Unless ``remap``, there must be no discrepancies between the inputs.
 
         Parameters
         ----------
         helpers : iterable of `MaskHelper`
             `MaskHelper`s to merge.
+        remap : `bool`, optional
+            Allow the inputs to assign different bits to the same mask plane
+            name? If so, each mask plane keeps its bit where that doesn't
+            conflict with another, and is otherwise assigned a free bit; the
+            masks of the inputs must then be converted with ``remap``.
 
         Returns
         -------
         self : `MaskHelper`
             Merged `MaskHelper`.
         """
+        helpers = list(helpers)
         maskPlanes = {}
         for hh in helpers:
             for name, value in hh.flags.items():
                 if name in maskPlanes:
-                    if maskPlanes[name] != value:
+                    if maskPlanes[name] != value and not remap:
                         raise RuntimeError("Cannot merge MaskHelpers due to mismatch: %s" % (name,))
-                else:
+                elif not remap or value not in maskPlanes.values():
                     maskPlanes[name] = value
-        return cls(**maskPlanes)
+        self = cls(**maskPlanes)
+        if remap:
+            for hh in helpers:
+                for name in hh.flags:
+                    self.add(name)
+        return self
+
+    def _getRemapTable(self, other):
+        """Return the lookup table for converting a mask from another helper
+
+        Parameters
+        ----------
+        other : `MaskHelper`
+            Helper for the mask to be converted.
+
+        Returns
+        -------
+        table : `numpy.ndarray` of `uint64`, shape ``(8, 256)``, or `None`
+            Our mask value for each value of each byte of the other mask; or
+            `None` if no conversion is required.
+        """
+        if all(self.flags[name] == bit for name, bit in other.flags.items()):
+            return None
+        newValues = np.zeros(self._maxSize, dtype=np.uint64)
+        for name, bit in other.flags.items():
+            newValues[bit] = np.uint64(1) << np.uint64(self.flags[name])
+        bits = ((np.arange(256)[:, np.newaxis] >> np.arange(8)) & 1).astype(bool)  # shape (256, 8)
+        newValues = newValues.reshape(8, 1, 8)  # byte, (value), bit
+        return np.bitwise_or.reduce(np.where(bits[np.newaxis], newValues, np.uint64(0)), axis=2)
+
+    def remap(self, mask, other, dtype=None):
+        """Convert a mask from another helper to use our mask planes
+
+        The conversion is performed through a lookup table for each byte of
+        the mask, so it is vectorised over the whole array. Bits of the mask
+        that don't correspond to a mask plane of the ``other`` helper are
+        cleared (unless no conversion is required, in which case the mask is
+        returned unchanged).
+
+        Parameters
+        ----------
+        mask : `numpy.ndarray` of `int`
+            Mask array to convert.
+        other : `MaskHelper`
+            Helper for the mask to be converted; all of its mask planes must
+            be present in ``self`` (e.g., as produced by ``fromMerge``).
+        dtype : `numpy.dtype`, optional
+            Data type for the converted mask. Defaults to the type of the
+            input mask, or `numpy.int64` if that can't represent all of our
+            mask planes.
+
+        Returns
+        -------
+        remapped : `numpy.ndarray` of `int`
+            Converted mask.
+        """
+        mask = np.asarray(mask)
+        if dtype is None:
+            dtype = mask.dtype
+            if max(self.flags.values(), default=0) >= 8*dtype.itemsize:
+                dtype = np.dtype(np.int64)
+        table = self._getRemapTable(other)
+        if table is None:
+            return mask.astype(dtype)
+        table = table.astype(dtype)
+        unsigned = mask.astype(mask.dtype.newbyteorder("="), copy=False).view("u%d" % (mask.dtype.itemsize,))
+        remapped = np.zeros(mask.shape, dtype=dtype)
+        for byte in sorted(set(bit//8 for bit in other.flags.values() if bit < 8*mask.dtype.itemsize)):
+            remapped |= table[byte][(unsigned >> (8*byte)) & 0xFF]
+        return remapped
+
+    def getCompactType(self, mask=None):
+        """Return the narrowest integer type that can hold the mask
+
+        The type is chosen from the highest bit used by our mask planes and
+        (if provided) by the mask itself, so no bits are lost in converting
+        the mask. This allows writing masks that use only a few mask planes
+        with a fraction of the space. The sign bit of the signed types is
+        never used, so that the mask can be widened again (see ``widen``)
+        without sign extension setting spurious mask planes.
+
+        Parameters
+        ----------
+        mask : `numpy.ndarray` of `int`, optional
+            Mask array that will be converted.
+
+        Returns
+        -------
+        dtype : `numpy.dtype`
+            Narrowest of `numpy.uint8`, `numpy.int16`, `numpy.int32` and
+            `numpy.int64` that can represent the mask.
+        """
+        highest = max(self.flags.values(), default=0)
+        if mask is not None:
+            mask = np.asarray(mask)
+            if mask.size > 0:
+                unsigned = mask.astype(mask.dtype.newbyteorder("="), copy=False)
+                unsigned = unsigned.view("u%d" % (mask.dtype.itemsize,))
+                highest = max(highest, int(np.bitwise_or.reduce(unsigned, axis=None)).bit_length() - 1)
+        for dtype in (np.uint8, np.int16, np.int32):
+            if highest < np.iinfo(dtype).max.bit_length():
+                return np.dtype(dtype)
+        return np.dtype(np.int64)
+
+    def widen(self, mask):
+        """Widen a mask to the in-memory type
+
+        Masks written with a compact type (see ``getCompactType``) may be too
+        narrow to hold mask planes added after reading. This converts such a
+        mask to `numpy.int32`, or `numpy.int64` if that is required to hold
+        our mask planes. Masks that are already at least that wide are
+        returned unchanged (and not copied).
+
+        Parameters
+        ----------
+        mask : `numpy.ndarray` of `int`
+            Mask array to widen.
+
+        Returns
+        -------
+        widened : `numpy.ndarray` of `int`
+            Mask array with the in-memory type.
+        """
+        mask = np.asarray(mask)
+        dtype = np.dtype(np.int32)
+        if max(self.flags.values(), default=0) >= 8*dtype.itemsize:
+            dtype = np.dtype(np.int64)
+        if mask.dtype.itemsize >= dtype.itemsize:
+            return mask
+        return mask.astype(dtype)
 
     def interpret(self, value):
         """Interpret a value from the mask
@@ -138,10 +323,10 @@ class MaskHelper:
         names : `list` of `str`
             List of mask planes that are set in the provided value.
         """
-        return [nn for nn, vv in self.flags.items() if (value & 2**vv) != 0]
+        return [nn for nn, vv in self._getCache()[1].items() if (value & vv) != 0]
 
     def count(self, mask):
-        """Return counts of each mask plane
+        """Return counts of each combination of mask planes
 
         Parameters
         ----------
@@ -151,7 +336,124 @@ class MaskHelper:
         Returns
         -------
         counts : `dict` (`str`: `int`)
-            Counts for each mask plane. An additional result indexed by an empty
-            string corresponds to the number of pixels with no mask plane set.
+            Counts for each combination of mask planes (names joined with
+            commas). An additional result indexed by an empty string
+            corresponds to the number of pixels with no mask plane set.
+        """
+        values, numbers = np.unique(mask, return_counts=True)
+        counts = {}
+        for value, num in zip(values.tolist(), numbers.tolist()):
+            key = ",".join(self.interpret(value))
+            counts[key] = counts.get(key, 0) + num
+        return counts
+
+    @staticmethod
+    def _getPlaneValue(bit, dtype):
+        """Return the value of a mask plane, in the data type of a mask
+
+        Parameters
+        ----------
+        bit : `int`
+            Bit for the mask plane.
+        dtype : `numpy.dtype`
+            Data type of the mask.
+
+        Returns
+        -------
+        value : scalar of type ``dtype``, or `None`
+            Value of the mask plane; `None` if it can't be represented.
+        """
+        dtype = np.dtype(dtype)
+        if bit >= 8*dtype.itemsize:
+            return None
+        return np.left_shift(np.ones(1, dtype=dtype), bit)[0]
+
+    def countPlanes(self, mask, axis=None):
+        """Return the number of pixels with each mask plane set
+
+        Each mask plane is counted over the whole array at once, so this is
+        suitable for large masks, e.g., computing the fraction of pixels in
+        each fiber with a mask plane set (``axis=1`` for a mask of shape
+        ``(numFibers, length)``).
+
+        Parameters
+        ----------
+        mask : `numpy.ndarray` of `int`
+            Mask array.
+        axis : `int` or `tuple` of `int`, optional
+            Axis or axes along which to count. By default, the whole array is
+            counted.
+
+        Returns
+        -------
+        counts : `dict` (`str`: `int` or `numpy.ndarray` of `int`)
+            Number of pixels with each mask plane set.
+        """
+        mask = np.asarray(mask)
+        counts = {}
+        for name, value in zip(*self._getPlaneValues(mask.dtype)):
+            num = np.count_nonzero(mask & value, axis=axis)
+            counts[name] = int(num) if axis is None else num
+        return counts
+
+    def select(self, mask, *names, mode="any"):
+        """Select pixels by mask planes
+
+        Parameters
+        ----------
+        mask : `numpy.ndarray` of `int`
+            Mask array (e.g., the ``mask`` of a `pfs.datamodel.PfsFiberArraySet`,
+            `pfs.datamodel.PfsFiberArray` or `pfs.datamodel.FluxTable`).
+        *names : `str`
+            Names of mask planes to select. By default, all mask planes.
+        mode : {"any", "all"}, optional
+            Select pixels with any of the mask planes set, or with all of them
+            set?
+
+        Returns
+        -------
+        select : `numpy.ndarray` of `bool`
+            Whether each pixel is selected.
+
+        Raises
+        ------
+        KeyError
+            If a mask plane name is not recognised.
+        RuntimeError
+            If the ``mode`` is not recognised.
+        """
+        mask = np.asarray(mask)
+        allNames, allValues = self._getPlaneValues(mask.dtype)
+        if names:
+            indices = {name: ii for ii, name in enumerate(allNames)}
+            values = allValues[[indices[name] for name in names]]
+        else:
+            values = allValues
+        value = np.bitwise_or.reduce(values) if len(values) > 0 else allValues.dtype.type(0)
+        if mode == "any":
+            return (mask & value) != 0
+        if mode == "all":
+            if np.any(values == 0):
+                return np.zeros(mask.shape, dtype=bool)  # A plane can't be represented, so it's never set
+            return (mask & value) == value
+        raise RuntimeError("Unrecognised mode for selection: %s" % (mode,))
+
+    def decode(self, mask):
+        """Decode a mask array into the individual mask planes
+
+        Parameters
+        ----------
+        mask : `numpy.ndarray` of `int`
+            Mask array.
+
+        Returns
+        -------
+        names : `list` of `str`
+            Names of the mask planes.
+        planes : `numpy.ndarray` of `bool`, shape ``(len(names),) + mask.shape``
+            Whether each mask plane is set for each pixel.
         """
-        return {",".join(self.interpret(value)): num for value, num in Counter(mask.flatten()).items()}
+        mask = np.asarray(mask)
+        names, values = self._getPlaneValues(mask.dtype)
+        values = values.reshape((len(values),) + (1,)*mask.ndim)
+        return names, (mask[np.newaxis] & values) != 0
@@ -0,0 +1,125 @@
+import os
+import types
+from concurrent.futures import ProcessPoolExecutor
+
+from .utils import astropyHeaderToDict
+from .masks import MaskHelper
+from .target import Target
+from .observations import Observations
+from .identity import Identity
+
+__all__ = ("ProductMetadata", "readMetadata", "readMetadataMany")
+
+
+class ProductMetadata(types.SimpleNamespace):
+    """Metadata for a data product, read without any of the images
+
+    Parameters
+    ----------
+    filename : `str`
+        Filename of the data product.
+    metadata : `dict` (`str`: POD)
+        Keyword-value pairs from the primary header.
+    flags : `pfs.datamodel.MaskHelper`
+        Helper for dealing with symbolic names for mask values.
+    identity : `pfs.datamodel.Identity`, optional
+        Identity of the exposure, for products with a ``CONFIG`` HDU (e.g.,
+        `pfs.datamodel.PfsArm`).
+    target : `pfs.datamodel.Target`, optional
+        Target, for products with a ``TARGET`` HDU (e.g.,
+        `pfs.datamodel.PfsObject`).
+    observations : `pfs.datamodel.Observations`, optional
+        Observations of the target, for products with an ``OBSERVATIONS`` HDU
+        (e.g., `pfs.datamodel.PfsObject`).
+    """
+    def __init__(self, filename, metadata, flags, identity=None, target=None, observations=None):
+        super().__init__(filename=filename, metadata=metadata, flags=flags, identity=identity, target=target,
+                         observations=observations)
+
+    def __reduce__(self):
+        """How to pickle"""
+        return type(self), (self.filename, self.metadata, self.flags, self.identity, self.target,
+                            self.observations)
+
+
+def _getHdu(fits, name):
+    """Return the named HDU, or `None` if it isn't present
+
+    Parameters
+    ----------
+    fits : `astropy.io.fits.HDUList`
+        Opened FITS file.
+    name : `str`
+        Name of HDU.
+
+    Returns
+    -------
+    hdu : `astropy.io.fits.hdu.base.ExtensionHDU` or `None`
+        HDU of interest.
+    """
+    try:
+        return fits[name]
+    except KeyError as exc:
+        # Only want to catch "Extension XXX not found."
+        if not exc.args[0].startswith("Extension"):
+            raise
+        return None
+
+
+def readMetadata(filename):
+    """Read the metadata of a data product, without reading the images
+
+    The file is opened with lazy loading of HDUs, and only the headers and
+    the small tables (``CONFIG``, ``TARGET``, ``OBSERVATIONS``) are read; the
+    data of the image HDUs is skipped over without being read or decoded.
+
+    Parameters
+    ----------
+    filename : `str`
+        Filename of the data product (e.g., a ``pfsObject`` or ``pfsArm``).
+
+    Returns
+    -------
+    metadata : `ProductMetadata`
+        Metadata for the data product.
+    """
+    import astropy.io.fits
+    with astropy.io.fits.open(filename, lazy_load_hdus=True, memmap=False) as fits:
+        metadata = astropyHeaderToDict(fits[0].header)
+        flags = MaskHelper.fromFitsHeader(metadata)
+        if len(flags) == 0:
+            # Spectra of a single object have the mask planes in the MASK header
+            hdu = _getHdu(fits, "MASK")
+            if hdu is not None:
+                flags = MaskHelper.fromFitsHeader(hdu.header)
+        identity = Identity.fromFits(fits) if _getHdu(fits, Identity.fitsExtension) is not None else None
+        target = Target.fromFits(fits) if _getHdu(fits, "TARGET") is not None else None
+        observations = Observations.fromFits(fits) if _getHdu(fits, "OBSERVATIONS") is not None else None
+    return ProductMetadata(filename, metadata, flags, identity, target, observations)
+
+
+def readMetadataMany(filenames, workers=None, chunkSize=16):
+    """Read the metadata of many data products in parallel
+
+    Parameters
+    ----------
+    filenames : iterable of `str`
+        Filenames of the data products.
+    workers : `int`, optional
+        Number of worker processes. Defaults to the number of CPUs. If ``1``,
+        the files are read serially in this process.
+    chunkSize : `int`, optional
+        Number of files to send to a worker process at a time.
+
+    Returns
+    -------
+    metadata : `list` of `ProductMetadata`
+        Metadata for each data product, in the same order as the filenames.
+    """
+    filenames = list(filenames)
+    if workers is None:
+        workers = os.cpu_count()
+    if workers == 1 or len(filenames) <= 1:
+        return [readMetadata(ff) for ff in filenames]
+    with ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(readMetadata, filenames, chunksize=chunkSize))
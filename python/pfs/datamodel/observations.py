@@ -46,6 +46,11 @@ class Observations(types.SimpleNamespace):
         """Number of observations"""
         return self.num
 
+    def __reduce__(self):
+        """How to pickle"""
+        return type(self), (self.visit, self.arm, self.spectrograph, self.pfsDesignId, self.fiberId,
+                            self.pfiNominal, self.pfiCenter)
+
     def validate(self):
         """Validate that all arrays are of the expected shape"""
         assert len(self.visit) == self.num
@@ -106,7 +111,7 @@ class Observations(types.SimpleNamespace):
         fits : `astropy.io.fits.HDUList`
             Opened FITS file.
         """
-        armLength = max(len(arm) for arm in self.arm)
+        armLength = max((len(arm) for arm in self.arm), default=1)
         columns = [Column("visit", "J", array=self.visit),
                    Column("arm", f"{armLength}A", array=self.arm),
                    Column("spectrograph", "J", array=self.spectrograph),
@@ -119,7 +124,7 @@ class Observations(types.SimpleNamespace):
         fits.append(hdu)
 
     @classmethod
-    def makeSingle(cls, identity, pfsConfig, fiberId):
+    def makeSingle(cls, identity, pfsConfig, fiberId, index=None):
         """Construct for a single observation
 
         Parameters
@@ -130,17 +135,16 @@ class Observations(types.SimpleNamespace):
             Top-end configuration.
         fiberId : `int`
             Fiber identifier.
+        index : `int`, optional
+            Index of the fiber in the ``pfsConfig``, if already known.
 
         Returns
         -------
         self : `Observations`
             Observations, consisting of a single exposure.
         """
-        index = np.nonzero(pfsConfig.fiberId == fiberId)[0]
-        if len(index) != 1:
-            raise RuntimeError("Number of fibers in PfsConfig with fiberId = %d is not unity (%d)" %
-                               (fiberId, len(index)))
-        index = index[0]
+        if index is None:
+            index = pfsConfig.selectFiber(fiberId)
 
         return cls(
             visit=np.array([identity.visit]),
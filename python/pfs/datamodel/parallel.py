@@ -0,0 +1,369 @@
+import io
+import os
+import itertools
+import time
+import types
+import pickle
+import weakref
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+__all__ = ("readFitsMany", "writeFitsMany", "WriteStatistics")
+
+
+def _attachSharedArray(name, shape, dtype):
+    """Reconstruct an array from shared memory
+
+    The shared memory block is unlinked immediately (so it is released once
+    the array is no longer referenced), and the array is a view onto the block
+    rather than a copy.
+
+    Parameters
+    ----------
+    name : `str`
+        Name of the shared memory block.
+    shape : `tuple` of `int`
+        Shape of the array.
+    dtype : `str`
+        Data type of the array.
+
+    Returns
+    -------
+    array : `numpy.ndarray`
+        Array backed by the shared memory block.
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    shm.unlink()
+    array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    weakref.finalize(array, shm.close)
+    return array
+
+
+def _getTrackerName(shm):
+    """Return the name under which a shared memory block is tracked
+
+    The resource tracker registers POSIX shared memory blocks under the
+    name with a leading slash, which is stripped from the public name.
+
+    Parameters
+    ----------
+    shm : `multiprocessing.shared_memory.SharedMemory`
+        Shared memory block.
+
+    Returns
+    -------
+    name : `str`
+        Name used by the resource tracker.
+    """
+    return "/" + shm.name if os.name == "posix" else shm.name
+
+
+class _SharedMemoryPickler(pickle.Pickler):
+    """Pickler that passes arrays through shared memory
+
+    Plain `numpy.ndarray` instances are copied (and converted to native byte
+    order) into shared memory blocks, and only the name of the block is
+    pickled. The recipient attaches to the block when unpickling, so the array
+    data is never serialised.
+
+    Parameters
+    ----------
+    file : file-like
+        Stream to which to write the pickle.
+    """
+    def __init__(self, file):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.blocks = []
+
+    def reducer_override(self, obj):
+        """Reduce plain arrays to a reference to shared memory"""
+        if type(obj) is not np.ndarray or obj.nbytes == 0 or obj.dtype.hasobject:
+            return NotImplemented
+        dtype = obj.dtype.newbyteorder("=")
+        shm = shared_memory.SharedMemory(create=True, size=obj.nbytes)
+        self.blocks.append(shm)
+        array = np.ndarray(obj.shape, dtype=dtype, buffer=shm.buf)
+        array[...] = obj
+        del array
+        return _attachSharedArray, (shm.name, obj.shape, dtype.str)
+
+    def release(self, unlink=False):
+        """Release our handles on the shared memory blocks
+
+        Parameters
+        ----------
+        unlink : `bool`, optional
+            Destroy the blocks? This is appropriate if the pickle will not be
+            delivered to the recipient. Otherwise, the recipient is responsible
+            for the blocks.
+        """
+        for shm in self.blocks:
+            shm.close()
+            if unlink:
+                shm.unlink()
+            else:
+                resource_tracker.unregister(_getTrackerName(shm), "shared_memory")
+        self.blocks = []
+
+
+def _dumpShared(obj):
+    """Pickle an object, passing its arrays through shared memory
+
+    Parameters
+    ----------
+    obj : `object`
+        Object to pickle.
+
+    Returns
+    -------
+    pickled : `bytes`
+        Pickled object; the arrays are in shared memory.
+    """
+    buffer = io.BytesIO()
+    pickler = _SharedMemoryPickler(buffer)
+    try:
+        pickler.dump(obj)
+    except Exception:
+        pickler.release(unlink=True)
+        raise
+    pickler.release()
+    return buffer.getvalue()
+
+
+def _readWorker(cls, filename, kwargs):
+    """Read a file in a worker process
+
+    Parameters
+    ----------
+    cls : `type`
+        Class with a ``readFits`` classmethod.
+    filename : `str`
+        Filename of FITS file.
+    kwargs : `dict`
+        Additional arguments for ``readFits``.
+
+    Returns
+    -------
+    pickled : `bytes`
+        Pickled object; the arrays are in shared memory.
+    """
+    return _dumpShared(cls.readFits(filename, **kwargs))
+
+
+def readFitsMany(cls, filenames, workers=None, **kwargs):
+    """Read many files in parallel worker processes
+
+    The FITS decoding and byte-swapping is done in the workers, and the arrays
+    are handed back through shared memory rather than being pickled.
+
+    Parameters
+    ----------
+    cls : `type`
+        Class with a ``readFits`` classmethod (e.g., `pfs.datamodel.PfsArm`).
+    filenames : iterable of `str`
+        Filenames of FITS files.
+    workers : `int`, optional
+        Number of worker processes. Defaults to the number of CPUs. If ``1``,
+        the files are read serially in this process.
+    **kwargs
+        Additional arguments for ``readFits``. Lazy (memory-mapped) reads
+        are not supported, as the open file can't be handed back from a
+        worker process.
+
+    Returns
+    -------
+    objects : `list`
+        Objects read from the files, in the same order as the filenames.
+
+    Raises
+    ------
+    RuntimeError
+        If a lazy read is requested.
+    """
+    if kwargs.get("lazy", False):
+        raise RuntimeError("Lazy reads are not supported when reading many files; use readFits")
+    filenames = list(filenames)
+    if workers == 1 or len(filenames) <= 1:
+        return [cls.readFits(ff, **kwargs) for ff in filenames]
+
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(_readWorker, cls, ff, kwargs) for ff in filenames]
+        results = []
+        error = None
+        for future in futures:
+            # Unpickle every successful result, even after a failure, so the shared memory is released
+            try:
+                results.append(pickle.loads(future.result()))
+            except Exception as exc:
+                if error is None:
+                    error = exc
+    if error is not None:
+        raise error
+    return results
+
+
+class WriteStatistics(types.SimpleNamespace):
+    """Throughput of a batch write
+
+    Parameters
+    ----------
+    filenames : `list` of `str`
+        Filenames written, in the order of the inputs.
+    numBytes : `int`
+        Total number of bytes written.
+    elapsed : `float`
+        Elapsed (wall-clock) time, seconds.
+    """
+    def __init__(self, filenames, numBytes, elapsed):
+        super().__init__(filenames=filenames, numBytes=numBytes, elapsed=elapsed)
+
+    @property
+    def numFiles(self):
+        """Number of files written"""
+        return len(self.filenames)
+
+    @property
+    def filesPerSecond(self):
+        """Rate of writing files"""
+        return self.numFiles/self.elapsed if self.elapsed > 0 else np.inf
+
+    @property
+    def bytesPerSecond(self):
+        """Rate of writing data"""
+        return self.numBytes/self.elapsed if self.elapsed > 0 else np.inf
+
+    def __str__(self):
+        """Stringify"""
+        return "Wrote %d files (%.1f MB) in %.2f s: %.1f files/s, %.1f MB/s" % (
+            self.numFiles, self.numBytes/1024**2, self.elapsed, self.filesPerSecond,
+            self.bytesPerSecond/1024**2)
+
+
+def _writeWorker(obj, filename, dirName, kwargs):
+    """Write a single object
+
+    Parameters
+    ----------
+    obj : `object`
+        Object with a ``writeFits`` method and ``filename`` property.
+    filename : `str` or `None`
+        Filename to which to write. If `None`, the object's usual filename in
+        ``dirName`` is used.
+    dirName : `str`
+        Directory to which to write, if ``filename`` is not provided.
+    kwargs : `dict`
+        Additional arguments for ``writeFits``.
+
+    Returns
+    -------
+    filename : `str`
+        Filename written.
+    numBytes : `int`
+        Size of file written.
+    """
+    if filename is None:
+        filename = os.path.join(dirName, obj.filename)
+    obj.writeFits(filename, **kwargs)
+    return filename, os.path.getsize(filename)
+
+
+def _zipStrict(objects, filenames):
+    """Iterate over objects and filenames together, requiring equal numbers
+
+    Parameters
+    ----------
+    objects : iterable of `object`
+        Objects to write.
+    filenames : iterable of `str`
+        Filenames to which to write.
+
+    Yields
+    ------
+    obj : `object`
+        Object to write.
+    filename : `str`
+        Filename to which to write.
+
+    Raises
+    ------
+    RuntimeError
+        If the numbers of objects and filenames differ.
+    """
+    if hasattr(objects, "__len__") and hasattr(filenames, "__len__") and len(objects) != len(filenames):
+        raise RuntimeError("Number of objects (%d) and filenames (%d) differ" %
+                           (len(objects), len(filenames)))
+    missing = object()
+    for obj, filename in itertools.zip_longest(objects, filenames, fillvalue=missing):
+        if obj is missing or filename is missing:
+            raise RuntimeError("Numbers of objects and filenames differ")
+        yield obj, filename
+
+
+def writeFitsMany(objects, filenames=None, dirName=".", workers=None, processes=False, **kwargs):
+    """Write many objects in parallel
+
+    This is intended for writing large numbers of small files (e.g.,
+    `pfs.datamodel.PfsSingle`, `pfs.datamodel.PfsObject`), for which the
+    per-file overhead dominates. The headers that are common between files
+    (target type and mask plane documentation, wavelength WCS) are
+    constructed once per worker and shared.
+
+    The objects are consumed lazily, with a limited number in flight at any
+    time, so that a generator (e.g., from
+    `pfs.datamodel.PfsFiberArraySet.extractFibers`) need not be held in memory
+    in its entirety.
+
+    Parameters
+    ----------
+    objects : iterable of `object`
+        Objects to write; these should have ``writeFits`` methods, and (if
+        ``filenames`` is not provided) ``filename`` properties.
+    filenames : iterable of `str`, optional
+        Filenames to which to write. If not provided, the usual filename for
+        each object is used, in ``dirName``.
+    dirName : `str`, optional
+        Directory to which to write, if ``filenames`` is not provided.
+    workers : `int`, optional
+        Number of workers. Defaults to the number of CPUs.
+    processes : `bool`, optional
+        Use worker processes rather than threads? Processes avoid contention
+        for the Python global interpreter lock, but each object must be
+        pickled to be sent to the worker.
+    **kwargs
+        Additional arguments for ``writeFits``.
+
+    Returns
+    -------
+    stats : `WriteStatistics`
+        Filenames written and throughput.
+
+    Raises
+    ------
+    RuntimeError
+        If the numbers of objects and filenames differ. If these are
+        generators, this is only detected when one is exhausted, after the
+        preceding objects have been written.
+    """
+    workers = workers if workers is not None else os.cpu_count()
+    if filenames is None:
+        inputs = ((obj, None) for obj in objects)
+    else:
+        inputs = _zipStrict(objects, filenames)
+
+    start = time.perf_counter()
+    results = []
+    Executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with Executor(workers) as executor:
+        pending = deque()
+        for obj, filename in inputs:
+            pending.append(executor.submit(_writeWorker, obj, filename, dirName, kwargs))
+            if len(pending) >= 2*workers:
+                results.append(pending.popleft().result())
+        while pending:
+            results.append(pending.popleft().result())
+    elapsed = time.perf_counter() - start
+
+    return WriteStatistics([filename for filename, _ in results], sum(size for _, size in results), elapsed)
@@ -2,6 +2,8 @@ import numpy as np
 import os
 import enum
 
+from .utils import findIndices
+
 try:
     import astropy.io.fits as pyfits
 except ImportError:
@@ -113,36 +115,37 @@ class PfsDesign:
     _hduName = "DESIGN"
 
     fileNameFormat = "pfsDesign-0x%016x.fits"
+    fileNameRegex = r"^pfsDesign-0x([0-9a-fA-F]{16})\.fits.*$"
 
     def validate(self):
         """Validate contents
 
-        Ensures the lengths are what is expected.
+        Ensures the lengths are what is expected. The checks are vectorised,
+        but the first offending element is reported.
 
         Raises
         ------
         RuntimeError
             If there are inconsistent lengths.
         ValueError:
-            If the ``targetType`` is not recognised.
+            If the ``targetType`` or ``fiberStatus`` is not recognised.
         """
-        if len(set([len(getattr(self, nn)) for nn in self._keywords])) != 1:
-            raise RuntimeError("Inconsistent lengths: %s" % ({nn: len(getattr(self, nn)) for
-                                                              nn in self._keywords}))
-        for ii, tt in enumerate(self.targetType):
-            try:
-                TargetType(tt)
-            except ValueError as exc:
-                raise ValueError("targetType[%d] = %d is not a recognized TargetType" % (ii, tt)) from exc
-        for ii, tt in enumerate(self.fiberStatus):
-            try:
-                FiberStatus(tt)
-            except ValueError as exc:
-                raise ValueError("fiberStatus[%d] = %d is not a recognised FiberStatus" % (ii, tt)) from exc
-        for ii, (mag, names) in enumerate(zip(self.fiberMag, self.filterNames)):
-            if len(mag) != len(names):
-                raise RuntimeError("Inconsistent lengths between fiberMag (%d) and filterNames (%d) "
-                                   "for fiberId=%d" % (len(mag), len(names), self.fiberId[ii]))
+        numPhotometry = len(self._photometryOffset) - 1  # Avoid constructing the per-fiber lists
+        lengths = {nn: numPhotometry if nn in self._photometry else len(getattr(self, nn)) for
+                   nn in self._keywords}
+        if len(set(lengths.values())) != 1:
+            raise RuntimeError("Inconsistent lengths: %s" % (lengths,))
+        for name, enumType, description in (("targetType", TargetType, "recognized"),
+                                            ("fiberStatus", FiberStatus, "recognised")):
+            values = getattr(self, name)
+            bad = np.nonzero(~np.isin(values, [int(member) for member in enumType]))[0]
+            if len(bad) > 0:
+                ii = bad[0]
+                raise ValueError("%s[%d] = %d is not a %s %s" %
+                                 (name, ii, values[ii], description, enumType.__name__))
+        if len(self._photometryMag) != len(self._photometryFilter):
+            raise RuntimeError("Inconsistent lengths between photometry magnitudes (%d) and filter names "
+                               "(%d)" % (len(self._photometryMag), len(self._photometryFilter)))
         for nn in self._pointFields:
             matrix = getattr(self, nn)
             if matrix.shape != (len(self.fiberId), 2):
@@ -164,15 +167,170 @@ class PfsDesign:
         self.objId = np.array(objId)
         self.targetType = np.array(targetType)
         self.fiberStatus = np.array(fiberStatus)
-        self.fiberMag = [np.array(mags) for mags in fiberMag]
-        self.filterNames = filterNames
         self.pfiNominal = np.array(pfiNominal)
+        self._setPhotometry(fiberMag, filterNames)
+        self._fiberIndex = None
+        self._targetIndex = None
         self.validate()
 
     def __len__(self):
         """Number of fibers"""
         return len(self.fiberId)
 
+    def _setPhotometry(self, fiberMag, filterNames):
+        """Set the photometry from per-fiber lists
+
+        The photometry is stored in columnar form: flat arrays of the
+        magnitudes and filter names, with the offset of the photometry for
+        each fiber into those arrays.
+
+        Parameters
+        ----------
+        fiberMag : `list` of `numpy.ndarray` of `float`
+            Array of fiber magnitudes for each fiber.
+        filterNames : `list` of `list` of `str`
+            List of filters used to measure the fiber magnitudes for each
+            fiber.
+
+        Raises
+        ------
+        RuntimeError
+            If there are inconsistent lengths.
+        """
+        numMags = np.array([len(mags) for mags in fiberMag], dtype=int)
+        numNames = np.array([len(names) for names in filterNames], dtype=int)
+        if len(numMags) != len(self.fiberId) or len(numNames) != len(self.fiberId):
+            lengths = {nn: len(getattr(self, nn)) for nn in self._keywords if nn not in self._photometry}
+            lengths.update(fiberMag=len(numMags), filterNames=len(numNames))
+            raise RuntimeError("Inconsistent lengths: %s" % (lengths,))
+        bad = np.nonzero(numMags != numNames)[0]
+        if len(bad) > 0:
+            ii = bad[0]
+            raise RuntimeError("Inconsistent lengths between fiberMag (%d) and filterNames (%d) "
+                               "for fiberId=%d" % (numMags[ii], numNames[ii], self.fiberId[ii]))
+        self._photometryOffset = np.concatenate(([0], np.cumsum(numMags)))
+        self._photometryMag = np.concatenate([np.asarray(mags, dtype=float) for mags in fiberMag] +
+                                             [np.zeros(0, dtype=float)])
+        self._photometryFilter = np.array([name for names in filterNames for name in names], dtype=str)
+        self._fiberMag = None
+        self._filterNames = None
+
+    def _setColumnarPhotometry(self, fiberIndex, mag, filterName):
+        """Set the photometry from flat arrays
+
+        This is the inverse of ``_getColumnarPhotometry``.
+
+        Parameters
+        ----------
+        fiberIndex : `numpy.ndarray` of `int`
+            Index of the fiber for each measurement.
+        mag : `numpy.ndarray` of `float`
+            Magnitude for each measurement.
+        filterName : `numpy.ndarray` of `str`
+            Filter name for each measurement.
+        """
+        order = np.argsort(fiberIndex, kind="stable")  # Preserve the order of measurements for each fiber
+        counts = np.bincount(fiberIndex, minlength=len(self.fiberId))
+        self._photometryOffset = np.concatenate(([0], np.cumsum(counts)))
+        self._photometryMag = np.asarray(mag, dtype=float)[order]
+        self._photometryFilter = np.asarray(filterName, dtype=str)[order]
+        self._fiberMag = None
+        self._filterNames = None
+
+    def _getColumnarPhotometry(self):
+        """Return the photometry as flat arrays
+
+        Returns
+        -------
+        fiberIndex : `numpy.ndarray` of `int`
+            Index of the fiber for each measurement.
+        mag : `numpy.ndarray` of `float`
+            Magnitude for each measurement.
+        filterName : `numpy.ndarray` of `str`
+            Filter name for each measurement.
+        """
+        fiberIndex = np.repeat(np.arange(len(self.fiberId)), np.diff(self._photometryOffset))
+        return fiberIndex, self._photometryMag, self._photometryFilter
+
+    @property
+    def fiberMag(self):
+        """Array of fiber magnitudes for each fiber
+
+        These are views into the columnar storage of the photometry, so
+        changing the values of an array changes the photometry. Replacing an
+        element of the list has no effect; instead, assign a new list to
+        ``fiberMag``, which must have the same number of magnitudes for each
+        fiber as ``filterNames``.
+
+        Returns
+        -------
+        fiberMag : `list` of `numpy.ndarray` of `float`
+            Array of fiber magnitudes for each fiber.
+        """
+        if self._fiberMag is None:
+            self._fiberMag = np.split(self._photometryMag, self._photometryOffset[1:-1])
+        return self._fiberMag
+
+    @fiberMag.setter
+    def fiberMag(self, fiberMag):
+        self._setPhotometry(fiberMag, self.filterNames)
+
+    @property
+    def filterNames(self):
+        """List of filters used to measure the fiber magnitudes for each fiber
+
+        The lists are generated from the columnar storage of the photometry
+        and cached, so they must be treated as read-only: modifying them
+        does not change the photometry. Instead, assign a new list to
+        ``filterNames``, which must have the same number of filters for each
+        fiber as ``fiberMag``.
+
+        Returns
+        -------
+        filterNames : `list` of `list` of `str`
+            List of filters for each fiber.
+        """
+        if self._filterNames is None:
+            names = self._photometryFilter.tolist()
+            self._filterNames = [names[start:stop] for start, stop in
+                                 zip(self._photometryOffset[:-1], self._photometryOffset[1:])]
+        return self._filterNames
+
+    @filterNames.setter
+    def filterNames(self, filterNames):
+        self._setPhotometry(self.fiberMag, filterNames)
+
+    @property
+    def filters(self):
+        """Names of all filters for which there is photometry
+
+        Returns
+        -------
+        filters : `list` of `str`
+            Sorted names of filters.
+        """
+        return np.unique(self._photometryFilter).tolist()
+
+    def getPhotometry(self, filterName):
+        """Return the fiber magnitudes of all fibers in a single filter
+
+        Parameters
+        ----------
+        filterName : `str`
+            Name of the filter.
+
+        Returns
+        -------
+        fiberMag : `numpy.ndarray` of `float`
+            Fiber magnitude for each fiber; ``NaN`` for fibers without a
+            measurement in the filter.
+        """
+        fiberIndex, mag, filterNames = self._getColumnarPhotometry()
+        select = filterNames == filterName
+        result = np.full(len(self.fiberId), np.nan, dtype=float)
+        result[fiberIndex[select]] = mag[select]
+        return result
+
     def __str__(self):
         """String representation"""
         return "PfsDesign(%d, ...)" % (self.pfsDesignId)
@@ -218,32 +376,49 @@ class PfsDesign:
             raise RuntimeError("I failed to import astropy.io.fits, so cannot read from disk")
 
         with pyfits.open(filename) as fd:
-            phu = fd[0].header
-            raBoresight = phu['RA']
-            decBoresight = phu['DEC']
-            data = fd[cls._hduName].data
+            return cls._fromHduList(fd, **kwargs)
 
-            for nn in cls._fields:
-                assert nn not in kwargs
-                kwargs[nn] = data[nn]
-
-            # Handle fiberStatus explicitly, for backwards compatibility
-            kwargs["fiberStatus"] = (data["fiberStatus"] if "fiberStatus" in (col.name for col in
-                                                                              data.columns) else
-                                     np.full(len(data), FiberStatus.GOOD))
-
-            photometry = fd["PHOTOMETRY"].data
+    @classmethod
+    def _fromHduList(cls, fd, **kwargs):
+        """Construct from an opened FITS file
 
-            fiberId = kwargs["fiberId"]
-            fiberMag = {ii: [] for ii in fiberId}
-            filterNames = {ii: [] for ii in fiberId}
-            for row in photometry:
-                fiberMag[row['fiberId']].append(row['fiberMag'])
-                filterNames[row['fiberId']].append(row['filterName'])
+        Parameters
+        ----------
+        fd : `astropy.io.fits.HDUList`
+            Opened FITS file.
+        **kwargs : `dict`
+            Additional arguments for Ctor (not read from FITS).
 
-        return cls(**kwargs, raBoresight=raBoresight, decBoresight=decBoresight,
-                   fiberMag=[np.array(fiberMag[ii]) for ii in fiberId],
-                   filterNames=[filterNames[ii] for ii in fiberId])
+        Returns
+        -------
+        self : cls
+            Constructed instance.
+        """
+        phu = fd[0].header
+        raBoresight = phu['RA']
+        decBoresight = phu['DEC']
+        data = fd[cls._hduName].data
+
+        for nn in cls._fields:
+            assert nn not in kwargs
+            kwargs[nn] = data[nn]
+
+        # Handle fiberStatus explicitly, for backwards compatibility
+        kwargs["fiberStatus"] = (data["fiberStatus"] if "fiberStatus" in (col.name for col in
+                                                                          data.columns) else
+                                 np.full(len(data), FiberStatus.GOOD))
+
+        photometry = fd["PHOTOMETRY"].data
+        photoFiberId = np.array(photometry["fiberId"])
+        photoMag = np.array(photometry["fiberMag"])
+        photoFilter = np.array(photometry["filterName"], dtype=str)
+
+        numFibers = len(kwargs["fiberId"])
+        self = cls(**kwargs, raBoresight=raBoresight, decBoresight=decBoresight,
+                   fiberMag=[[]]*numFibers, filterNames=[[]]*numFibers)
+        fiberIndex = findIndices(self.fiberId, photoFiberId, "fiberId of %s" % (cls.__name__,))
+        self._setColumnarPhotometry(fiberIndex, photoMag, photoFilter)
+        return self
 
     @classmethod
     def read(cls, pfsDesignId, dirName="."):
@@ -271,6 +446,20 @@ class PfsDesign:
         if not pyfits:
             raise RuntimeError("I failed to import astropy.io.fits, so cannot write to disk")
 
+        fits = self._makeHduList()
+
+        # clobber=True in writeto prints a message, so use open instead
+        with open(filename, "wb") as fd:
+            fits.writeto(fd)
+
+    def _makeHduList(self):
+        """Construct the FITS representation
+
+        Returns
+        -------
+        fits : `astropy.io.fits.HDUList`
+            FITS file, ready for writing.
+        """
         fits = pyfits.HDUList()
 
         hdr = pyfits.Header()
@@ -293,24 +482,16 @@ class PfsDesign:
         columns.append(pyfits.Column(name="fiberStatus", format="J", array=self.fiberStatus))
         fits.append(pyfits.BinTableHDU.from_columns(columns, hdr, name=self._hduName))
 
-        numRows = sum(len(mag) for mag in self.fiberMag)
-        fiberId = np.array(sum(([ii]*len(mags) for ii, mags in zip(self.fiberId, self.fiberMag)), []))
-        fiberMag = np.array(sum((mag.tolist() for mag in self.fiberMag), []))
-        filterNames = sum(self.filterNames, [])
-        assert(len(fiberId) == numRows)
-        assert(len(fiberMag) == numRows)
-        assert(len(filterNames) == numRows)
-        maxLength = max(len(ff) for ff in filterNames) if filterNames else 1
+        fiberIndex, fiberMag, filterNames = self._getColumnarPhotometry()
+        fiberId = self.fiberId[fiberIndex]
+        maxLength = max(np.char.str_len(filterNames).max(initial=1), 1)
 
         fits.append(pyfits.BinTableHDU.from_columns([
             pyfits.Column(name='fiberId', format='J', array=fiberId),
             pyfits.Column(name='fiberMag', format='E', array=fiberMag),
             pyfits.Column(name='filterName', format='A%d' % maxLength, array=filterNames),
         ], hdr, name='PHOTOMETRY'))
-
-        # clobber=True in writeto prints a message, so use open instead
-        with open(filename, "wb") as fd:
-            fits.writeto(fd)
+        return fits
 
     def write(self, dirName=".", fileName=None):
         """Write to file
@@ -351,8 +532,7 @@ class PfsDesign:
         select = self.targetType == targetType
         if fiberId is None:
             return np.nonzero(select)[0]
-        selected = set(self.fiberId[select])
-        return np.array([ii for ii, ff in enumerate(fiberId) if ff in selected])
+        return np.nonzero(np.isin(fiberId, self.fiberId[select]))[0]
 
     def selectByFiberStatus(self, fiberStatus, fiberId=None):
         """Select fibers by ``fiberStatus``
@@ -376,8 +556,118 @@ class PfsDesign:
         select = self.fiberStatus == fiberStatus
         if fiberId is None:
             return np.nonzero(select)[0]
-        selected = set(self.fiberId[select])
-        return np.array([ii for ii, ff in enumerate(fiberId) if ff in selected])
+        return np.nonzero(np.isin(fiberId, self.fiberId[select]))[0]
+
+    @staticmethod
+    def _makeTargetKeys(catId, tract, patchIndex, objId):
+        """Make composite keys for target identities
+
+        Parameters
+        ----------
+        catId, tract, patchIndex, objId : array-like of `int`
+            Catalog identifier, tract, index of the patch name in a list of
+            patches, and object identifier for each target.
+
+        Returns
+        -------
+        keys : `numpy.ndarray` of structured type
+            Composite keys, which sort lexically.
+        """
+        catId, tract, patchIndex, objId = np.broadcast_arrays(catId, tract, patchIndex, objId)
+        keys = np.empty(catId.shape, dtype=[("catId", np.int64), ("tract", np.int64),
+                                            ("patch", np.int64), ("objId", np.int64)])
+        keys["catId"] = catId
+        keys["tract"] = tract
+        keys["patch"] = patchIndex
+        keys["objId"] = objId
+        return keys
+
+    def _getTargetIndex(self):
+        """Return the index of target identities
+
+        The index is built on first use, and rebuilt if any of the ``catId``,
+        ``tract``, ``patch`` or ``objId`` arrays has been replaced (they
+        should not be modified in place).
+
+        Returns
+        -------
+        patches : `numpy.ndarray` of `str`
+            Sorted unique patch names.
+        sortedKeys : `numpy.ndarray` of structured type
+            Sorted composite keys of the targets.
+        sorter : `numpy.ndarray` of `int`
+            Indices that sort the composite keys.
+        """
+        arrays = (self.catId, self.tract, self.patch, self.objId)
+        if self._targetIndex is None or any(old is not new for old, new in zip(self._targetIndex[0], arrays)):
+            patches, patchIndex = np.unique(np.asarray(self.patch, dtype=str), return_inverse=True)
+            keys = self._makeTargetKeys(self.catId, self.tract, patchIndex, self.objId)
+            sorter = np.argsort(keys, kind="stable")
+            self._targetIndex = (arrays, patches, keys[sorter], sorter)
+        return self._targetIndex[1:]
+
+    def selectTargets(self, catId, tract, patch, objId, allowMissing=False):
+        """Select fibers by target, for many targets at once
+
+        The targets are looked up in an index of the composite key
+        (``catId``, ``tract``, ``patch``, ``objId``), which is built on first
+        use. The arguments are broadcast against each other.
+
+        Parameters
+        ----------
+        catId : array-like of `int`
+            Catalog identifiers.
+        tract : array-like of `int`
+            Tract identifiers.
+        patch : array-like of `str`
+            Patch names.
+        objId : array-like of `int`
+            Object identifiers.
+        allowMissing : `bool`, optional
+            Allow targets that are not present? If so, the index for each
+            missing target is ``-1``.
+
+        Returns
+        -------
+        index : `numpy.ndarray` of `int`
+            Index of each target.
+
+        Raises
+        ------
+        RuntimeError
+            If any of the targets is present more than once, or (unless
+            ``allowMissing``) not at all. All such targets are reported.
+        """
+        catId, tract, patch, objId = np.broadcast_arrays(np.atleast_1d(catId), np.atleast_1d(tract),
+                                                         np.atleast_1d(np.asarray(patch, dtype=str)),
+                                                         np.atleast_1d(objId))
+        patches, sortedKeys, sorter = self._getTargetIndex()
+        patchIndex = np.searchsorted(patches, patch)
+        if len(patches) > 0:
+            knownPatch = patches[np.minimum(patchIndex, len(patches) - 1)] == patch
+            patchIndex = np.where(knownPatch, patchIndex, -1)  # -1 matches no target
+        keys = self._makeTargetKeys(catId, tract, patchIndex, objId)
+
+        left = np.searchsorted(sortedKeys, keys, side="left")
+        right = np.searchsorted(sortedKeys, keys, side="right")
+        count = right - left
+
+        def getTargets(select):
+            """Return the identities of the selected targets"""
+            return list(zip(catId[select].tolist(), tract[select].tolist(), patch[select].tolist(),
+                            objId[select].tolist()))
+
+        if np.any(count > 1):
+            raise RuntimeError("Non-unique selection of targets (catId, tract, patch, objId) in %s: %s" %
+                               (self, getTargets(count > 1)))
+        if not allowMissing and np.any(count == 0):
+            raise RuntimeError("Unable to find targets (catId, tract, patch, objId) in %s: %s" %
+                               (self, getTargets(count == 0)))
+
+        index = np.full(len(keys), -1, dtype=int)
+        found = count == 1
+        index[found] = sorter[left[found]]
+        return index
 
     def selectTarget(self, catId, tract, patch, objId):
         """Select fiber by target
@@ -400,11 +690,25 @@ class PfsDesign:
         index : `int`
             Index of selected target.
         """
-        index = np.argwhere((self.catId == catId) & (self.tract == tract) &
-                            (self.patch == patch) & (self.objId == objId))
-        if len(index) != 1:
-            raise RuntimeError("Non-unique selection of target: %s" % (index,))
-        return index[0][0]
+        return int(self.selectTargets(catId, tract, patch, objId)[0])
+
+    def _getFiberIndex(self):
+        """Return the index of fiber identifiers
+
+        The index is built on first use, and rebuilt if the ``fiberId`` array
+        has been replaced (it should not be modified in place).
+
+        Returns
+        -------
+        sortedFiberId : `numpy.ndarray` of `int`
+            Sorted fiber identifiers.
+        sorter : `numpy.ndarray` of `int`
+            Indices that sort the fiber identifiers.
+        """
+        if self._fiberIndex is None or self._fiberIndex[0] is not self.fiberId:
+            sorter = np.argsort(self.fiberId, kind="stable")
+            self._fiberIndex = (self.fiberId, self.fiberId[sorter], sorter)
+        return self._fiberIndex[1:]
 
     def selectFiber(self, fiberId):
         """Select fiber(s) by fiber identifier
@@ -413,22 +717,32 @@ class PfsDesign:
 
         Parameters
         ----------
-        fiberId : iterable of `int`
+        fiberId : `int` or iterable of `int`
             Fiber identifiers to select.
 
         Returns
         -------
-        index : array-like of `int`
-            Indices for fiber.
-        """
-        def impl(fiberId):
-            """Implementation: get index of fiber"""
-            return np.nonzero(self.fiberId == fiberId)[0]
+        index : `int` or `numpy.ndarray` of `int`
+            Indices for fiber(s).
 
+        Raises
+        ------
+        RuntimeError
+            If any of the fibers is not present exactly once. All such fibers
+            are reported.
+        """
         try:
-            return np.array([impl(ff) for ff in fiberId])
+            fiberId = np.asarray(fiberId if isinstance(fiberId, np.ndarray) else list(fiberId))
         except TypeError:  # fiberId is not iterable
-            return impl(fiberId)
+            return int(self.selectFiber([fiberId])[0])
+        sortedFiberId, sorter = self._getFiberIndex()
+        left = np.searchsorted(sortedFiberId, fiberId, side="left")
+        right = np.searchsorted(sortedFiberId, fiberId, side="right")
+        bad = (right - left) != 1
+        if np.any(bad):
+            raise RuntimeError("Number of fibers in %s is not unity for fiberId=%s (%s)" %
+                               (self, fiberId[bad].tolist(), (right - left)[bad].tolist()))
+        return sorter[left]
 
     def getIdentityFromIndex(self, index):
         """Return the identity of the target indicated by the index
@@ -481,8 +795,7 @@ class PfsDesign:
         nominal : `numpy.ndarray` of shape ``(N, 2)``
             Nominal position for each fiber.
         """
-        index = np.array([np.argwhere(self.fiberId == ff)[0][0] for ff in fiberId])
-        return self.pfiNominal[index]
+        return self.pfiNominal[self.selectFiber(fiberId)]
 
 
 class PfsConfig(PfsDesign):
@@ -552,6 +865,7 @@ class PfsConfig(PfsDesign):
     _hduName = "CONFIG"
 
     fileNameFormat = "pfsConfig-0x%016x-%06d.fits"
+    fileNameRegex = r"^pfsConfig-0x([0-9a-fA-F]{16})-(\d{6})\.fits.*$"
 
     def __init__(self, pfsDesignId, visit0, raBoresight, decBoresight,
                  fiberId, tract, patch, ra, dec, catId, objId,
@@ -571,7 +885,7 @@ class PfsConfig(PfsDesign):
         return self.fileNameFormat % (self.pfsDesignId, self.visit0)
 
     @classmethod
-    def fromPfsDesign(cls, pfsDesign, visit0, pfiCenter):
+    def fromPfsDesign(cls, pfsDesign, visit0, pfiCenter, fiberStatus=None, copy=True):
         """Construct from a ``PfsDesign``
 
         Parameters
@@ -582,15 +896,38 @@ class PfsConfig(PfsDesign):
             Exposure identifier.
         pfiCenter : `numpy.ndarray` of `float`
             Actual position (2-vector) of each fiber on the PFI, microns.
+        fiberStatus : `numpy.ndarray` of `int`, optional
+            Status of each fiber. Defaults to the ``fiberStatus`` of the
+            ``pfsDesign``.
+        copy : `bool`, optional
+            Copy the arrays of the ``pfsDesign``? If not, the ``PfsConfig``
+            is a cheap view that shares the arrays (and photometry, and
+            lookup indices) of the ``pfsDesign``, so neither should be
+            modified.
 
         Returns
         -------
         self : `PfsConfig`
             Constructed ``PfsConfig`.
         """
+        if fiberStatus is None:
+            fiberStatus = pfsDesign.fiberStatus
+        if not copy:
+            self = cls.__new__(cls)
+            for name in ("pfsDesignId", "raBoresight", "decBoresight", "_photometryOffset", "_photometryMag",
+                         "_photometryFilter", "_fiberMag", "_filterNames", "_fiberIndex", "_targetIndex"):
+                setattr(self, name, getattr(pfsDesign, name))
+            for name in PfsDesign._fields:
+                setattr(self, name, getattr(pfsDesign, name))
+            self.visit0 = visit0
+            self.fiberStatus = np.asarray(fiberStatus)
+            self.pfiCenter = np.asarray(pfiCenter)
+            self.validate()
+            return self
+
         keywords = ["pfsDesignId", "raBoresight", "decBoresight"]
         kwargs = {kk: getattr(pfsDesign, kk) for kk in pfsDesign._keywords + keywords}
-        kwargs["fiberStatus"] = pfsDesign.fiberStatus
+        kwargs["fiberStatus"] = fiberStatus
         kwargs["visit0"] = visit0
         kwargs["pfiCenter"] = pfiCenter
         return PfsConfig(**kwargs)
@@ -632,5 +969,4 @@ class PfsConfig(PfsDesign):
         centers : `numpy.ndarray` of shape ``(N, 2)``
             Center of each fiber.
         """
-        index = np.array([np.argwhere(self.fiberId == ff)[0][0] for ff in fiberId])
-        return self.pfiCenter[index]
+        return self.pfiCenter[self.selectFiber(fiberId)]
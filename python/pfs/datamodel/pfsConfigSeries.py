@@ -0,0 +1,333 @@
+import os
+
+import numpy as np
+
+from .pfsConfig import PfsDesign, PfsConfig
+
+__all__ = ("PfsConfigSeries",)
+
+
+def _arraysEqual(lhs, rhs):
+    """Are two arrays equal, treating ``NaN`` values as equal?
+
+    Parameters
+    ----------
+    lhs, rhs : array-like
+        Arrays to compare.
+
+    Returns
+    -------
+    equal : `bool`
+        Are the arrays equal?
+    """
+    lhs = np.asarray(lhs)
+    rhs = np.asarray(rhs)
+    if lhs.dtype.kind == "f" and rhs.dtype.kind == "f":
+        return np.array_equal(lhs, rhs, equal_nan=True)
+    return np.array_equal(lhs, rhs)
+
+
+def _toNative(array):
+    """Convert an array to the native byte order
+
+    FITS data are big-endian, which is slow to operate on (and is rejected
+    by some libraries) on little-endian machines.
+
+    Parameters
+    ----------
+    array : `numpy.ndarray`
+        Array to convert.
+
+    Returns
+    -------
+    array : `numpy.ndarray`
+        Array in the native byte order; the input, if it already is.
+    """
+    if array.dtype.isnative:
+        return array
+    return array.astype(array.dtype.newbyteorder("="))
+
+
+class PfsConfigSeries:
+    """The configurations of the PFS top-end for many visits of a single design
+
+    The design (including the photometry) is stored once, and only the
+    quantities that differ from visit to visit (``pfiCenter`` and
+    ``fiberStatus``) are stored for each visit, as cubes of
+    ``visits`` x ``fibers``. The `pfs.datamodel.PfsConfig` of each visit is
+    available as a cheap view that shares the arrays of the design.
+
+    Parameters
+    ----------
+    pfsDesign : `pfs.datamodel.PfsDesign`
+        Design common to all the visits.
+    visit0 : `numpy.ndarray` of `int`, shape ``(numVisits,)``
+        Exposure identifier for each visit.
+    pfiCenter : `numpy.ndarray` of `float`, shape ``(numVisits, numFibers, 2)``
+        Actual position (2-vector) of each fiber on the PFI for each visit,
+        microns.
+    fiberStatus : `numpy.ndarray` of `int`, shape ``(numVisits, numFibers)``, optional
+        Status of each fiber for each visit. Defaults to the ``fiberStatus``
+        of the ``pfsDesign`` for every visit.
+    """
+    fileNameFormat = "pfsConfigSeries-0x%016x.fits"
+
+    def __init__(self, pfsDesign, visit0, pfiCenter, fiberStatus=None):
+        self.pfsDesign = pfsDesign
+        self.visit0 = np.array(visit0, dtype=int).reshape(-1)
+        numVisits = len(self.visit0)
+        numFibers = len(pfsDesign)
+        self.pfiCenter = np.array(pfiCenter, dtype=float).reshape(numVisits, numFibers, 2)
+        if fiberStatus is None:
+            fiberStatus = np.broadcast_to(pfsDesign.fiberStatus, (numVisits, numFibers))
+        self.fiberStatus = np.array(fiberStatus, dtype=np.int32).reshape(numVisits, numFibers)
+        if len(set(self.visit0.tolist())) != numVisits:
+            raise RuntimeError("Duplicate visit0 in %s" % (self.visit0,))
+
+    @property
+    def pfsDesignId(self):
+        """PFI design identifier"""
+        return self.pfsDesign.pfsDesignId
+
+    @property
+    def filename(self):
+        """Usual filename"""
+        return self.fileNameFormat % (self.pfsDesignId,)
+
+    def __len__(self):
+        """Number of visits"""
+        return len(self.visit0)
+
+    def __str__(self):
+        """String representation"""
+        return "%s(%d, %d visits)" % (self.__class__.__name__, self.pfsDesignId, len(self))
+
+    def __getitem__(self, index):
+        """Get the configuration for a visit, by index
+
+        Parameters
+        ----------
+        index : `int`
+            Index of the visit.
+
+        Returns
+        -------
+        pfsConfig : `pfs.datamodel.PfsConfig`
+            Configuration for the visit; this is a view that shares the
+            arrays of the design, so it should not be modified.
+        """
+        return PfsConfig.fromPfsDesign(self.pfsDesign, int(self.visit0[index]), self.pfiCenter[index],
+                                       self.fiberStatus[index], copy=False)
+
+    def __iter__(self):
+        """Iterate over the configurations for each visit"""
+        return (self[ii] for ii in range(len(self)))
+
+    def getConfig(self, visit0):
+        """Get the configuration for a visit
+
+        Parameters
+        ----------
+        visit0 : `int`
+            Exposure identifier.
+
+        Returns
+        -------
+        pfsConfig : `pfs.datamodel.PfsConfig`
+            Configuration for the visit; this is a view that shares the
+            arrays of the design, so it should not be modified.
+        """
+        index = np.nonzero(self.visit0 == visit0)[0]
+        if len(index) != 1:
+            raise RuntimeError("Visit %d is not present in %s" % (visit0, self))
+        return self[index[0]]
+
+    @staticmethod
+    def _checkDesign(pfsDesign, pfsConfig):
+        """Check that a configuration is of a design
+
+        Parameters
+        ----------
+        pfsDesign : `pfs.datamodel.PfsDesign`
+            Design.
+        pfsConfig : `pfs.datamodel.PfsConfig`
+            Configuration to check.
+
+        Raises
+        ------
+        RuntimeError
+            If the configuration differs from the design in anything other
+            than ``visit0``, ``pfiCenter`` or ``fiberStatus``.
+        """
+        different = [name for name in ("pfsDesignId", "raBoresight", "decBoresight") if
+                     getattr(pfsDesign, name) != getattr(pfsConfig, name)]
+        different += [name for name in PfsDesign._fields if
+                      not _arraysEqual(getattr(pfsDesign, name), getattr(pfsConfig, name))]
+        if any(not _arraysEqual(lhs, rhs) for lhs, rhs in
+               zip(pfsDesign._getColumnarPhotometry(), pfsConfig._getColumnarPhotometry())):
+            different.append("photometry")
+        if different:
+            raise RuntimeError("%s differs from the design of %s in %s" % (pfsConfig, pfsDesign, different))
+
+    @classmethod
+    def fromPfsConfigs(cls, pfsConfigs):
+        """Construct from the configurations of individual visits
+
+        Parameters
+        ----------
+        pfsConfigs : iterable of `pfs.datamodel.PfsConfig`
+            Configurations for each visit; these must all be of the same
+            design.
+
+        Returns
+        -------
+        self : `PfsConfigSeries`
+            Constructed series.
+
+        Raises
+        ------
+        RuntimeError
+            If there are no configurations, or they are of different designs.
+        """
+        pfsConfigs = list(pfsConfigs)
+        if not pfsConfigs:
+            raise RuntimeError("No configurations provided")
+        first = pfsConfigs[0]
+        kwargs = {name: getattr(first, name) for name in PfsDesign._fields}
+        pfsDesign = PfsDesign(first.pfsDesignId, first.raBoresight, first.decBoresight,
+                              fiberStatus=first.fiberStatus, fiberMag=[[]]*len(first),
+                              filterNames=[[]]*len(first), **kwargs)
+        pfsDesign._setColumnarPhotometry(*first._getColumnarPhotometry())
+        for pfsConfig in pfsConfigs[1:]:
+            cls._checkDesign(pfsDesign, pfsConfig)
+        return cls(pfsDesign, [pfsConfig.visit0 for pfsConfig in pfsConfigs],
+                   np.array([pfsConfig.pfiCenter for pfsConfig in pfsConfigs]),
+                   np.array([pfsConfig.fiberStatus for pfsConfig in pfsConfigs]))
+
+    def append(self, pfsConfig):
+        """Add the configuration for a visit
+
+        Parameters
+        ----------
+        pfsConfig : `pfs.datamodel.PfsConfig`
+            Configuration to add; this must be of our design.
+
+        Raises
+        ------
+        RuntimeError
+            If the configuration is of a different design, or the visit is
+            already present.
+        """
+        self._checkDesign(self.pfsDesign, pfsConfig)
+        if pfsConfig.visit0 in self.visit0:
+            raise RuntimeError("Visit %d is already present in %s" % (pfsConfig.visit0, self))
+        self.visit0 = np.append(self.visit0, pfsConfig.visit0)
+        self.pfiCenter = np.concatenate((self.pfiCenter, [pfsConfig.pfiCenter]))
+        self.fiberStatus = np.concatenate((self.fiberStatus, [pfsConfig.fiberStatus]))
+
+    @classmethod
+    def readPfsConfigs(cls, pfsDesignId, visit0, dirName="."):
+        """Construct from the ``pfsConfig`` files of individual visits
+
+        Parameters
+        ----------
+        pfsDesignId : `int`
+            PFI design identifier, specifies the intended top-end configuration.
+        visit0 : iterable of `int`
+            Exposure identifiers.
+        dirName : `str`, optional
+            Directory from which to read the files. Defaults to the current
+            directory.
+
+        Returns
+        -------
+        self : `PfsConfigSeries`
+            Constructed series.
+        """
+        return cls.fromPfsConfigs(PfsConfig.read(pfsDesignId, vv, dirName=dirName) for vv in visit0)
+
+    def writePfsConfigs(self, dirName="."):
+        """Write the ``pfsConfig`` files of the individual visits
+
+        Parameters
+        ----------
+        dirName : `str`, optional
+            Directory to which to write the files. Defaults to the current
+            directory.
+        """
+        for pfsConfig in self:
+            pfsConfig.write(dirName=dirName)
+
+    @classmethod
+    def _readImpl(cls, filename):
+        """Implementation for reading from file
+
+        Parameters
+        ----------
+        filename : `str`
+            Full path for file to read.
+
+        Returns
+        -------
+        self : `PfsConfigSeries`
+            Constructed series.
+        """
+        import astropy.io.fits
+        with astropy.io.fits.open(filename) as fd:
+            pfsDesign = PfsDesign._fromHduList(fd, pfsDesignId=fd[0].header["W_PFDSGN"])
+            visit0 = _toNative(fd["VISIT0"].data["visit0"])
+            pfiCenter = _toNative(fd["PFICENTER"].data)
+            fiberStatus = _toNative(fd["FIBERSTATUS"].data)
+        # The arrays of the design are shared by the configuration of every visit
+        for name in list(PfsDesign._fields) + ["fiberStatus"]:
+            value = getattr(pfsDesign, name)
+            if isinstance(value, np.ndarray):
+                setattr(pfsDesign, name, _toNative(value))
+        return cls(pfsDesign, visit0, pfiCenter, fiberStatus)
+
+    @classmethod
+    def read(cls, pfsDesignId, dirName="."):
+        """Construct from file
+
+        Parameters
+        ----------
+        pfsDesignId : `int`
+            PFI design identifier, specifies the intended top-end configuration.
+        dirName : `str`, optional
+            Directory from which to read the file. Defaults to the current
+            directory.
+
+        Returns
+        -------
+        self : `PfsConfigSeries`
+            Constructed series.
+        """
+        return cls._readImpl(os.path.join(dirName, cls.fileNameFormat % (pfsDesignId,)))
+
+    def write(self, dirName=".", fileName=None):
+        """Write to file
+
+        The file contains the ``PfsDesign`` HDUs, followed by the
+        ``VISIT0`` table and ``PFICENTER`` and ``FIBERSTATUS`` cubes.
+
+        Parameters
+        ----------
+        dirName : `str`, optional
+            Directory to which to write the file. Defaults to the current
+            directory.
+        fileName : `str`, optional
+            Filename to which to write. Defaults to using the filename template.
+        """
+        import astropy.io.fits
+        if fileName is None:
+            fileName = self.filename
+        fits = self.pfsDesign._makeHduList()
+        fits[0].header["W_PFDSGN"] = (self.pfsDesignId, "PFI design identifier")
+        fits.append(astropy.io.fits.BinTableHDU.from_columns([
+            astropy.io.fits.Column(name="visit0", format="J", array=self.visit0),
+        ], name="VISIT0"))
+        # Stored as float32, like the pfiCenter column of a pfsConfig file
+        fits.append(astropy.io.fits.ImageHDU(self.pfiCenter.astype(np.float32), name="PFICENTER"))
+        fits.append(astropy.io.fits.ImageHDU(self.fiberStatus.astype(np.int32), name="FIBERSTATUS"))
+        with open(os.path.join(dirName, fileName), "wb") as fd:
+            fits.writeto(fd)
@@ -1,7 +1,8 @@
 from .pfsSimpleSpectrum import PfsSimpleSpectrum
-from .utils import wraparoundNVisit, inheritDocstrings
+from .utils import wraparoundNVisit, inheritDocstrings, createImageHDU
 from .fluxTable import FluxTable
 from .observations import Observations
+from .covariance import BandedCovariance
 
 
 @inheritDocstrings
@@ -53,6 +54,11 @@ class PfsFiberArray(PfsSimpleSpectrum):
         """Variance in the flux"""
         return self.covar[0]
 
+    @property
+    def covariance(self):
+        """Banded covariance, for linear algebra"""
+        return BandedCovariance(self.covar)
+
     def getIdentity(self):
         """Return the identity of the spectrum
 
@@ -116,7 +122,7 @@ class PfsFiberArray(PfsSimpleSpectrum):
         data["fluxTable"] = fluxTable
         return data
 
-    def _writeImpl(self, fits):
+    def _writeImpl(self, fits, compress=False, quantizeLevel=None, compactMask=False):
         """Implementation for writing to FITS file
 
         Parameters
@@ -124,12 +130,18 @@ class PfsFiberArray(PfsSimpleSpectrum):
         fits : `astropy.io.fits.HDUList`
             List of FITS HDUs. This has a Primary HDU already, the header of
             which may be supplemented with additional keywords.
+        compress : `bool`, optional
+            Tile-compress the images?
+        quantizeLevel : `float`, optional
+            Quantization level for lossy compression of floating-point images.
+        compactMask : `bool`, optional
+            Write the masks with the narrowest integer type that can hold them?
         """
-        from astropy.io.fits import ImageHDU
-        header = super()._writeImpl(fits)
-        fits.append(ImageHDU(self.sky, header=header, name="SKY"))
-        fits.append(ImageHDU(self.covar, header=header, name="COVAR"))
-        fits.append(ImageHDU(self.covar2, name="COVAR2"))
+        header = super()._writeImpl(fits, compress=compress, quantizeLevel=quantizeLevel,
+                                    compactMask=compactMask)
+        fits.append(createImageHDU(self.sky, "SKY", header, compress, quantizeLevel))
+        fits.append(createImageHDU(self.covar, "COVAR", header, compress, quantizeLevel))
+        fits.append(createImageHDU(self.covar2, "COVAR2", None, compress, quantizeLevel))
         self.observations.toFits(fits)
         if self.fluxTable is not None:
-            self.fluxTable.toFits(fits)
+            self.fluxTable.toFits(fits, compactMask=compactMask)
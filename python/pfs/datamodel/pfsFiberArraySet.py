@@ -1,12 +1,18 @@
 import os
 import re
+from collections.abc import Sequence
 import numpy as np
 
-from .utils import astropyHeaderToDict, astropyHeaderFromDict, inheritDocstrings
+from .utils import astropyHeaderToDict, astropyHeaderFromDict, inheritDocstrings, findIndices
+from .utils import createImageHDU
 from .masks import MaskHelper
 from .target import Target
 from .observations import Observations
 from .identity import Identity
+from .parallel import readFitsMany
+from .covariance import BandedCovariance
+from .wavelengthPolynomial import WavelengthPolynomial
+from .interpolate import resampleSpectra
 
 __all__ = ["PfsFiberArraySet"]
 
@@ -25,8 +31,9 @@ class PfsFiberArraySet:
         Identity of the data.
     fiberId : `numpy.ndarray` of `int`
         Fiber identifiers for each spectrum.
-    wavelength : `numpy.ndarray` of `float`
-        Array of wavelengths for each spectrum.
+    wavelength : `numpy.ndarray` of `float`, or `pfs.datamodel.WavelengthPolynomial`
+        Array of wavelengths for each spectrum, or the wavelength solutions
+        from which the array is generated (when first used).
     flux : `numpy.ndarray` of `float`
         Array of fluxes for each spectrum.
     mask : `numpy.ndarray` of `int`
@@ -55,6 +62,9 @@ class PfsFiberArraySet:
 
     Keys should be in the same order as for the regex.
     """
+    _fits = None  # Open file backing a lazy read
+    _wavelength = None  # Wavelength array; None until generated from the model
+    _wavelengthModel = None  # Wavelength solutions (WavelengthPolynomial), if known
 
     def __init__(self, identity, fiberId, wavelength, flux, mask, sky, covar, flags, metadata):
         self.identity = identity
@@ -73,18 +83,52 @@ class PfsFiberArraySet:
 
     def validate(self):
         """Validate that all the arrays are of the expected shape"""
+        wavelength = self._wavelength if self._wavelength is not None else self._wavelengthModel
         assert self.fiberId.shape == (self.numSpectra,)
-        assert self.wavelength.shape == (self.numSpectra, self.length)
+        assert wavelength.shape == (self.numSpectra, self.length)
         assert self.flux.shape == (self.numSpectra, self.length)
         assert self.mask.shape == (self.numSpectra, self.length)
         assert self.sky.shape == (self.numSpectra, self.length)
         assert self.covar.shape == (self.numSpectra, 3, self.length)
 
+    @property
+    def wavelength(self):
+        """Array of wavelengths for each spectrum
+
+        If the spectra were constructed with (or read with) wavelength
+        solutions, the array is generated when first used.
+        """
+        if self._wavelength is None:
+            self._wavelength = self._wavelengthModel.evaluate()
+        return self._wavelength
+
+    @wavelength.setter
+    def wavelength(self, wavelength):
+        if isinstance(wavelength, WavelengthPolynomial):
+            self._wavelengthModel = wavelength
+            self._wavelength = None
+        else:
+            self._wavelengthModel = None
+            self._wavelength = wavelength
+
+    @property
+    def wavelengthModel(self):
+        """Wavelength solutions (`pfs.datamodel.WavelengthPolynomial`)
+
+        This is `None` if the wavelength was provided as an array.
+        """
+        return self._wavelengthModel
+
     @property
     def variance(self):
         """Shortcut for variance"""
         return self.covar[:, 0, :]
 
+    @property
+    def covariance(self):
+        """Banded covariance, for linear algebra on all spectra at once"""
+        return BandedCovariance(self.covar)
+
     def __len__(self):
         """Return number of spectra"""
         return self.numSpectra
@@ -139,36 +183,165 @@ class PfsFiberArraySet:
         return Identity.fromDict({kk: tt(vv) for (kk, tt), vv in zip(cls.filenameKeys, matches.groups())})
 
     @classmethod
-    def readFits(cls, filename):
+    def readFits(cls, filename, lazy=False, fiberId=None, wavelengthRange=None, pixels=None):
         """Read from FITS file
 
         This API is intended for use by the LSST data butler, which handles
         translating the desired identity into a filename.
 
+        A subset of the spectra may be read by specifying ``fiberId`` and/or
+        one of ``wavelengthRange`` or ``pixels``. Only the requested rows and
+        columns of each image HDU are read from the file.
+
         Parameters
         ----------
         filename : `str`
             Filename of FITS file.
+        lazy : `bool`, optional
+            Memory-map the image HDUs instead of reading them? If set, each
+            array attribute is a view onto the file that is only paged in
+            when it is touched, and the file is held open until ``close`` is
+            called (or the object is used as a context manager). Cannot be
+            combined with reading a subset.
+        fiberId : iterable of `int`, optional
+            Fiber identifiers to read, in the order desired.
+        wavelengthRange : `tuple` of `float`, optional
+            Minimum and maximum wavelength to read. The pixels read are those
+            for which any of the selected spectra falls within the range.
+        pixels : `slice`, optional
+            Range of pixels to read.
 
         Returns
         -------
         self : ``cls``
             Constructed instance, from FITS file.
+
+        Raises
+        ------
+        RuntimeError
+            If any of the requested ``fiberId`` are not present, if both
+            ``wavelengthRange`` and ``pixels`` are specified, or if ``lazy``
+            is combined with reading a subset.
         """
+        if wavelengthRange is not None and pixels is not None:
+            raise RuntimeError("Cannot specify both wavelengthRange and pixels")
+        subset = fiberId is not None or wavelengthRange is not None or pixels is not None
+        if lazy and subset:
+            raise RuntimeError("Cannot read a subset lazily")
+
         data = {}
         import astropy.io.fits
-        with astropy.io.fits.open(filename) as fd:
+        fd = astropy.io.fits.open(filename, memmap=lazy, lazy_load_hdus=lazy)
+        try:
             data["metadata"] = astropyHeaderToDict(fd[0].header)
-            for attr in ("fiberId", "wavelength", "flux", "mask", "sky", "covar"):
-                hduName = attr.upper()
-                data[attr] = fd[hduName].data
+            if subset:
+                data.update(cls._readSubset(fd, fiberId, wavelengthRange, pixels))
+            else:
+                for attr in ("fiberId", "flux", "mask", "sky", "covar"):
+                    hduName = attr.upper()
+                    data[attr] = fd[hduName].data
+                hdu = fd["WAVELENGTH"]
+                data["wavelength"] = WavelengthPolynomial.fromFits(hdu) or hdu.data
             data["identity"] = Identity.fromFits(fd)
+        except Exception:
+            fd.close()
+            raise
+        if not lazy:
+            fd.close()
 
         data["flags"] = MaskHelper.fromFitsHeader(data["metadata"])
-        return cls(**data)
+        data["mask"] = data["flags"].widen(data["mask"])
+        self = cls(**data)
+        if lazy:
+            self._fits = fd
+        return self
+
+    @staticmethod
+    def _readSubset(fits, fiberId=None, wavelengthRange=None, pixels=None):
+        """Read a subset of the image HDUs
+
+        Uses section access, so that only the required parts of each image are
+        read from disk.
+
+        Parameters
+        ----------
+        fits : `astropy.io.fits.HDUList`
+            Opened FITS file.
+        fiberId : iterable of `int`, optional
+            Fiber identifiers to read, in the order desired.
+        wavelengthRange : `tuple` of `float`, optional
+            Minimum and maximum wavelength to read.
+        pixels : `slice`, optional
+            Range of pixels to read.
+
+        Returns
+        -------
+        data : `dict` (`str`: `numpy.ndarray`)
+            Arrays read, indexed by attribute name.
+        """
+        allFiberId = fits["FIBERID"].data
+        if fiberId is None:
+            rows = slice(None)
+        else:
+            rows = findIndices(allFiberId, np.atleast_1d(fiberId), "fiberId of %s" % (fits.filename(),))
+            if len(rows) > 0 and np.all(np.diff(rows) == 1):
+                rows = slice(rows[0], rows[-1] + 1)
+
+        wavelengthModel = WavelengthPolynomial.fromFits(fits["WAVELENGTH"])
+
+        def readImage(hduName, columns):
+            """Read the selected rows and columns of an image"""
+            if hduName == "WAVELENGTH" and wavelengthModel is not None:
+                return wavelengthModel.evaluate(rows, columns)
+            hdu = fits[hduName]
+            section = hdu.section
+            middle = (slice(None),)*(len(hdu.shape) - 2)
+            if isinstance(rows, slice):
+                return section[(rows,) + middle + (columns,)]
+            if len(rows) == 0:
+                return section[(slice(0, 0),) + middle + (columns,)]
+            # Read the bounding rows in a single access, and select the desired rows in memory
+            start = rows.min()
+            return section[(slice(start, rows.max() + 1),) + middle + (columns,)][rows - start]
+
+        data = {"fiberId": allFiberId[rows]}
+        if wavelengthRange is not None:
+            data["wavelength"] = readImage("WAVELENGTH", slice(None))
+            minWavelength, maxWavelength = wavelengthRange
+            select = np.any((data["wavelength"] >= minWavelength) & (data["wavelength"] <= maxWavelength),
+                            axis=0)
+            indices = np.nonzero(select)[0]
+            pixels = slice(indices[0], indices[-1] + 1) if len(indices) > 0 else slice(0, 0)
+            data["wavelength"] = data["wavelength"][:, pixels]
+        elif pixels is None:
+            pixels = slice(None)
+
+        for attr in ("wavelength", "flux", "mask", "sky", "covar"):
+            if attr not in data:
+                data[attr] = readImage(attr.upper(), pixels)
+        return data
+
+    def close(self):
+        """Release the file backing a lazy read
+
+        Arrays obtained from a lazy read must not be used after the file has
+        been closed. This is a no-op if the spectra were not read lazily.
+        """
+        if self._fits is not None:
+            self._fits.close()
+            self._fits = None
+
+    def __enter__(self):
+        """Context manager entry"""
+        return self
+
+    def __exit__(self, *args):
+        """Context manager exit: release any file backing a lazy read"""
+        self.close()
+        return False
 
     @classmethod
-    def read(cls, identity, dirName="."):
+    def read(cls, identity, dirName=".", **kwargs):
         """Read file given an identity
 
         This API is intended for use by science users, as it allows selection
@@ -181,6 +354,8 @@ class PfsFiberArraySet:
             Identification of the data of interest.
         dirName : `str`, optional
             Directory from which to read.
+        **kwargs
+            Additional arguments for ``readFits``.
 
         Returns
         -------
@@ -188,20 +363,72 @@ class PfsFiberArraySet:
             Spectra read from file.
         """
         filename = os.path.join(dirName, cls.getFilename(identity))
-        return cls.readFits(filename)
+        return cls.readFits(filename, **kwargs)
+
+    @classmethod
+    def readMany(cls, identities, dirName=".", workers=None, **kwargs):
+        """Read many files given their identities
+
+        The files are read in parallel worker processes, and the arrays are
+        handed back through shared memory rather than being pickled.
+
+        Parameters
+        ----------
+        identities : iterable of `dict`
+            Keyword-value pairs identifying the data of interest.
+        dirName : `str`, optional
+            Directory from which to read.
+        workers : `int`, optional
+            Number of worker processes. Defaults to the number of CPUs.
+        **kwargs
+            Additional arguments for ``readFits``.
+
+        Returns
+        -------
+        spectra : `list` of `PfsFiberArraySet`
+            Spectra read from file, in the same order as the identities.
+        """
+        filenames = [os.path.join(dirName, cls.getFilename(identity)) for identity in identities]
+        return readFitsMany(cls, filenames, workers=workers, **kwargs)
 
-    def writeFits(self, filename):
+    def writeFits(self, filename, compress=False, quantizeLevel=None, wavelengthOrder=None,
+                  wavelengthTolerance=1.0e-4, compactMask=False):
         """Write to FITS file
 
         This API is intended for use by the LSST data butler, which handles
         translating the desired identity into a filename.
 
+        By default, the wavelength is written as a full image. Writing it as
+        the coefficients of polynomial wavelength solutions instead (see
+        ``datamodel.txt``) is lossy, and must be requested by specifying
+        ``wavelengthOrder``. If the spectra were constructed with (or read
+        with) wavelength solutions of no greater order, and the wavelength
+        array hasn't been modified since, those solutions are written as they
+        are; otherwise, the wavelength arrays are fit.
+
         Parameters
         ----------
         filename : `str`
             Filename of FITS file.
+        compress : `bool`, optional
+            Tile-compress the images? The ``fiberId``, ``wavelength`` and
+            ``mask`` (and, unless ``quantizeLevel`` is set, all other images)
+            are compressed losslessly.
+        quantizeLevel : `float`, optional
+            Quantization level for lossy compression of the ``flux``, ``sky``
+            and ``covar`` images. The ``wavelength`` is never quantized.
+        wavelengthOrder : `int`, optional
+            Polynomial order with which to write the wavelength solutions.
+        wavelengthTolerance : `float`, optional
+            Maximum acceptable absolute residual (nm) of the wavelength fit;
+            if it is exceeded, a `RuntimeError` is raised.
+        compactMask : `bool`, optional
+            Write the mask with the narrowest integer type that can hold it
+            (see `pfs.datamodel.MaskHelper.getCompactType`)? The mask is
+            widened to the in-memory type when read back.
         """
         self.validate()
+        wavelengthModel = self._getWavelengthModel(wavelengthOrder, wavelengthTolerance)
         import astropy.io.fits
         fits = astropy.io.fits.HDUList()
         header = self.metadata.copy()
@@ -209,14 +436,55 @@ class PfsFiberArraySet:
         fits.append(astropy.io.fits.PrimaryHDU(header=astropyHeaderFromDict(header)))
         for attr in ("fiberId", "wavelength", "flux", "mask", "sky", "covar"):
             hduName = attr.upper()
+            if attr == "wavelength" and wavelengthModel is not None:
+                fits.append(wavelengthModel.toFits(hduName))
+                continue
             data = getattr(self, attr)
-            fits.append(astropy.io.fits.ImageHDU(data, name=hduName))
+            if attr == "mask" and compactMask:
+                data = data.astype(self.flags.getCompactType(data), copy=False)
+            fits.append(createImageHDU(data, hduName, compress=compress,
+                                       quantizeLevel=None if attr == "wavelength" else quantizeLevel))
 
         self.identity.toFits(fits)
         with open(filename, "wb") as fd:
             fits.writeto(fd)
 
-    def write(self, dirName="."):
+    def _getWavelengthModel(self, order=None, tolerance=1.0e-4):
+        """Get wavelength solutions suitable for writing
+
+        Parameters
+        ----------
+        order : `int`, optional
+            Polynomial order of the wavelength solutions. If `None`, the full
+            wavelength image should be written.
+        tolerance : `float`, optional
+            Maximum acceptable absolute residual (nm) of the fit.
+
+        Returns
+        -------
+        model : `pfs.datamodel.WavelengthPolynomial` or `None`
+            Wavelength solutions, or `None` if the full wavelength image should
+            be written.
+
+        Raises
+        ------
+        RuntimeError
+            If the wavelength arrays can't be fit within the tolerance.
+        """
+        if order is None:
+            return None
+        model = self._wavelengthModel
+        if model is not None and model.order <= order:
+            # The array may have been modified since it was generated
+            if self._wavelength is None or np.array_equal(self._wavelength, model.evaluate()):
+                return model
+        model = WavelengthPolynomial.fit(self.wavelength, order, tolerance)
+        if model is None:
+            raise RuntimeError("Unable to fit wavelength with order %d polynomials within %g nm" %
+                               (order, tolerance))
+        return model
+
+    def write(self, dirName=".", **kwargs):
         """Write to file
 
         This API is intended for use by science users, as it allows setting the
@@ -227,51 +495,196 @@ class PfsFiberArraySet:
         ----------
         dirName : `str`, optional
             Directory to which to write.
+        **kwargs
+            Additional arguments for ``writeFits``.
         """
         filename = os.path.join(dirName, self.filename)
-        return self.writeFits(filename)
+        return self.writeFits(filename, **kwargs)
 
     @classmethod
-    def fromMerge(cls, spectraList, metadata=None):
+    def _readMergeInfo(cls, spectra):
+        """Gather the information needed to merge spectra
+
+        For a file, only the headers and the small tables are read.
+
+        Parameters
+        ----------
+        spectra : ``cls`` or `str`
+            Spectra, or the filename of spectra.
+
+        Returns
+        -------
+        identity : `pfs.datamodel.Identity`
+            Identity of the data.
+        flags : `pfs.datamodel.MaskHelper`
+            Helper for dealing with symbolic names for mask values.
+        shapes : `dict` (`str`: `tuple` of `int`)
+            Shape of each array, indexed by attribute name.
+        dtypes : `dict` (`str`: `numpy.dtype`)
+            Data type of each array, indexed by attribute name.
+        """
+        attributes = ("fiberId", "wavelength", "flux", "mask", "sky", "covar")
+        if isinstance(spectra, PfsFiberArraySet):
+            shapes = {attr: getattr(spectra, attr).shape for attr in attributes}
+            dtypes = {attr: getattr(spectra, attr).dtype for attr in attributes}
+            return spectra.identity, spectra.flags, shapes, dtypes
+
+        import astropy.io.fits
+        with astropy.io.fits.open(spectra, lazy_load_hdus=True) as fd:
+            flags = MaskHelper.fromFitsHeader(astropyHeaderToDict(fd[0].header))
+            identity = Identity.fromFits(fd)
+            shapes = {}
+            dtypes = {}
+            for attr in attributes:
+                hdu = fd[attr.upper()]
+                model = WavelengthPolynomial.fromFits(hdu) if attr == "wavelength" else None
+                if model is not None:
+                    shapes[attr] = model.shape
+                    dtypes[attr] = model.dtype
+                    continue
+                shapes[attr] = hdu.shape
+                dtypes[attr] = hdu.section[:0].dtype  # Includes any scaling, but doesn't read the image
+        return identity, flags, shapes, dtypes
+
+    @classmethod
+    def fromMerge(cls, spectraList, metadata=None, remapMasks=False):
         """Construct from merging multiple spectra
 
+        The inputs are iterated over once, and each is copied into the output
+        (and released) before the next is obtained, so that the peak memory
+        usage is approximately the output plus a single input. Inputs
+        specified as filenames are read (memory-mapped) in turn.
+
+        If ``spectraList`` is a sequence (e.g., a `list`), the output arrays
+        are allocated up front, with the data types of the inputs (for
+        filenames, only the headers are read for this). Otherwise (e.g., for
+        a generator), the output arrays are grown as inputs arrive.
+
         Parameters
         ----------
-        spectraList : iterable of `PfsFiberArraySet`
-            Spectra to combine.
+        spectraList : iterable of `PfsFiberArraySet` or `str`
+            Spectra to combine, or filenames of spectra to combine.
         metadata : `dict` (`str`: POD), optional
             Keyword-value pairs for the header.
+        remapMasks : `bool`, optional
+            Allow the inputs to use different bits for the same mask planes
+            (e.g., from different versions of the pipeline)? If so, the masks
+            are converted to use the bits of the merged ``flags``.
 
         Returns
         -------
         self : `PfsFiberArraySet`
             Merged spectra.
+
+        Raises
+        ------
+        RuntimeError
+            If there are no inputs, the inputs have different lengths, or the
+            mask planes of the inputs are inconsistent.
         """
-        num = sum(len(ss) for ss in spectraList)
-        length = set([ss.length for ss in spectraList])
-        if len(length) != 1:
-            raise RuntimeError("Multiple lengths when merging spectra: %s" % (length,))
-        length = length.pop()
-        fiberId = np.empty(num, dtype=int)
-        wavelength = np.empty((num, length), dtype=float)
-        flux = np.empty((num, length), dtype=float)
-        mask = np.empty((num, length), dtype=int)
-        sky = np.empty((num, length), dtype=float)
-        covar = np.empty((num, 3, length), dtype=float)
-        index = 0
-        for ss in spectraList:
-            select = slice(index, index + len(ss))
-            fiberId[select] = ss.fiberId
-            wavelength[select] = ss.wavelength
-            flux[select] = ss.flux
-            mask[select] = ss.mask
-            sky[select] = ss.sky
-            covar[select] = ss.covar
-            index += len(ss)
-        identity = Identity.fromMerge([ss.identity for ss in spectraList])
-        flags = MaskHelper.fromMerge(list(ss.flags for ss in spectraList))
-        return cls(identity, fiberId, wavelength, flux, mask, sky, covar, flags,
-                   metadata if metadata else {})
+        attributes = ("fiberId", "wavelength", "flux", "mask", "sky", "covar")
+        arrays = {}
+        num = 0  # Number of spectra in the output arrays
+
+        def reserve(capacity, shapes, dtypes):
+            """Ensure the output arrays can hold ``capacity`` spectra of the given shapes and types"""
+            for attr in attributes:
+                shape = (capacity,) + tuple(shapes[attr][1:])
+                dtype = np.dtype(dtypes[attr]).newbyteorder("=")
+                array = arrays.get(attr)
+                if array is None:
+                    arrays[attr] = np.empty(shape, dtype=dtype)
+                    continue
+                if array.shape[1:] != shape[1:]:
+                    raise RuntimeError("Multiple lengths when merging spectra: %s" %
+                                       ({array.shape[-1], shape[-1]},))
+                dtype = np.result_type(array.dtype, dtype)
+                if dtype != array.dtype:
+                    array = array.astype(dtype)
+                if capacity > len(array):
+                    array.resize(shape, refcheck=False)  # In-place when possible; contents are retained
+                arrays[attr] = array
+
+        def checkMaskType(dtypes, flags):
+            """Use a mask type that can hold all the mask planes, if remapping"""
+            if remapMasks and max(flags.flags.values(), default=0) >= 8*np.dtype(dtypes["mask"]).itemsize:
+                dtypes = dict(dtypes, mask=np.int64)
+            return dtypes
+
+        info = None
+        flags = None
+        if isinstance(spectraList, Sequence):
+            info = [cls._readMergeInfo(ss) for ss in spectraList]
+            if not info:
+                raise RuntimeError("No spectra to merge")
+            flags = MaskHelper.fromMerge([ssFlags for _, ssFlags, _, _ in info], remap=remapMasks)
+            lengths = set(shapes["flux"][1] for _, _, shapes, _ in info)
+            if len(lengths) != 1:
+                raise RuntimeError("Multiple lengths when merging spectra: %s" % (lengths,))
+            dtypes = {attr: np.result_type(*[ssDtypes[attr] for _, _, _, ssDtypes in info])
+                      for attr in attributes}
+            reserve(sum(shapes["fiberId"][0] for _, _, shapes, _ in info), info[0][2],
+                    checkMaskType(dtypes, flags))
+
+        identities = []
+        for ii, ss in enumerate(spectraList):
+            identity, ssFlags, shapes, dtypes = cls._readMergeInfo(ss) if info is None else info[ii]
+            identities.append(identity)
+            if info is None:
+                flags = MaskHelper.fromMerge([ssFlags] if flags is None else [flags, ssFlags],
+                                             remap=remapMasks)
+                count = shapes["fiberId"][0]
+                reserve(max(num + count, 2*num), shapes, checkMaskType(dtypes, flags))
+
+            if isinstance(ss, PfsFiberArraySet):
+                spectra = ss
+            else:
+                spectra = cls.readFits(ss, lazy=True)
+            try:
+                select = slice(num, num + len(spectra))
+                for attr in attributes:
+                    data = getattr(spectra, attr)
+                    if attr == "mask" and remapMasks:
+                        data = flags.remap(data, ssFlags, arrays[attr].dtype)
+                    arrays[attr][select] = data
+                num += len(spectra)
+            finally:
+                if spectra is not ss:
+                    spectra.close()
+            del spectra, ss
+
+        if not identities:
+            raise RuntimeError("No spectra to merge")
+        for attr in attributes:
+            array = arrays[attr]
+            if len(array) != num:
+                array.resize((num,) + array.shape[1:], refcheck=False)
+        identity = Identity.fromMerge(identities)
+        return cls(identity, arrays["fiberId"], arrays["wavelength"], arrays["flux"], arrays["mask"],
+                   arrays["sky"], arrays["covar"], flags, metadata if metadata else {})
+
+    def resample(self, wavelength, FiberArraySetClass=None):
+        """Resample all spectra onto a common wavelength array
+
+        The flux and sky are linearly interpolated, the mask is the bitwise OR
+        of the contributing pixels (with ``NO_DATA`` set outside the range of
+        the input), and the covariance is propagated.
+
+        Parameters
+        ----------
+        wavelength : `numpy.ndarray` of `float`
+            Wavelength array onto which to resample (e.g., a
+            `pfs.datamodel.WavelengthArray`).
+        FiberArraySetClass : `type`, optional
+            Class to produce (e.g., `pfs.datamodel.PfsMerged`). Defaults to
+            the class of this object.
+
+        Returns
+        -------
+        resampled : ``FiberArraySetClass``
+            Resampled spectra.
+        """
+        return resampleSpectra(self, wavelength, FiberArraySetClass)
 
     def extractFiber(self, FiberArrayClass, pfsConfig, fiberId):
         """Extract a single fiber
@@ -292,26 +705,59 @@ class PfsFiberArraySet:
         spectrum : ``SpectrumClass``
             Extracted spectrum.
         """
-        ii = np.nonzero(self.fiberId == fiberId)[0]
-        if len(ii) != 1:
-            raise RuntimeError("Number of fibers in PfsFiberArraySet with fiberId = %d is not unity (%d)" %
-                               (fiberId, len(ii)))
-        ii = ii[0]
-        jj = np.nonzero(pfsConfig.fiberId == fiberId)[0]
-        if len(jj) != 1:
-            raise RuntimeError("Number of fibers in PfsConfig with fiberId = %d is not unity (%d)" %
-                               (fiberId, len(jj)))
-        jj = jj[0]
-
-        fiberMag = dict(zip(pfsConfig.filterNames[jj], pfsConfig.fiberMag[jj]))
-        target = Target(pfsConfig.catId[jj], pfsConfig.tract[jj], pfsConfig.patch[jj],
-                        pfsConfig.objId[jj], pfsConfig.ra[jj], pfsConfig.dec[jj],
-                        pfsConfig.targetType[jj], fiberMag)
-        obs = Observations.makeSingle(self.identity, pfsConfig, fiberId)
-
-        # XXX not dealing with covariance properly.
-        covar = np.zeros((3, self.length), dtype=self.covar.dtype)
-        covar[:] = self.covar[ii]
-        covar2 = np.zeros((1, 1), dtype=self.covar.dtype)
-        return FiberArrayClass(target, obs, self.wavelength[ii], self.flux[ii], self.mask[ii], self.sky[ii],
-                               covar, covar2, self.flags)
+        return next(self.extractFibers(FiberArrayClass, pfsConfig, [fiberId]))
+
+    def extractFibers(self, FiberArrayClass, pfsConfig, fiberId=None):
+        """Extract multiple fibers
+
+        Pulls fibers out into subclasses of `pfs.datamodel.PfsFiberArray`. The
+        fibers are matched against the ``pfsConfig`` all at once. As for
+        ``extractFiber``, the ``wavelength``, ``flux``, ``mask`` and ``sky``
+        of the extracted spectra are views into our arrays, while each
+        spectrum has its own covariance arrays.
+
+        Parameters
+        ----------
+        FiberArrayClass : `type`
+            Subclass of `pfs.datamodel.PfsFiberArray` to which to export.
+        pfsConfig : `pfs.datamodel.PfsConfig`
+            PFS top-end configuration.
+        fiberId : iterable of `int`, optional
+            Fiber IDs to export. Defaults to all fibers.
+
+        Returns
+        -------
+        spectra : iterator of ``SpectrumClass``
+            Extracted spectra, in the order of ``fiberId``.
+
+        Raises
+        ------
+        RuntimeError
+            If any of the fibers is not present exactly once in either ``self``
+            or the ``pfsConfig``.
+        """
+        fiberId = self.fiberId if fiberId is None else np.atleast_1d(fiberId)
+        indices = findIndices(self.fiberId, fiberId, "fiberId of %s" % (self.__class__.__name__,))
+        configIndices = pfsConfig.selectFiber(fiberId)
+
+        catId = pfsConfig.catId[configIndices]
+        tract = pfsConfig.tract[configIndices]
+        patch = [pfsConfig.patch[jj] for jj in configIndices]
+        objId = pfsConfig.objId[configIndices]
+        ra = pfsConfig.ra[configIndices]
+        dec = pfsConfig.dec[configIndices]
+        targetType = pfsConfig.targetType[configIndices]
+
+        def generate():
+            """Generate the spectra; the lookups have already been done"""
+            for kk, (ii, jj) in enumerate(zip(indices, configIndices)):
+                fiberMag = dict(zip(pfsConfig.filterNames[jj], pfsConfig.fiberMag[jj]))
+                target = Target(catId[kk], tract[kk], patch[kk], objId[kk], ra[kk], dec[kk], targetType[kk],
+                                fiberMag)
+                obs = Observations.makeSingle(self.identity, pfsConfig, fiberId[kk], index=jj)
+                # XXX not dealing with covariance properly.
+                covar2 = np.zeros((1, 1), dtype=self.covar.dtype)
+                yield FiberArrayClass(target, obs, self.wavelength[ii], self.flux[ii], self.mask[ii],
+                                      self.sky[ii], self.covar[ii].copy(), covar2, self.flags)
+
+        return generate()
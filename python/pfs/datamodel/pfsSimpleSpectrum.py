@@ -2,8 +2,9 @@ import os
 
 from .masks import MaskHelper
 from .target import Target
-from .utils import astropyHeaderFromDict, inheritDocstrings
+from .utils import astropyHeaderFromDict, astropyHeaderFromTemplate, inheritDocstrings, createImageHDU
 from .wavelengthArray import WavelengthArray
+from .parallel import readFitsMany
 
 __all__ = ["PfsSimpleSpectrum"]
 
@@ -63,6 +64,11 @@ class PfsSimpleSpectrum:
         """
         return self.target.identity
 
+    @property
+    def filename(self):
+        """Filename, without directory"""
+        return self.filenameFormat % self.getIdentity()
+
     @classmethod
     def _readImpl(cls, fits):
         """Implementation for reading from FITS file
@@ -89,6 +95,7 @@ class PfsSimpleSpectrum:
         data["wavelength"] = wavelength
 
         data["flags"] = MaskHelper.fromFitsHeader(fits["MASK"].header)
+        data["mask"] = data["flags"].widen(data["mask"])
         data["target"] = Target.fromFits(fits)
         return data
 
@@ -138,7 +145,34 @@ class PfsSimpleSpectrum:
         filename = os.path.join(dirName, cls.filenameFormat % identity)
         return cls.readFits(filename)
 
-    def _writeImpl(self, fits):
+    @classmethod
+    def readMany(cls, identities, dirName=".", workers=None, **kwargs):
+        """Read many files given their identities
+
+        The files are read in parallel worker processes, and the arrays are
+        handed back through shared memory rather than being pickled.
+
+        Parameters
+        ----------
+        identities : iterable of `dict`
+            Keyword-value pairs identifying the data of interest. Common
+            keywords include ``catId``, ``tract``, ``patch``, ``objId``.
+        dirName : `str`, optional
+            Directory from which to read.
+        workers : `int`, optional
+            Number of worker processes. Defaults to the number of CPUs.
+        **kwargs
+            Additional arguments for ``readFits``.
+
+        Returns
+        -------
+        spectra : `list` of ``cls``
+            Spectra read from file, in the same order as the identities.
+        """
+        filenames = [os.path.join(dirName, cls.filenameFormat % identity) for identity in identities]
+        return readFitsMany(cls, filenames, workers=workers, **kwargs)
+
+    def _writeImpl(self, fits, compress=False, quantizeLevel=None, compactMask=False):
         """Implementation for writing to FITS file
 
         We attempt to write the wavelength to the header (as a WCS; this results
@@ -150,13 +184,19 @@ class PfsSimpleSpectrum:
         fits : `astropy.io.fits.HDUList`
             List of FITS HDUs. This has a Primary HDU already, the header of
             which may be supplemented with additional keywords.
+        compress : `bool`, optional
+            Tile-compress the images?
+        quantizeLevel : `float`, optional
+            Quantization level for lossy compression of floating-point images.
+        compactMask : `bool`, optional
+            Write the mask with the narrowest integer type that can hold it?
 
         Returns
         -------
         header : `astropy.io.fits.Header`
             FITS headers which may contain the wavelength WCS.
         """
-        from astropy.io.fits import ImageHDU, Header
+        from astropy.io.fits import Header
         haveWavelengthHeader = False
         try:
             header = self.wavelength.toFitsHeader()  # For WavelengthArray
@@ -165,16 +205,20 @@ class PfsSimpleSpectrum:
             header = Header()
         if self.metadata:
             header.extend(astropyHeaderFromDict(self.metadata))
-        fits.append(ImageHDU(self.flux, header=header, name="FLUX"))
-        maskHeader = astropyHeaderFromDict(self.flags.toFitsHeader())
+        fits.append(createImageHDU(self.flux, "FLUX", header, compress, quantizeLevel))
+        maskHeader = astropyHeaderFromTemplate(self.flags.toFitsHeader())
         maskHeader.extend(header)
-        fits.append(ImageHDU(self.mask, header=maskHeader, name="MASK"))
+        mask = self.mask
+        if compactMask:
+            mask = mask.astype(self.flags.getCompactType(mask), copy=False)
+        fits.append(createImageHDU(mask, "MASK", maskHeader, compress))
         if not haveWavelengthHeader:
-            fits.append(ImageHDU(self.wavelength, header=header, name="WAVELENGTH"))
+            # Quantizing the wavelength would corrupt the wavelength solution
+            fits.append(createImageHDU(self.wavelength, "WAVELENGTH", header, compress))
         self.target.toFits(fits)
         return header
 
-    def writeFits(self, filename):
+    def writeFits(self, filename, compress=False, quantizeLevel=None, compactMask=False):
         """Write to FITS file
 
         This API is intended for use by the LSST data butler, which handles
@@ -184,15 +228,44 @@ class PfsSimpleSpectrum:
         ----------
         filename : `str`
             Filename of FITS file.
+        compress : `bool`, optional
+            Tile-compress the images? Integer images (e.g., the mask), the
+            wavelength and, unless ``quantizeLevel`` is set, the other
+            floating-point images are compressed losslessly.
+        quantizeLevel : `float`, optional
+            Quantization level for lossy compression of floating-point images
+            other than the wavelength.
+        compactMask : `bool`, optional
+            Write the mask with the narrowest integer type that can hold it?
+        """
+        fits = self._makeHduList(compress=compress, quantizeLevel=quantizeLevel, compactMask=compactMask)
+        with open(filename, "wb") as fd:
+            fits.writeto(fd)
+
+    def _makeHduList(self, compress=False, quantizeLevel=None, compactMask=False):
+        """Construct the FITS HDUs for writing
+
+        Parameters
+        ----------
+        compress : `bool`, optional
+            Tile-compress the images?
+        quantizeLevel : `float`, optional
+            Quantization level for lossy compression of floating-point images.
+        compactMask : `bool`, optional
+            Write the mask with the narrowest integer type that can hold it?
+
+        Returns
+        -------
+        fits : `astropy.io.fits.HDUList`
+            FITS HDUs, ready to be written.
         """
         from astropy.io.fits import HDUList, PrimaryHDU
         fits = HDUList()
         fits.append(PrimaryHDU())
-        self._writeImpl(fits)
-        with open(filename, "wb") as fd:
-            fits.writeto(fd)
+        self._writeImpl(fits, compress=compress, quantizeLevel=quantizeLevel, compactMask=compactMask)
+        return fits
 
-    def write(self, dirName="."):
+    def write(self, dirName=".", **kwargs):
         """Write to file
 
         This API is intended for use by science users, as it allows setting the
@@ -203,7 +276,8 @@ class PfsSimpleSpectrum:
         ----------
         dirName : `str`, optional
             Directory to which to write.
+        **kwargs
+            Additional arguments for ``writeFits``.
         """
-        identity = self.getIdentity()
-        filename = os.path.join(dirName, self.filenameFormat % identity)
-        return self.writeFits(filename)
+        filename = os.path.join(dirName, self.filename)
+        return self.writeFits(filename, **kwargs)
@@ -0,0 +1,352 @@
+import os
+import re
+import types
+
+import numpy as np
+
+from .utils import astropyHeaderFromDict
+
+__all__ = ("SkyIndex", "SkyMatches")
+
+
+class SkyMatches(types.SimpleNamespace):
+    """Fibers matching positions on the sky
+
+    Parameters
+    ----------
+    index : `numpy.ndarray` of `int`
+        Index of the query position for each match.
+    pfsDesignId : `numpy.ndarray` of `int`
+        Top-end design identifier for each match.
+    visit0 : `numpy.ndarray` of `int`
+        Exposure identifier for each match; ``-1`` for a match from a
+        `pfs.datamodel.PfsDesign` rather than a `pfs.datamodel.PfsConfig`.
+    fiberId : `numpy.ndarray` of `int`
+        Fiber identifier for each match.
+    ra, dec : `numpy.ndarray` of `float`
+        Position of the fiber for each match, degrees.
+    separation : `numpy.ndarray` of `float`
+        Separation between the query position and fiber, arcsec.
+    """
+    def __init__(self, index, pfsDesignId, visit0, fiberId, ra, dec, separation):
+        super().__init__(index=index, pfsDesignId=pfsDesignId, visit0=visit0, fiberId=fiberId, ra=ra,
+                         dec=dec, separation=separation)
+
+    def __len__(self):
+        """Number of matches"""
+        return len(self.index)
+
+    def __reduce__(self):
+        """How to pickle"""
+        return type(self), (self.index, self.pfsDesignId, self.visit0, self.fiberId, self.ra, self.dec,
+                            self.separation)
+
+
+class SkyIndex:
+    """Spatial index of the fiber positions in many designs
+
+    The ``ra``, ``dec`` of the fibers of many `pfs.datamodel.PfsDesign` and
+    `pfs.datamodel.PfsConfig` files are indexed so that cone searches and
+    cross-matches against catalogs don't require reading the files again.
+
+    The sky is divided into zones of declination, and the fibers are sorted
+    by zone and then by RA. A search for positions within some radius of a
+    point then requires only a binary search for the range of RA in each of
+    the zones that the cone overlaps; this is vectorised over all query
+    positions.
+
+    The index may be updated incrementally, and persisted with ``writeFits``
+    and ``readFits``.
+
+    Parameters
+    ----------
+    zoneHeight : `float`, optional
+        Height of the declination zones, degrees. This should be larger than
+        the typical search radius, and small enough that each zone holds only
+        a small fraction of the fibers.
+    """
+    dtype = [("ra", np.float64), ("dec", np.float64), ("pfsDesignId", np.uint64), ("visit0", np.int32),
+             ("fiberId", np.int32)]
+    """Data type for the indexed fibers"""
+    _zoneStride = 1000.0  # Offset between zones in the sort key; must exceed the RA range
+
+    def __init__(self, zoneHeight=0.05):
+        self.zoneHeight = zoneHeight
+        self._data = np.zeros(0, dtype=self.dtype)  # Indexed fibers, sorted by self._keys
+        self._keys = np.zeros(0, dtype=float)
+        self._pending = []  # Fibers not yet sorted into the index
+        self._sources = set()  # (pfsDesignId, visit0) of the designs that have been indexed
+
+    def __len__(self):
+        """Number of fibers indexed"""
+        return len(self._data) + sum(len(data) for data in self._pending)
+
+    def __contains__(self, source):
+        """Has the design been indexed?
+
+        Parameters
+        ----------
+        source : (`int`, `int`)
+            Top-end design identifier and exposure identifier (``-1`` for a
+            `pfs.datamodel.PfsDesign`).
+        """
+        return tuple(source) in self._sources
+
+    def __repr__(self):
+        """Representation"""
+        return "%s(%d designs, %d fibers)" % (self.__class__.__name__, len(self._sources), len(self))
+
+    def _getZone(self, dec):
+        """Return the zone of declination
+
+        Parameters
+        ----------
+        dec : `numpy.ndarray` of `float`
+            Declination, degrees.
+
+        Returns
+        -------
+        zone : `numpy.ndarray` of `int`
+            Zone index.
+        """
+        numZones = int(np.ceil(180.0/self.zoneHeight))
+        return np.clip(np.floor((dec + 90.0)/self.zoneHeight).astype(int), 0, numZones - 1)
+
+    def _consolidate(self):
+        """Sort pending fibers into the index"""
+        if not self._pending:
+            return
+        data = np.concatenate([self._data] + self._pending)
+        self._pending = []
+        keys = self._getZone(data["dec"])*self._zoneStride + data["ra"]
+        sorter = np.argsort(keys, kind="stable")
+        self._data = data[sorter]
+        self._keys = keys[sorter]
+
+    def add(self, pfsDesign):
+        """Add the fibers of a design to the index
+
+        If the design has been indexed already, its fibers are replaced.
+        Fibers without a position (non-finite ``ra`` or ``dec``) are not
+        indexed.
+
+        Parameters
+        ----------
+        pfsDesign : `pfs.datamodel.PfsDesign` or `pfs.datamodel.PfsConfig`
+            Design or configuration to add.
+        """
+        visit0 = getattr(pfsDesign, "visit0", -1)
+        source = (int(pfsDesign.pfsDesignId), int(visit0))
+        if source in self._sources:
+            self._consolidate()
+            keep = (self._data["pfsDesignId"] != source[0]) | (self._data["visit0"] != source[1])
+            self._data = self._data[keep]
+            self._keys = self._keys[keep]
+
+        select = np.isfinite(pfsDesign.ra) & np.isfinite(pfsDesign.dec)
+        data = np.zeros(select.sum(), dtype=self.dtype)
+        data["ra"] = np.asarray(pfsDesign.ra)[select] % 360.0
+        data["dec"] = np.asarray(pfsDesign.dec)[select]
+        data["pfsDesignId"] = source[0]
+        data["visit0"] = source[1]
+        data["fiberId"] = np.asarray(pfsDesign.fiberId)[select]
+        self._pending.append(data)
+        self._sources.add(source)
+
+    def addFile(self, filename, replace=False):
+        """Add the fibers of a ``pfsDesign`` or ``pfsConfig`` file
+
+        The identity of the design is determined from the filename, so that
+        the file is only read if it needs to be indexed.
+
+        Parameters
+        ----------
+        filename : `str`
+            Filename of ``pfsDesign`` or ``pfsConfig`` file.
+        replace : `bool`, optional
+            Read and index the file even if the design has been indexed
+            already?
+
+        Returns
+        -------
+        added : `bool`
+            Was the file read and indexed?
+
+        Raises
+        ------
+        RuntimeError
+            If the filename isn't recognised.
+        """
+        from .pfsConfig import PfsDesign, PfsConfig
+        basename = os.path.basename(filename)
+        matches = re.match(PfsConfig.fileNameRegex, basename)
+        if matches:
+            cls = PfsConfig
+            kwargs = dict(pfsDesignId=int(matches.group(1), 16), visit0=int(matches.group(2)))
+        else:
+            matches = re.match(PfsDesign.fileNameRegex, basename)
+            if not matches:
+                raise RuntimeError("Unrecognised filename for pfsDesign or pfsConfig: %s" % (filename,))
+            cls = PfsDesign
+            kwargs = dict(pfsDesignId=int(matches.group(1), 16))
+        if not replace and (kwargs["pfsDesignId"], kwargs.get("visit0", -1)) in self._sources:
+            return False
+        self.add(cls._readImpl(filename, **kwargs))
+        return True
+
+    def addFiles(self, filenames, replace=False):
+        """Add the fibers of many ``pfsDesign`` or ``pfsConfig`` files
+
+        Files for designs that have been indexed already are not read (unless
+        ``replace``), so this may be used to update the index with new files
+        by passing all files.
+
+        Parameters
+        ----------
+        filenames : iterable of `str`
+            Filenames of ``pfsDesign`` or ``pfsConfig`` files.
+        replace : `bool`, optional
+            Read and index the files even if the designs have been indexed
+            already?
+
+        Returns
+        -------
+        numAdded : `int`
+            Number of files read and indexed.
+        """
+        return sum(self.addFile(filename, replace) for filename in filenames)
+
+    def crossMatch(self, ra, dec, radius):
+        """Find all fibers within some radius of each of many positions
+
+        Parameters
+        ----------
+        ra, dec : array-like of `float`
+            Query positions, degrees.
+        radius : `float`
+            Match radius, arcsec.
+
+        Returns
+        -------
+        matches : `SkyMatches`
+            Fibers within the radius of the query positions, sorted by the
+            index of the query position and then by separation.
+        """
+        self._consolidate()
+        ra = np.atleast_1d(np.asarray(ra, dtype=float)) % 360.0
+        dec = np.atleast_1d(np.asarray(dec, dtype=float))
+        radiusDeg = radius/3600.0
+
+        # Half-width in RA of the cone at each query position
+        with np.errstate(invalid="ignore"):
+            halfWidth = np.where(np.abs(dec) + radiusDeg < 90.0,
+                                 np.degrees(np.arcsin(np.sin(np.radians(radiusDeg)) /
+                                                      np.cos(np.radians(dec)))),
+                                 180.0)
+
+        # Expand each query over the zones that its cone overlaps
+        zoneLow = self._getZone(dec - radiusDeg)
+        numZones = self._getZone(dec + radiusDeg) - zoneLow + 1
+        query = np.repeat(np.arange(len(ra)), numZones)
+        zone = np.repeat(zoneLow - np.cumsum(numZones) + numZones, numZones) + np.arange(numZones.sum())
+
+        # Each cone covers up to two ranges of RA in a zone, due to wrapping at RA=0
+        full = halfWidth[query] >= 180.0
+        low = np.where(full, 0.0, ra[query] - halfWidth[query])
+        high = np.where(full, 360.0, ra[query] + halfWidth[query])
+        wrapLow = low < 0.0
+        wrapHigh = high > 360.0
+        wrappedLow = np.where(wrapLow, low + 360.0, np.where(wrapHigh, 0.0, 1.0))  # 1 > 0: empty range
+        wrappedHigh = np.where(wrapLow, 360.0, np.where(wrapHigh, high - 360.0, 0.0))
+        ranges = [(np.maximum(low, 0.0), np.minimum(high, 360.0)), (wrappedLow, wrappedHigh)]
+        base = zone*self._zoneStride
+        starts = [np.searchsorted(self._keys, base + rangeLow, side="left") for rangeLow, _ in ranges]
+        stops = [np.searchsorted(self._keys, base + rangeHigh, side="right") for _, rangeHigh in ranges]
+        start = np.concatenate(starts)
+        count = np.maximum(np.concatenate(stops) - start, 0)
+        query = np.repeat(np.concatenate([query, query]), count)
+        candidate = np.repeat(start - np.cumsum(count) + count, count) + np.arange(count.sum())
+
+        # Haversine separation
+        data = self._data[candidate]
+        ra1, dec1 = np.radians(ra[query]), np.radians(dec[query])
+        ra2, dec2 = np.radians(data["ra"]), np.radians(data["dec"])
+        haversine = np.sin(0.5*(dec2 - dec1))**2 + np.cos(dec1)*np.cos(dec2)*np.sin(0.5*(ra2 - ra1))**2
+        separation = 3600.0*np.degrees(2.0*np.arcsin(np.sqrt(np.clip(haversine, 0.0, 1.0))))
+
+        select = separation <= radius
+        query = query[select]
+        data = data[select]
+        separation = separation[select]
+        order = np.lexsort((separation, query))
+        data = data[order]
+        return SkyMatches(query[order], data["pfsDesignId"], data["visit0"], data["fiberId"], data["ra"],
+                          data["dec"], separation[order])
+
+    def coneSearch(self, ra, dec, radius):
+        """Find all fibers within some radius of a position
+
+        Parameters
+        ----------
+        ra, dec : `float`
+            Position of the center of the cone, degrees.
+        radius : `float`
+            Radius of the cone, arcsec.
+
+        Returns
+        -------
+        matches : `SkyMatches`
+            Fibers within the cone, sorted by separation.
+        """
+        return self.crossMatch([ra], [dec], radius)
+
+    def writeFits(self, filename):
+        """Write the index to a FITS file
+
+        Parameters
+        ----------
+        filename : `str`
+            Filename of FITS file.
+        """
+        import astropy.io.fits
+        self._consolidate()
+        header = astropyHeaderFromDict(dict(ZONEHGT=self.zoneHeight))
+        sources = sorted(self._sources)
+        fits = astropy.io.fits.HDUList([
+            astropy.io.fits.PrimaryHDU(header=header),
+            astropy.io.fits.BinTableHDU(self._data, name="FIBERS"),
+            astropy.io.fits.BinTableHDU.from_columns([
+                astropy.io.fits.Column("pfsDesignId", "K", bzero=2**63,
+                                       array=np.array([pp for pp, _ in sources], dtype=np.uint64)),
+                astropy.io.fits.Column("visit0", "J",
+                                       array=np.array([vv for _, vv in sources], dtype=np.int32)),
+            ], name="SOURCES"),
+        ])
+        with open(filename, "wb") as fd:
+            fits.writeto(fd)
+
+    @classmethod
+    def readFits(cls, filename):
+        """Read the index from a FITS file
+
+        Parameters
+        ----------
+        filename : `str`
+            Filename of FITS file.
+
+        Returns
+        -------
+        self : `SkyIndex`
+            Index, ready for more designs to be added.
+        """
+        import astropy.io.fits
+        with astropy.io.fits.open(filename) as fits:
+            self = cls(fits[0].header["ZONEHGT"])
+            table = fits["FIBERS"].data
+            data = np.zeros(len(table), dtype=cls.dtype)
+            for name, _ in cls.dtype:
+                data[name] = table[name]
+            sources = fits["SOURCES"].data
+            self._sources.update(zip(sources["pfsDesignId"].tolist(), sources["visit0"].tolist()))
+        self._pending.append(data)
+        return self
@@ -1,7 +1,7 @@
 import types
 import numpy as np
 
-from .utils import astropyHeaderFromDict, astropyHeaderToDict
+from .utils import astropyHeaderFromDict, astropyHeaderToDict, astropyHeaderFromTemplate
 from .pfsConfig import TargetType
 
 __all__ = ("Target",)
@@ -80,7 +80,7 @@ class Target(types.SimpleNamespace):
         from astropy.io.fits import BinTableHDU, Column
         maxLength = max(len(ff) for ff in self.fiberMags.keys()) if self.fiberMags else 1
         header = astropyHeaderFromDict({attr.upper(): getattr(self, attr) for attr in self._attributes})
-        header.update(TargetType.getFitsHeaders())
+        header.extend(astropyHeaderFromTemplate(TargetType.getFitsHeaders()))
         hdu = BinTableHDU.from_columns([
             Column("filterName", "%dA" % maxLength, array=list(self.fiberMags.keys())),
             Column("fiberMag", "E", array=np.array(list(self.fiberMags.values()))),
@@ -7,7 +7,7 @@ import functools
 import numpy as np
 
 __all__ = ("calculatePfsVisitHash", "createHash", "astropyHeaderToDict", "astropyHeaderFromDict",
-           "wraparoundNVisit", "inheritDocstrings",)
+           "astropyHeaderFromTemplate", "createImageHDU", "wraparoundNVisit", "inheritDocstrings",)
 
 
 def calculatePfsVisitHash(visits):
@@ -71,6 +71,43 @@ def createHash(*args):
 # -=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-
 
 
+def findIndices(array, values, name="array"):
+    """Find the index of each of a set of values in an array
+
+    This is a vectorised alternative to ``np.nonzero(array == value)`` for
+    each value, e.g., for looking up fiber identifiers.
+
+    Parameters
+    ----------
+    array : `numpy.ndarray`
+        Array in which to search.
+    values : array-like
+        Values to find.
+    name : `str`, optional
+        Description of the array, for the error message.
+
+    Returns
+    -------
+    indices : `numpy.ndarray` of `int`
+        Index of each value in ``array``.
+
+    Raises
+    ------
+    RuntimeError
+        If any of the values appear other than exactly once in the array.
+        All such values are reported.
+    """
+    values = np.asarray(values)
+    order = np.argsort(array, kind="stable")
+    left = np.searchsorted(array, values, side="left", sorter=order)
+    right = np.searchsorted(array, values, side="right", sorter=order)
+    bad = (right - left) != 1
+    if np.any(bad):
+        raise RuntimeError("Number of entries in %s is not unity for %s (%s)" %
+                           (name, values[bad].tolist(), (right - left)[bad].tolist()))
+    return order[left]
+
+
 def makeFullCovariance(covar):
     """Given a matrix of the diagonal part of the covariance matrix return a full matrix
 
@@ -80,17 +117,12 @@ def makeFullCovariance(covar):
        covar[0, 0:]    Diagonal
        covar[1, 0:-1]  +-1 off diagonal
        covar[2, 0:-2]  +-2 off diagonal
-    """
-    C = np.zeros(covar.shape[1]**2).reshape((covar.shape[1], covar.shape[1]))
-
-    i = np.arange(C.shape[0])
-
-    C[i, i] = covar[0]                     # diagonal
-    for j in range(1, covar.shape[0]):     # bands near the diagonal
-        C[i[j:], i[:-j]] = covar[j][0:-j]         # above the diagonal
-        C[i[:-j], i[j:]] = covar[j][0:-j]         # below the diagonal
 
-    return C
+    For linear algebra, use `pfs.datamodel.BandedCovariance` instead, which
+    doesn't need to materialise the full matrix.
+    """
+    from .covariance import BandedCovariance
+    return BandedCovariance(np.asarray(covar, dtype=float)).toDense()
 
 
 def astropyHeaderToDict(header):
@@ -117,7 +149,8 @@ def astropyHeaderFromDict(metadata):
     Parameters
     ----------
     metadata : `dict`
-        FITS header keywords and values.
+        FITS header keywords and values. A value may be a `tuple` of the
+        value and a comment.
 
     Returns
     -------
@@ -129,10 +162,93 @@ def astropyHeaderFromDict(metadata):
     for key, value in metadata.items():
         if len(key) > 8 and not key.startswith("HIERARCH"):
             key = "HIERARCH " + key
-        header.append((key, value))
+        header.append((key,) + value if isinstance(value, tuple) else (key, value))
     return header
 
 
+@functools.lru_cache(maxsize=256)
+def _astropyHeaderTemplate(items):
+    """Construct and cache an astropy FITS header
+
+    Parameters
+    ----------
+    items : `tuple` of `tuple`
+        FITS header keyword-value pairs.
+
+    Returns
+    -------
+    header : `astropy.io.fits.Header`
+        FITS header. This must not be modified.
+    """
+    return astropyHeaderFromDict(dict(items))
+
+
+def astropyHeaderFromTemplate(metadata):
+    """Convert a dict to an astropy FITS header, caching the result
+
+    This is intended for headers that are written many times over (e.g., mask
+    planes, enum documentation), for which constructing the header from
+    scratch is a significant part of the cost of writing a small file. The
+    values must be hashable.
+
+    Parameters
+    ----------
+    metadata : `dict`
+        FITS header keywords and values.
+
+    Returns
+    -------
+    header : `astropy.io.fits.Header`
+        FITS header; a copy of the cached template, so may be modified.
+    """
+    return _astropyHeaderTemplate(tuple(metadata.items())).copy()
+
+
+def createImageHDU(data, name, header=None, compress=False, quantizeLevel=None):
+    """Create an image HDU, optionally tile-compressed
+
+    Integer images are always compressed losslessly. Floating-point images are
+    compressed losslessly unless a ``quantizeLevel`` is provided, in which
+    case they are quantized (with the quantization step a fraction
+    ``1/quantizeLevel`` of the noise in each tile) and then compressed.
+
+    Compressed HDUs are decompressed transparently by `astropy.io.fits`, so
+    no special handling is required when reading.
+
+    Parameters
+    ----------
+    data : `numpy.ndarray`
+        Image data.
+    name : `str`
+        Name of the HDU.
+    header : `astropy.io.fits.Header`, optional
+        FITS header.
+    compress : `bool`, optional
+        Tile-compress the image?
+    quantizeLevel : `float`, optional
+        Quantization level for lossy compression of floating-point images.
+
+    Returns
+    -------
+    hdu : `astropy.io.fits.ImageHDU` or `astropy.io.fits.CompImageHDU`
+        Image HDU.
+    """
+    import astropy.io.fits
+    if not compress:
+        return astropy.io.fits.ImageHDU(data, header=header, name=name)
+    data = np.asarray(data)
+    if np.issubdtype(data.dtype, np.floating):
+        if quantizeLevel is not None:
+            kwargs = dict(compression_type="RICE_1", quantize_level=quantizeLevel)
+        else:
+            kwargs = dict(compression_type="GZIP_2", quantize_level=0.0)  # lossless
+    elif data.dtype.itemsize <= 4:
+        kwargs = dict(compression_type="RICE_1")
+    else:
+        kwargs = dict(compression_type="GZIP_2")  # RICE doesn't support 64-bit integers
+    return astropy.io.fits.CompImageHDU(data, header=header, name=name, **kwargs)
+
+
 def wraparoundNVisit(nVisit):
     """Wraparound number of visits to acceptable range (0-999)
 
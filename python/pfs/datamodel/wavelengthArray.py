@@ -1,9 +1,23 @@
+import functools
+
 import numpy as np
-import astropy.wcs
-import astropy.units
 
 __all__ = ["WavelengthArray"]
 
+# Conversion factors to nm for wavelength units in FITS headers
+_wavelengthUnits = {
+    "m": 1.0e9,
+    "cm": 1.0e7,
+    "mm": 1.0e6,
+    "um": 1.0e3,
+    "nm": 1.0,
+    "Angstrom": 0.1,
+    "angstrom": 0.1,
+}
+
+# Header keyword prefixes indicating a WCS that isn't a simple linear wavelength axis
+_nonlinearPrefixes = ("CD1_", "PC1_", "PV1_", "PS1_", "CROTA")
+
 
 class WavelengthArray(np.ndarray):
     """An array of wavelengths
@@ -47,28 +61,46 @@ class WavelengthArray(np.ndarray):
         return (f"{type(self).__name__}({self.minWavelength}, {self.maxWavelength}, "
                 f"{len(self)}, {self.dtype})")
 
+    def __reduce__(self):
+        """How to pickle
+
+        Only the construction parameters are pickled, unless the array no
+        longer matches them (e.g., it is a slice, or a modified copy), in
+        which case it is pickled as a plain `numpy.ndarray`.
+        """
+        if self._isPristine():
+            return type(self), (self.minWavelength, self.maxWavelength, len(self), self.dtype)
+        return self.view(np.ndarray).__reduce__()
+
+    def _isPristine(self):
+        """Does the array match its construction parameters?"""
+        if self.minWavelength is None or self.maxWavelength is None or self.ndim != 1:
+            return False
+        expected = np.linspace(self.minWavelength, self.maxWavelength, len(self), dtype=self.dtype)
+        return np.array_equal(self.view(np.ndarray), expected)
+
     def toFitsHeader(self):
         """Convert to a FITS header
 
+        The header keywords are written directly (rather than through
+        `astropy.wcs`), and cached for identical wavelength arrays.
+
         Returns
         -------
         header : `astropy.io.fits.Header`
             FITS header with WCS specifying wavelength array.
         """
-        wcs = astropy.wcs.WCS(naxis=1)
-        wcs.wcs.ctype = ["WAVE"]
-        wcs.wcs.cname = ["Wavelength"]
-        wcs.wcs.crval = [0.5*(self.minWavelength + self.maxWavelength)]
-        wcs.wcs.crpix = [0.5*len(self) + 1.5]  # FITS is unit-indexed
-        wcs.wcs.cunit = [astropy.units.nm]
-        dWavelength = (self.maxWavelength - self.minWavelength)/(len(self) - 1)
-        wcs.wcs.cdelt = [dWavelength]
-        return wcs.to_header()
+        return _makeWcsHeader(self.minWavelength, self.maxWavelength, len(self)).copy()
 
     @classmethod
     def fromFitsHeader(cls, header, length, dtype=np.float32):
         """Construct from a FITS header
 
+        A simple linear wavelength WCS (such as we write) is parsed directly
+        from the header keywords; anything else is interpreted by
+        `astropy.wcs`. Arrays are cached, so reading many files with the
+        same wavelength sampling yields the same (read-only) array.
+
         Parameters
         ----------
         header : `astropy.io.fits.Header`
@@ -83,9 +115,122 @@ class WavelengthArray(np.ndarray):
         self : cls
             Constructed wavelength array.
         """
-        wcs = astropy.wcs.WCS(header=header)
-        if len(wcs.wcs.ctype) != 1 or wcs.wcs.ctype[0] != "WAVE":
-            raise RuntimeError(f"Unexpected CTYPE in header: {wcs.wcs.ctype}")
-        minWavelength = wcs.pixel_to_world(1.0).to(astropy.units.nm).value
-        maxWavelength = wcs.pixel_to_world(length).to(astropy.units.nm).value
-        return cls(minWavelength, maxWavelength, length, dtype=dtype)
+        wavelength = _parseLinearWavelength(header, length)
+        if wavelength is None:
+            wavelength = _parseWcsWavelength(header, length)
+        minWavelength, maxWavelength = wavelength
+        return _makeWavelengthArray(cls, minWavelength, maxWavelength, length, np.dtype(dtype))
+
+
+@functools.lru_cache(maxsize=64)
+def _makeWavelengthArray(cls, minWavelength, maxWavelength, length, dtype):
+    """Construct and cache a wavelength array
+
+    Parameters
+    ----------
+    cls : `type`
+        Class to construct: `WavelengthArray` or a subclass.
+    minWavelength : `float`
+        Minimum wavelength (nm).
+    maxWavelength : `float`
+        Maximum wavelength (nm).
+    length : `int`
+        Number of values.
+    dtype : `numpy.dtype`
+        Data type.
+
+    Returns
+    -------
+    wavelength : ``cls``
+        Wavelength array. This is read-only, and may be shared.
+    """
+    return cls(minWavelength, maxWavelength, length, dtype=dtype)
+
+
+def _parseLinearWavelength(header, length):
+    """Parse a linear wavelength WCS from FITS header keywords
+
+    Parameters
+    ----------
+    header : `astropy.io.fits.Header`
+        FITS header with WCS specifying wavelength array.
+    length : `int`
+        Length of the array.
+
+    Returns
+    -------
+    minWavelength, maxWavelength : `float`
+        Minimum and maximum wavelength (nm), or `None` if the WCS is not a
+        simple linear wavelength axis in known units.
+    """
+    if str(header.get("CTYPE1", "")).strip() != "WAVE" or header.get("WCSAXES", 1) != 1:
+        return None
+    scale = _wavelengthUnits.get(str(header.get("CUNIT1", "m")).strip())
+    if scale is None:
+        return None
+    if any(key.startswith(_nonlinearPrefixes) for key in header.keys()):
+        return None
+    crval = float(header.get("CRVAL1", 0.0))
+    crpix = float(header.get("CRPIX1", 0.0))
+    cdelt = float(header.get("CDELT1", 1.0))
+    # Consistent with the header we write (and the astropy interpretation of
+    # it), the first element is at unit-indexed pixel 2.
+    minWavelength = scale*(crval + cdelt*(2.0 - crpix))
+    maxWavelength = scale*(crval + cdelt*(length + 1.0 - crpix))
+    return minWavelength, maxWavelength
+
+
+def _parseWcsWavelength(header, length):
+    """Parse a wavelength WCS from a FITS header using `astropy.wcs`
+
+    Parameters
+    ----------
+    header : `astropy.io.fits.Header`
+        FITS header with WCS specifying wavelength array.
+    length : `int`
+        Length of the array.
+
+    Returns
+    -------
+    minWavelength, maxWavelength : `float`
+        Minimum and maximum wavelength (nm).
+    """
+    import astropy.wcs
+    import astropy.units
+    wcs = astropy.wcs.WCS(header=header)
+    if len(wcs.wcs.ctype) != 1 or wcs.wcs.ctype[0] != "WAVE":
+        raise RuntimeError(f"Unexpected CTYPE in header: {wcs.wcs.ctype}")
+    minWavelength = wcs.pixel_to_world(1.0).to(astropy.units.nm).value
+    maxWavelength = wcs.pixel_to_world(length).to(astropy.units.nm).value
+    return minWavelength, maxWavelength
+
+
+@functools.lru_cache(maxsize=64)
+def _makeWcsHeader(minWavelength, maxWavelength, length):
+    """Construct and cache a FITS header with WCS specifying a wavelength array
+
+    Parameters
+    ----------
+    minWavelength : `float`
+        Minimum wavelength (nm).
+    maxWavelength : `float`
+        Maximum wavelength (nm).
+    length : `int`
+        Number of values.
+
+    Returns
+    -------
+    header : `astropy.io.fits.Header`
+        FITS header with WCS. This must not be modified.
+    """
+    from astropy.io.fits import Header
+    dWavelength = (maxWavelength - minWavelength)/(length - 1)
+    return Header([
+        ("WCSAXES", 1, "Number of coordinate axes"),
+        ("CRPIX1", 0.5*length + 1.5, "Pixel coordinate of reference point"),  # FITS is unit-indexed
+        ("CDELT1", dWavelength, "[nm] Coordinate increment at reference point"),
+        ("CUNIT1", "nm", "Units of coordinate increment and value"),
+        ("CTYPE1", "WAVE", "Vacuum wavelength (linear)"),
+        ("CRVAL1", 0.5*(minWavelength + maxWavelength), "[nm] Coordinate value at reference point"),
+        ("CNAME1", "Wavelength", "Axis name for labelling purposes"),
+    ])
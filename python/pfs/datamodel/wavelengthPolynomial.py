@@ -0,0 +1,169 @@
+import numpy as np
+
+__all__ = ["WavelengthPolynomial"]
+
+
+class WavelengthPolynomial:
+    """Wavelength solutions as polynomials in pixel
+
+    The wavelength for each spectrum is a Chebyshev polynomial in the pixel
+    index, scaled to the range ``[-1, 1]``. This allows persisting the
+    wavelength arrays of a `pfs.datamodel.PfsFiberArraySet` as a small number
+    of coefficients per spectrum instead of an image. A solution common to all
+    spectra (e.g., the linear sampling of a ``pfsMerged``) is stored only once.
+
+    Parameters
+    ----------
+    coeffs : `numpy.ndarray` of `float`, shape ``(numSpectra, order + 1)``
+        Chebyshev coefficients for each spectrum. If there is a single row, it
+        applies to all spectra.
+    numSpectra : `int`
+        Number of spectra.
+    length : `int`
+        Number of pixels in each spectrum.
+    dtype : `numpy.dtype`, optional
+        Data type of the evaluated wavelength array.
+    maxResidual : `float`, optional
+        Maximum absolute residual (nm) of the fit to the original wavelengths.
+    """
+    def __init__(self, coeffs, numSpectra, length, dtype=np.float32, maxResidual=0.0):
+        self.coeffs = np.atleast_2d(np.asarray(coeffs, dtype=float))
+        if self.coeffs.shape[0] not in (1, numSpectra):
+            raise RuntimeError("Coefficients shape %s doesn't match numSpectra=%d" %
+                               (self.coeffs.shape, numSpectra))
+        self.numSpectra = numSpectra
+        self.length = length
+        self.dtype = np.dtype(dtype)
+        self.maxResidual = maxResidual
+
+    @property
+    def shape(self):
+        """Shape of the evaluated wavelength array"""
+        return (self.numSpectra, self.length)
+
+    @property
+    def order(self):
+        """Polynomial order"""
+        return self.coeffs.shape[1] - 1
+
+    @property
+    def isShared(self):
+        """Is the solution common to all spectra?"""
+        return self.coeffs.shape[0] == 1
+
+    def __repr__(self):
+        """String representation"""
+        return "%s(numSpectra=%d, length=%d, order=%d, shared=%s, maxResidual=%g)" % (
+            type(self).__name__, self.numSpectra, self.length, self.order, self.isShared, self.maxResidual)
+
+    def _scalePixels(self, pixels):
+        """Scale pixel indices to the range ``[-1, 1]``"""
+        return 2.0*np.asarray(pixels, dtype=float)/max(self.length - 1, 1) - 1.0
+
+    def evaluate(self, rows=slice(None), pixels=slice(None)):
+        """Evaluate the wavelength array
+
+        Parameters
+        ----------
+        rows : `slice` or array-like of `int`, optional
+            Spectra for which to evaluate.
+        pixels : `slice`, optional
+            Pixels for which to evaluate.
+
+        Returns
+        -------
+        wavelength : `numpy.ndarray` of `float`, shape ``(numRows, numPixels)``
+            Wavelength array.
+        """
+        numRows = len(np.arange(self.numSpectra)[rows])
+        xx = self._scalePixels(np.arange(self.length)[pixels])
+        coeffs = self.coeffs if self.isShared else self.coeffs[rows]
+        values = np.polynomial.chebyshev.chebval(xx, coeffs.T)
+        return np.array(np.broadcast_to(values, (numRows, len(xx))), dtype=self.dtype)
+
+    @classmethod
+    def fit(cls, wavelength, order=3, tolerance=1.0e-4):
+        """Fit the wavelength arrays with polynomials
+
+        A solution common to all spectra is detected, in which case it is
+        stored once; a linear solution is preferred if it is good enough.
+        Otherwise, each spectrum is fit independently, all at once.
+
+        Parameters
+        ----------
+        wavelength : `numpy.ndarray` of `float`, shape ``(numSpectra, length)``
+            Wavelength array.
+        order : `int`, optional
+            Polynomial order.
+        tolerance : `float`, optional
+            Maximum acceptable absolute residual (nm).
+
+        Returns
+        -------
+        self : `WavelengthPolynomial` or `None`
+            Fit solution, or `None` if the residuals exceed the tolerance.
+        """
+        wavelength = np.asarray(wavelength)
+        numSpectra, length = wavelength.shape
+        if numSpectra == 0 or length <= order + 1 or not np.all(np.isfinite(wavelength)):
+            return None
+        xx = 2.0*np.arange(length, dtype=float)/max(length - 1, 1) - 1.0
+
+        def attempt(values, order):
+            """Fit polynomials to each row; return the solution if the residuals are acceptable"""
+            coeffs = np.polynomial.chebyshev.chebfit(xx, values.T.astype(float), order).T
+            model = cls(coeffs, numSpectra, length, wavelength.dtype)
+            model.maxResidual = float(np.max(np.abs(model.evaluate(slice(0, len(values))) - values)))
+            return model if model.maxResidual <= tolerance else None
+
+        if np.all(wavelength == wavelength[:1]):
+            for oo in sorted(set((1, order))):
+                model = attempt(wavelength[:1], oo)
+                if model is not None:
+                    return model
+            return None
+        return attempt(wavelength, order)
+
+    def toFits(self, name="WAVELENGTH"):
+        """Convert to a FITS HDU
+
+        Parameters
+        ----------
+        name : `str`, optional
+            Name of the HDU.
+
+        Returns
+        -------
+        hdu : `astropy.io.fits.ImageHDU`
+            HDU containing the coefficients.
+        """
+        import astropy.io.fits
+        header = astropy.io.fits.Header()
+        header["WLMODEL"] = ("CHEBYSHEV", "Wavelength solution model")
+        header["WLLENGTH"] = (self.length, "Number of pixels in spectra")
+        header["WLNSPEC"] = (self.numSpectra, "Number of spectra")
+        header["WLDTYPE"] = (self.dtype.name, "Data type of wavelength array")
+        header["WLMAXRES"] = (self.maxResidual, "Maximum absolute residual of fit (nm)")
+        return astropy.io.fits.ImageHDU(self.coeffs, header=header, name=name)
+
+    @classmethod
+    def fromFits(cls, hdu):
+        """Construct from a FITS HDU
+
+        Parameters
+        ----------
+        hdu : `astropy.io.fits.ImageHDU`
+            HDU, as written by ``toFits``.
+
+        Returns
+        -------
+        self : `WavelengthPolynomial` or `None`
+            Solution, or `None` if the HDU holds a plain wavelength image.
+        """
+        header = hdu.header
+        if "WLMODEL" not in header:
+            return None
+        if header["WLMODEL"] != "CHEBYSHEV":
+            raise RuntimeError("Unrecognised wavelength model: %s" % (header["WLMODEL"],))
+        return cls(hdu.data, header["WLNSPEC"], header["WLLENGTH"], np.dtype(header["WLDTYPE"]),
+                   header["WLMAXRES"])
@@ -0,0 +1,103 @@
+import sys
+import unittest
+
+import numpy as np
+
+import lsst.utils.tests
+
+from pfs.datamodel import BandedCovariance
+from pfs.datamodel.utils import makeFullCovariance
+
+display = None
+
+
+class BandedCovarianceTestCase(lsst.utils.tests.TestCase):
+    def setUp(self):
+        self.numSpectra = 4
+        self.length = 30
+        rng = np.random.RandomState(12345)
+        # Construct a positive-definite banded matrix: diagonally dominant
+        self.covar = np.zeros((self.numSpectra, 3, self.length))
+        self.covar[:, 0] = rng.uniform(2.0, 3.0, size=(self.numSpectra, self.length))
+        self.covar[:, 1, :-1] = rng.uniform(-0.5, 0.5, size=(self.numSpectra, self.length - 1))
+        self.covar[:, 2, :-2] = rng.uniform(-0.3, 0.3, size=(self.numSpectra, self.length - 2))
+        self.vector = rng.normal(size=(self.numSpectra, self.length))
+        self.banded = BandedCovariance(self.covar)
+        self.dense = self.banded.toDense()
+
+    def testDense(self):
+        """Test conversion to and from a dense matrix"""
+        self.assertEqual(self.dense.shape, (self.numSpectra, self.length, self.length))
+        for ii in range(self.numSpectra):
+            self.assertFloatsEqual(self.dense[ii], makeFullCovariance(self.covar[ii]))
+            self.assertFloatsEqual(self.dense[ii], self.dense[ii].T)
+        self.assertFloatsEqual(BandedCovariance.fromDense(self.dense).covar, self.covar)
+        self.assertFloatsEqual(self.banded[1].toDense(), self.dense[1])
+
+    def testElement(self):
+        """Test retrieval of elements"""
+        row = np.array([0, 5, 5, 5, 7, 29, 3])
+        col = np.array([0, 4, 7, 8, 7, 27, 40])
+        values = self.banded.element(row, col)
+        self.assertEqual(values.shape, (self.numSpectra, len(row)))
+        for ii in range(self.numSpectra):
+            expect = [self.dense[ii, rr, cc] if cc < self.length else 0.0 for rr, cc in zip(row, col)]
+            self.assertFloatsEqual(values[ii], expect)
+
+    def testLinearAlgebra(self):
+        """Test matrix-vector product, solve and chi^2"""
+        product = self.banded.dot(self.vector)
+        solution = self.banded.solve(self.vector)
+        chi2 = self.banded.chi2(self.vector)
+        for ii in range(self.numSpectra):
+            self.assertFloatsAlmostEqual(product[ii], self.dense[ii] @ self.vector[ii], atol=1.0e-12)
+            expect = np.linalg.solve(self.dense[ii], self.vector[ii])
+            self.assertFloatsAlmostEqual(solution[ii], expect, atol=1.0e-10)
+            self.assertFloatsAlmostEqual(chi2[ii], self.vector[ii] @ expect, rtol=1.0e-10)
+
+    def testSolveMany(self):
+        """Test solving for many long spectra, with multiple right-hand sides"""
+        numSpectra = BandedCovariance._chunkSize + 7  # Multiple chunks
+        length = 1001  # Odd number of blocks, so the reduction is padded
+        rng = np.random.RandomState(54321)
+        covar = np.zeros((numSpectra, 4, length))
+        covar[:, 0] = rng.uniform(2.0, 3.0, size=(numSpectra, length))
+        for kk in range(1, 4):
+            covar[:, kk, :-kk] = rng.uniform(-0.2, 0.2, size=(numSpectra, length - kk))
+        banded = BandedCovariance(covar)
+        vector = rng.normal(size=(2, numSpectra, length))
+        solution = banded.solve(vector)
+        self.assertEqual(solution.shape, vector.shape)
+        for ii in range(len(vector)):
+            self.assertFloatsAlmostEqual(banded.dot(solution[ii]), vector[ii], atol=1.0e-12)
+        expect = np.linalg.solve(banded[-1].toDense(), vector[1, -1])
+        self.assertFloatsAlmostEqual(solution[1, -1], expect, atol=1.0e-10)
+
+    def testWindow(self):
+        """Test extracting a window of pixels"""
+        start, stop = 7, 19
+        window = self.banded.window(start, stop)
+        self.assertEqual(len(window), stop - start)
+        self.assertFloatsEqual(window.toDense(), self.dense[:, start:stop, start:stop])
+        vector = self.vector[:, start:stop]
+        for ii in range(self.numSpectra):
+            expect = np.linalg.solve(self.dense[ii, start:stop, start:stop], vector[ii])
+            self.assertFloatsAlmostEqual(window.solve(vector)[ii], expect, atol=1.0e-10)
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    setup_module(sys.modules["__main__"])
+    from argparse import ArgumentParser
+    parser = ArgumentParser(__file__)
+    parser.add_argument("--display", help="Display backend")
+    args, argv = parser.parse_known_args()
+    display = args.display
+    unittest.main(failfast=True, argv=[__file__] + argv)
@@ -0,0 +1,127 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+import lsst.utils.tests
+
+from pfs.datamodel import Target, TargetType, Observations, MaskHelper, CoaddAccumulator
+from pfs.datamodel.wavelengthArray import WavelengthArray
+from pfs.datamodel.utils import calculatePfsVisitHash
+from pfs.datamodel.drp import PfsSingle, PfsObject
+
+display = None
+
+
+class CoaddAccumulatorTestCase(lsst.utils.tests.TestCase):
+    def setUp(self):
+        self.length = 300
+        self.visits = [10, 20, 30, 40]
+        self.target = Target(1, 2, "3,4", 0x123456789, 10.0, 20.0, TargetType.SCIENCE, {"g": 22.0})
+        self.flags = MaskHelper(BAD=0, CR=1, FOO=2)
+        self.wavelength = WavelengthArray(600.0, 900.0, self.length)
+        self.spectra = [self.makeSingle(vv, seed) for seed, vv in enumerate(self.visits)]
+        self.filename = os.path.join(os.path.splitext(__file__)[0] + ".fits")
+
+    def tearDown(self):
+        if os.path.exists(self.filename):
+            os.unlink(self.filename)
+
+    def makeSingle(self, visit, seed):
+        """Construct a PfsSingle for our target"""
+        rng = np.random.RandomState(seed)
+        observations = Observations(np.array([visit]), ["r"], np.array([1]), np.array([0x1234]),
+                                    np.array([5 + seed]), rng.uniform(size=(1, 2)), rng.uniform(size=(1, 2)))
+        flux = rng.normal(10.0, 1.0, size=self.length).astype(np.float32)
+        mask = rng.choice([0, 1, 2, 4], p=[0.85, 0.05, 0.05, 0.05], size=self.length).astype(np.int32)
+        sky = rng.uniform(size=self.length).astype(np.float32)
+        covar = np.zeros((3, self.length), dtype=np.float32)
+        covar[0] = rng.uniform(0.5, 2.0, size=self.length)
+        covar[1, :-1] = rng.uniform(-0.1, 0.1, size=self.length - 1)
+        covar[2, :-2] = rng.uniform(-0.05, 0.05, size=self.length - 2)
+        return PfsSingle(self.target, observations, self.wavelength, flux, mask, sky, covar,
+                         np.zeros((1, 1), dtype=np.float32), self.flags, {})
+
+    def assertCoadd(self, coadd, spectra):
+        """Assert that the coadd matches a direct calculation from the spectra"""
+        bad = self.flags.get("BAD", "CR")
+        weights = np.array([np.where((ss.mask & bad) == 0, 1.0/ss.variance, 0.0) for ss in spectra])
+        weightSum = weights.sum(axis=0)
+        good = weightSum > 0
+        flux = np.sum([ww*ss.flux for ww, ss in zip(weights, spectra)], axis=0)/np.where(good, weightSum, 1)
+        self.assertFloatsAlmostEqual(coadd.flux[good], flux[good], rtol=1.0e-6)
+        self.assertFloatsAlmostEqual(coadd.variance[good], 1.0/weightSum[good], rtol=1.0e-6)
+        covar1 = np.sum([ww[:-1]*ww[1:]*ss.covar[1, :-1] for ww, ss in zip(weights, spectra)], axis=0)
+        select = good[:-1] & good[1:]
+        self.assertFloatsAlmostEqual(coadd.covar[1, :-1][select],
+                                     covar1[select]/(weightSum[:-1]*weightSum[1:])[select], atol=1.0e-7)
+        maskOr = np.bitwise_or.reduce([np.where(ww > 0, ss.mask, 0) for ww, ss in zip(weights, spectra)])
+        self.assertFloatsEqual(coadd.mask[good], maskOr[good])
+        self.assertTrue(np.all(coadd.mask[~good] & coadd.flags["NO_DATA"]))
+
+        self.assertEqual(coadd.nVisit, len(spectra))
+        self.assertFloatsEqual(coadd.observations.visit, [ss.observations.visit[0] for ss in spectra])
+        self.assertEqual(coadd.getIdentity()["pfsVisitHash"],
+                         calculatePfsVisitHash([ss.observations.visit[0] for ss in spectra]))
+
+    def testCoadd(self):
+        """Test that streaming coadds match the direct calculation"""
+        accumulator = CoaddAccumulator.fromSpectrum(self.spectra[0])
+        for ii, spectrum in enumerate(self.spectra[1:], 2):
+            accumulator.add(spectrum)
+            self.assertEqual(len(accumulator), ii)
+            self.assertCoadd(accumulator.getCoadd(), self.spectra[:ii])
+        coadd = accumulator.getCoadd()
+        self.assertIsInstance(coadd, PfsObject)
+
+        with self.assertRaises(RuntimeError):
+            accumulator.add(self.spectra[0])  # Duplicate
+
+        # Round-trip of the coadd through FITS
+        coadd.writeFits(self.filename)
+        copy = PfsObject.readFits(self.filename)
+        self.assertFloatsEqual(copy.flux, coadd.flux)
+        self.assertEqual(copy.filename, coadd.filename)
+
+    def testPersistence(self):
+        """Test updating a coadd from persisted state"""
+        accumulator = CoaddAccumulator.fromSpectrum(self.spectra[0], metadata=dict(FOO=1))
+        for spectrum in self.spectra[1:-1]:
+            accumulator.add(spectrum)
+        accumulator.writeFits(self.filename)
+
+        copy = CoaddAccumulator.readFits(self.filename)
+        self.assertEqual(len(copy), len(self.spectra) - 1)
+        self.assertEqual(copy.metadata, dict(FOO=1))
+        self.assertIsInstance(copy.wavelength, WavelengthArray)
+        copy.add(self.spectra[-1])
+        self.assertCoadd(copy.getCoadd(), self.spectra)
+
+    def testResample(self):
+        """Test adding a spectrum with a different wavelength sampling"""
+        accumulator = CoaddAccumulator(self.target, WavelengthArray(650.0, 850.0, 100), self.flags)
+        accumulator.add(self.spectra[0])
+        coadd = accumulator.getCoadd()
+        expect = np.interp(accumulator.wavelength, self.wavelength, self.spectra[0].flux)
+        good = (coadd.mask & self.flags.get("BAD", "CR")) == 0
+        self.assertGreater(good.sum(), 50)
+        self.assertFloatsAlmostEqual(coadd.flux[good], expect[good], rtol=1.0e-5)
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    setup_module(sys.modules["__main__"])
+    from argparse import ArgumentParser
+    parser = ArgumentParser(__file__)
+    parser.add_argument("--display", help="Display backend")
+    args, argv = parser.parse_known_args()
+    display = args.display
+    unittest.main(failfast=True, argv=[__file__] + argv)
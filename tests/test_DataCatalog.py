@@ -0,0 +1,130 @@
+import os
+import sys
+import shutil
+import unittest
+
+import lsst.utils.tests
+
+from pfs.datamodel import DataCatalog
+
+display = None
+
+
+class DataCatalogTestCase(lsst.utils.tests.TestCase):
+    def setUp(self):
+        self.root = os.path.splitext(__file__)[0]
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
+        self.files = {
+            "pfsArm/123450/pfsArm-123450-b1.fits": ("pfsArm", dict(visit=123450, arm="b",
+                                                                   spectrograph=1)),
+            "pfsArm/123450/pfsArm-123450-r2.fits": ("pfsArm", dict(visit=123450, arm="r",
+                                                                   spectrograph=2)),
+            "pfsMerged/pfsMerged-123450.fits": ("pfsMerged", dict(visit=123450)),
+            "pfsSingle/00007/pfsSingle-12300-00007-2,2-f2468ace1234abcd-123450.fits":
+                ("pfsSingle", dict(catId=12300, tract=7, patch="2,2", objId=0xf2468ace1234abcd,
+                                   visit=123450)),
+            "pfsSingle/00007/pfsSingle-12300-00007-2,2-f2468ace1234abcd-123451.fits":
+                ("pfsSingle", dict(catId=12300, tract=7, patch="2,2", objId=0xf2468ace1234abcd,
+                                   visit=123451)),
+            "pfsObject/pfsObject-12300-00007-2,2-f2468ace1234abcd-002-0x1234abcddeadbeef.fits":
+                ("pfsObject", dict(catId=12300, tract=7, patch="2,2", objId=0xf2468ace1234abcd, nVisit=2,
+                                   pfsVisitHash=0x1234abcddeadbeef)),
+            "pfsConfig-0x00000000deadbeef-123450.fits":
+                ("pfsConfig", dict(pfsDesignId=0xdeadbeef, visit0=123450)),
+            "design/pfsDesign-0x00000000deadbeef.fits": ("pfsDesign", dict(pfsDesignId=0xdeadbeef)),
+            "pfsArm/123450/notAProduct.fits": (None, None),
+        }
+        for path in self.files:
+            self.touch(path)
+        self.catalog = DataCatalog(self.root + ".sqlite")
+
+    def tearDown(self):
+        self.catalog.close()
+        os.unlink(self.catalog.filename)
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
+
+    def touch(self, path):
+        """Create an empty file"""
+        path = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w"):
+            pass
+
+    def ageDirectories(self):
+        """Set the modification times of all directories to the past
+
+        Directories modified close to the time of the scan are always
+        rescanned.
+        """
+        for dirName, _, _ in os.walk(self.root):
+            os.utime(dirName, (1.0e9, 1.0e9))
+
+    def testParse(self):
+        """Test parsing filenames"""
+        for path, expect in self.files.items():
+            self.assertEqual(self.catalog.parseFilename(path), expect)
+
+    def testScan(self):
+        """Test scanning and finding products"""
+        self.ageDirectories()
+        self.assertEqual(self.catalog.scan(self.root, workers=2), 8)
+        self.assertEqual(len(self.catalog), len(self.files) - 1)
+        for path, (product, identity) in self.files.items():
+            if product is None:
+                continue
+            results = self.catalog.find(product, **identity)
+            self.assertEqual(len(results), 1)
+            self.assertEqual(results[0]["path"], os.path.join(os.path.abspath(self.root), path))
+            self.assertEqual(results[0]["product"], product)
+            for key, value in identity.items():
+                self.assertEqual(results[0][key], value)
+        self.assertEqual(len(self.catalog.find("pfsSingle", objId=0xf2468ace1234abcd)), 2)
+        self.assertEqual(len(self.catalog.find(visit=123450)), 4)
+
+        # Rescan without changes: nothing is listed
+        self.assertEqual(self.catalog.scan(self.root), 0)
+
+        # Add and remove files
+        self.touch("pfsArm/123451/pfsArm-123451-b1.fits")
+        os.unlink(os.path.join(self.root, "pfsMerged/pfsMerged-123450.fits"))
+        shutil.rmtree(os.path.join(self.root, "design"))
+        self.assertEqual(self.catalog.scan(self.root), 4)  # Root, pfsArm, pfsArm/123451 and pfsMerged
+        self.assertEqual(len(self.catalog.find("pfsArm")), 3)
+        self.assertEqual(len(self.catalog.find("pfsMerged")), 0)
+        self.assertEqual(len(self.catalog.find("pfsDesign")), 0)
+
+        # Persistence
+        with DataCatalog(self.catalog.filename) as catalog:
+            self.assertEqual(len(catalog), len(self.catalog))
+
+        with self.assertRaises(RuntimeError):
+            self.catalog.find(foo=1)
+
+    def testSymlinks(self):
+        """Test that symbolic links to directories are not followed"""
+        os.symlink("..", os.path.join(self.root, "pfsArm", "123450", "loop"))
+        os.symlink(os.path.join(self.root, "pfsMerged"), os.path.join(self.root, "linkedMerged"))
+        self.assertEqual(self.catalog.scan(self.root), 8)
+        self.assertEqual(len(self.catalog), len(self.files) - 1)
+        self.assertEqual(len(self.catalog.find("pfsArm")), 2)
+        self.assertEqual(len(self.catalog.find("pfsMerged")), 1)
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    setup_module(sys.modules["__main__"])
+    from argparse import ArgumentParser
+    parser = ArgumentParser(__file__)
+    parser.add_argument("--display", help="Display backend")
+    args, argv = parser.parse_known_args()
+    display = args.display
+    unittest.main(failfast=True, argv=[__file__] + argv)
@@ -55,6 +55,12 @@ class FluxTableTestCase(lsst.utils.tests.TestCase):
         ft = FluxTable.fromFits(fits)
         self.assertFluxTable(ft)
 
+        fits = HDUList()
+        self.fluxTable.toFits(fits, compactMask=True)
+        ft = FluxTable.fromFits(fits)
+        self.assertEqual(ft.mask.dtype, np.int32)
+        self.assertFluxTable(ft)
+
 
 class TestMemory(lsst.utils.tests.MemoryTestCase):
     pass
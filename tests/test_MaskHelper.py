@@ -0,0 +1,148 @@
+import sys
+import unittest
+
+import numpy as np
+
+import lsst.utils.tests
+
+from pfs.datamodel import MaskHelper
+
+display = None
+
+
+class MaskHelperTestCase(lsst.utils.tests.TestCase):
+    def setUp(self):
+        self.rng = np.random.RandomState(12345)
+        self.helper = MaskHelper(BAD=0, SAT=1, CR=3, NO_DATA=40)
+        self.shape = (10, 1000)
+        self.mask = np.where(self.rng.uniform(size=self.shape) < 0.3,
+                             self.rng.choice([1, 2, 8, 3, 2**40, 16], self.shape), 0).astype(np.int64)
+
+    def testCount(self):
+        """Test counting combinations of mask planes"""
+        counts = self.helper.count(self.mask)
+        self.assertEqual(sum(counts.values()), self.mask.size)
+        # Value 16 has no known plane set, so it counts as no plane set
+        self.assertEqual(counts[""], np.sum((self.mask == 0) | (self.mask == 16)))
+        self.assertEqual(counts["BAD,SAT"], np.sum(self.mask == 3))
+        self.assertEqual(counts["NO_DATA"], np.sum(self.mask == 2**40))
+
+    def testCountPlanes(self):
+        """Test counting individual mask planes"""
+        counts = self.helper.countPlanes(self.mask)
+        perFiber = self.helper.countPlanes(self.mask, axis=1)
+        for name in self.helper:
+            expect = (self.mask & self.helper[name]) != 0
+            self.assertEqual(counts[name], expect.sum())
+            np.testing.assert_array_equal(perFiber[name], expect.sum(axis=1))
+
+        # Planes that can't be represented by the mask type are never set
+        counts = self.helper.countPlanes(self.mask.astype(np.int32))
+        self.assertEqual(counts["NO_DATA"], 0)
+        self.assertEqual(counts["BAD"], np.sum((self.mask & 1) != 0))
+
+    def testSelect(self):
+        """Test selecting pixels by mask planes"""
+        bad = (self.mask & 1) != 0
+        sat = (self.mask & 2) != 0
+        noData = (self.mask & 2**40) != 0
+        np.testing.assert_array_equal(self.helper.select(self.mask, "BAD"), bad)
+        np.testing.assert_array_equal(self.helper.select(self.mask, "BAD", "SAT"), bad | sat)
+        np.testing.assert_array_equal(self.helper.select(self.mask, "BAD", "SAT", mode="all"), bad & sat)
+        np.testing.assert_array_equal(self.helper.select(self.mask),
+                                      (self.mask & self.helper.get(*self.helper)) != 0)
+        np.testing.assert_array_equal(self.helper.select(self.mask, "NO_DATA"), noData)
+        self.assertFalse(np.any(self.helper.select(self.mask.astype(np.int32), "NO_DATA")))
+        with self.assertRaises(KeyError):
+            self.helper.select(self.mask, "UNKNOWN")
+        with self.assertRaises(RuntimeError):
+            self.helper.select(self.mask, "BAD", mode="none")
+
+        # Adding a mask plane updates the cached values
+        self.helper.add("FOO")
+        self.assertEqual(self.helper["FOO"], 4)
+        np.testing.assert_array_equal(self.helper.select(self.mask, "FOO"), (self.mask & 4) != 0)
+
+    def testDecode(self):
+        """Test decoding a mask array into mask planes"""
+        names, planes = self.helper.decode(self.mask)
+        self.assertListEqual(names, list(self.helper))
+        self.assertEqual(planes.shape, (len(names),) + self.shape)
+        for name, plane in zip(names, planes):
+            np.testing.assert_array_equal(plane, (self.mask & self.helper[name]) != 0)
+
+    def testRemap(self):
+        """Test merging helpers that use different bits, and converting masks"""
+        other = MaskHelper(SAT=0, BAD=3, CR=1, NEW=2)
+        mask = np.zeros(self.shape, dtype=np.int32)
+        for name in self.helper:
+            if name in other:
+                mask[self.helper.select(self.mask, name)] |= other[name]
+        mask[:, ::7] |= other["NEW"]
+
+        with self.assertRaises(RuntimeError):
+            MaskHelper.fromMerge([self.helper, other])
+        merged = MaskHelper.fromMerge([self.helper, other], remap=True)
+        for name in self.helper:
+            self.assertEqual(merged[name], self.helper[name])  # First helper's bits are retained
+        self.assertIn("NEW", merged)
+        self.assertEqual(len(set(merged.flags.values())), len(merged))
+
+        remapped = merged.remap(mask, other)
+        self.assertEqual(remapped.dtype, np.int64)  # Merged helper has planes beyond 32 bits
+        for name in other:
+            np.testing.assert_array_equal(merged.select(remapped, name), other.select(mask, name), name)
+
+        # No conversion required
+        np.testing.assert_array_equal(merged.remap(self.mask, self.helper), self.mask)
+
+    def testCompactType(self):
+        """Test selecting the narrowest type for a mask"""
+        self.assertEqual(self.helper.getCompactType(), np.int64)
+        self.assertEqual(MaskHelper(BAD=0, SAT=7).getCompactType(), np.uint8)
+        self.assertEqual(MaskHelper(BAD=0, SAT=14).getCompactType(), np.int16)
+        self.assertEqual(MaskHelper(BAD=0, SAT=15).getCompactType(), np.int32)  # Not the sign bit
+        self.assertEqual(MaskHelper(BAD=0, SAT=30).getCompactType(), np.int32)
+        self.assertEqual(MaskHelper(BAD=0, SAT=31).getCompactType(), np.int64)
+
+        # Bits set in the mask without a mask plane are retained
+        helper = MaskHelper(BAD=0, SAT=1, CR=3)
+        self.assertEqual(helper.getCompactType(self.mask & 0xff), np.uint8)
+        self.assertEqual(helper.getCompactType(self.mask), np.int64)
+        mask = np.array([0, 1, 2**14], dtype=np.int32)
+        compact = mask.astype(helper.getCompactType(mask))
+        self.assertEqual(compact.dtype, np.int16)
+        np.testing.assert_array_equal(compact, mask)
+        self.assertEqual(helper.getCompactType(mask | 2**15), np.int32)
+
+    def testWiden(self):
+        """Test widening a compact mask to the in-memory type"""
+        mask = np.array([0, 1, 2**7], dtype=np.uint8)
+        widened = self.helper.widen(mask)
+        self.assertEqual(widened.dtype, np.int64)  # self.helper uses bit 40
+        np.testing.assert_array_equal(widened, mask)
+        helper = MaskHelper(BAD=0, SAT=7)
+        widened = helper.widen(mask)
+        self.assertEqual(widened.dtype, np.int32)
+        np.testing.assert_array_equal(widened, mask)
+        # Masks that are already wide enough aren't copied
+        mask = mask.astype(">i4")
+        self.assertIs(helper.widen(mask), mask)
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    setup_module(sys.modules["__main__"])
+    from argparse import ArgumentParser
+    parser = ArgumentParser(__file__)
+    parser.add_argument("--display", help="Display backend")
+    args, argv = parser.parse_known_args()
+    display = args.display
+    unittest.main(failfast=True, argv=[__file__] + argv)
@@ -1,4 +1,5 @@
 import os
+import re
 import sys
 import unittest
 
@@ -241,6 +242,44 @@ class PfsConfigTestCase(lsst.utils.tests.TestCase):
                       self.ra, self.dec, self.catId, self.objId, self.targetType, self.fiberStatus,
                       self.fiberMag, self.filterNames, self.pfiCenter, pfiNominal)
 
+    def testValidateMessages(self):
+        """Test the messages from validation failures"""
+        def makeConfig(**kwargs):
+            """Construct a PfsConfig, overriding some of the arguments"""
+            args = dict(fiberId=self.fiberId, tract=self.tract, patch=self.patch, ra=self.ra, dec=self.dec,
+                        catId=self.catId, objId=self.objId, targetType=self.targetType,
+                        fiberStatus=self.fiberStatus, fiberMag=self.fiberMag, filterNames=self.filterNames,
+                        pfiCenter=self.pfiCenter, pfiNominal=self.pfiNominal)
+            args.update(kwargs)
+            return PfsConfig(self.pfsDesignId, self.visit0, self.raBoresight.asDegrees(),
+                             self.decBoresight.asDegrees(), **args)
+
+        index = self.numFibers//2
+        targetType = self.targetType.copy()
+        targetType[index] = -1
+        with self.assertRaisesRegex(ValueError, r"^targetType\[%d\] = -1 is not a recognized TargetType$" %
+                                    (index,)):
+            makeConfig(targetType=targetType)
+
+        fiberStatus = self.fiberStatus.copy()
+        fiberStatus[index] = -1
+        with self.assertRaisesRegex(ValueError, r"^fiberStatus\[%d\] = -1 is not a recognised FiberStatus$" %
+                                    (index,)):
+            makeConfig(fiberStatus=fiberStatus)
+
+        index = next(ii for ii, names in enumerate(self.filterNames) if len(names) > 0)
+        fiberMag = [np.concatenate((mag, mag)) if ii == index else mag for
+                    ii, mag in enumerate(self.fiberMag)]
+        with self.assertRaisesRegex(RuntimeError, r"^Inconsistent lengths between fiberMag \(8\) and "
+                                    r"filterNames \(4\) for fiberId=%d$" % (self.fiberId[index],)):
+            makeConfig(fiberMag=fiberMag)
+
+        lengths = {nn: self.numFibers for nn in PfsConfig._keywords}
+        lengths["filterNames"] = 2*self.numFibers
+        message = "Inconsistent lengths: %s" % (lengths,)
+        with self.assertRaisesRegex(RuntimeError, r"^%s$" % (re.escape(message),)):
+            makeConfig(filterNames=self.filterNames + self.filterNames)
+
     def testFromPfsDesign(self):
         """Test PfsConfig.fromPfsDesign"""
         design = PfsDesign(self.pfsDesignId, self.raBoresight.asDegrees(), self.decBoresight.asDegrees(),
@@ -253,6 +292,77 @@ class PfsConfigTestCase(lsst.utils.tests.TestCase):
                            self.fiberMag, self.filterNames, self.pfiCenter, self.pfiNominal)
         self.assertPfsConfig(PfsConfig.fromPfsDesign(design, self.visit0, self.pfiCenter), config)
 
+    def testGetPhotometry(self):
+        """Test PfsDesign.getPhotometry"""
+        config = PfsConfig(self.pfsDesignId, self.visit0, self.raBoresight.asDegrees(),
+                           self.decBoresight.asDegrees(), self.fiberId, self.tract, self.patch,
+                           self.ra, self.dec, self.catId, self.objId, self.targetType, self.fiberStatus,
+                           self.fiberMag, self.filterNames, self.pfiCenter, self.pfiNominal)
+        self.assertListEqual(config.filters, ["H", "g", "i", "y"])
+        for ff in config.filters:
+            expect = [mag[names.index(ff)] if ff in names else np.nan for
+                      mag, names in zip(self.fiberMag, self.filterNames)]
+            np.testing.assert_array_equal(config.getPhotometry(ff), expect)
+        self.assertTrue(np.all(np.isnan(config.getPhotometry("r"))))
+
+        # Assigning the photometry
+        filterNames = [["r" if ff == "g" else ff for ff in names] for names in self.filterNames]
+        config.filterNames = filterNames
+        self.assertListEqual(config.filters, ["H", "i", "r", "y"])
+        np.testing.assert_array_equal(config.getPhotometry("r"),
+                                      [mag[0] if names else np.nan for
+                                       mag, names in zip(self.fiberMag, filterNames)])
+        config.fiberMag = [mag + 1 for mag in self.fiberMag]
+        for ii in range(len(config)):
+            np.testing.assert_array_equal(config.fiberMag[ii], self.fiberMag[ii] + 1)
+        with self.assertRaises(RuntimeError):
+            config.fiberMag = [np.zeros(1)]*len(config)
+
+    def testSelectFiber(self):
+        """Test PfsDesign.selectFiber and the methods that use it"""
+        config = PfsConfig(self.pfsDesignId, self.visit0, self.raBoresight.asDegrees(),
+                           self.decBoresight.asDegrees(), self.fiberId, self.tract, self.patch,
+                           self.ra, self.dec, self.catId, self.objId, self.targetType, self.fiberStatus,
+                           self.fiberMag, self.filterNames, self.pfiCenter, self.pfiNominal)
+        index = np.array([3, 14, 15, 9, 2])
+        fiberId = self.fiberId[index]
+        self.assertEqual(config.selectFiber(fiberId[0]), index[0])
+        np.testing.assert_array_equal(config.selectFiber(fiberId), index)
+        np.testing.assert_array_equal(config.extractNominal(fiberId), self.pfiNominal[index])
+        np.testing.assert_array_equal(config.extractCenters(fiberId), self.pfiCenter[index])
+        self.assertEqual(config.getIdentity(fiberId[0])["objId"], self.objId[index[0]])
+
+        targetType = self.targetType[index[0]]
+        np.testing.assert_array_equal(config.selectByTargetType(targetType, fiberId),
+                                      np.nonzero(self.targetType[index] == targetType)[0])
+
+        with self.assertRaises(RuntimeError):
+            config.selectFiber([self.fiberId[0], -1, -2])
+
+        # Replacing the fiberId array invalidates the index
+        config.fiberId = self.fiberId + 10000
+        self.assertEqual(config.selectFiber(fiberId[0] + 10000), index[0])
+
+    def testSelectTargets(self):
+        """Test PfsDesign.selectTarget and PfsDesign.selectTargets"""
+        config = PfsConfig(self.pfsDesignId, self.visit0, self.raBoresight.asDegrees(),
+                           self.decBoresight.asDegrees(), self.fiberId, self.tract, self.patch,
+                           self.ra, self.dec, self.catId, self.objId, self.targetType, self.fiberStatus,
+                           self.fiberMag, self.filterNames, self.pfiCenter, self.pfiNominal)
+        index = np.array([3, 14, 15, 9, 2])
+        patch = [self.patch[ii] for ii in index]
+        self.assertEqual(config.selectTarget(self.catId[index[0]], self.tract[index[0]], patch[0],
+                                             self.objId[index[0]]), index[0])
+        np.testing.assert_array_equal(config.selectTargets(self.catId[index], self.tract[index], patch,
+                                                           self.objId[index]), index)
+
+        objId = self.objId[index].copy()
+        objId[1] = -1
+        with self.assertRaises(RuntimeError):
+            config.selectTargets(self.catId[index], self.tract[index], patch, objId)
+        result = config.selectTargets(self.catId[index], self.tract[index], patch, objId, allowMissing=True)
+        np.testing.assert_array_equal(result, np.where(objId == -1, -1, index))
+
 
 class TestMemory(lsst.utils.tests.MemoryTestCase):
     pass
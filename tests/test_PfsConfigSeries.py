@@ -0,0 +1,110 @@
+import os
+import sys
+import shutil
+import unittest
+
+import numpy as np
+
+import lsst.utils.tests
+
+from pfs.datamodel import PfsDesign, PfsConfig, PfsConfigSeries, TargetType, FiberStatus
+
+display = None
+
+
+class PfsConfigSeriesTestCase(lsst.utils.tests.TestCase):
+    def setUp(self):
+        self.rng = np.random.RandomState(12345)
+        self.numFibers = 50
+        self.pfsDesignId = 0xfedcba9876543210
+        self.visit0 = [123, 125, 124]
+        self.dirName = os.path.splitext(__file__)[0]
+        if os.path.exists(self.dirName):
+            shutil.rmtree(self.dirName)
+        os.makedirs(self.dirName)
+
+        num = self.numFibers
+        targetType = self.rng.choice([int(TargetType.SCIENCE), int(TargetType.SKY)], num)
+        fiberMag = [[20.0, 21.0] if tt == TargetType.SCIENCE else [] for tt in targetType]
+        filterNames = [["g", "i"] if tt == TargetType.SCIENCE else [] for tt in targetType]
+        self.design = PfsDesign(self.pfsDesignId, 12.3, 45.6, np.arange(1, num + 1), np.full(num, 7),
+                                ["1,1"]*num, self.rng.uniform(size=num), self.rng.uniform(size=num),
+                                np.zeros(num, dtype=int), np.arange(num), targetType,
+                                np.full(num, int(FiberStatus.GOOD)), fiberMag, filterNames,
+                                self.rng.uniform(size=(num, 2)).astype(np.float32))
+        self.configs = []
+        for visit0 in self.visit0:
+            fiberStatus = self.design.fiberStatus.copy()
+            fiberStatus[self.rng.randint(num)] = FiberStatus.BROKENFIBER
+            pfiCenter = self.rng.uniform(size=(num, 2)).astype(np.float32)
+            self.configs.append(PfsConfig.fromPfsDesign(self.design, visit0, pfiCenter, fiberStatus))
+
+    def tearDown(self):
+        shutil.rmtree(self.dirName)
+
+    def assertPfsConfig(self, lhs, rhs):
+        """Check that two PfsConfigs are equal"""
+        for name in ("pfsDesignId", "visit0", "raBoresight", "decBoresight"):
+            self.assertEqual(getattr(lhs, name), getattr(rhs, name), name)
+        for name in list(PfsConfig._fields) + ["fiberStatus"]:
+            np.testing.assert_array_equal(getattr(lhs, name), getattr(rhs, name), name)
+        for ii in range(len(lhs)):
+            np.testing.assert_array_equal(lhs.fiberMag[ii], rhs.fiberMag[ii])
+            self.assertListEqual(lhs.filterNames[ii], rhs.filterNames[ii])
+
+    def assertSeries(self, series):
+        """Check that the series reproduces the configs"""
+        self.assertEqual(len(series), len(self.configs))
+        for config, view in zip(self.configs, series):
+            self.assertPfsConfig(view, config)
+        self.assertPfsConfig(series.getConfig(self.visit0[1]), self.configs[1])
+
+    def testBasic(self):
+        """Test construction, views and I/O"""
+        series = PfsConfigSeries.fromPfsConfigs(self.configs)
+        self.assertSeries(series)
+        view = series[0]
+        self.assertIs(view.ra, series.pfsDesign.ra)  # Shared, not copied
+
+        series.write(self.dirName)
+        copy = PfsConfigSeries.read(self.pfsDesignId, dirName=self.dirName)
+        self.assertSeries(copy)
+        view = copy[0]
+        for name in list(PfsConfig._fields) + ["visit0", "fiberStatus"]:
+            value = np.asarray(getattr(view, name))
+            self.assertTrue(value.dtype.isnative, name)  # Not the big-endian FITS data
+
+        series.writePfsConfigs(self.dirName)
+        self.assertSeries(PfsConfigSeries.readPfsConfigs(self.pfsDesignId, self.visit0, dirName=self.dirName))
+
+    def testAppend(self):
+        """Test appending visits"""
+        series = PfsConfigSeries.fromPfsConfigs(self.configs[:1])
+        for config in self.configs[1:]:
+            series.append(config)
+        self.assertSeries(series)
+
+        with self.assertRaises(RuntimeError):
+            series.append(self.configs[0])  # Duplicate visit
+        other = PfsConfig.fromPfsDesign(self.design, 999, self.configs[0].pfiCenter)
+        other.ra = other.ra + 1.0
+        with self.assertRaises(RuntimeError):
+            series.append(other)  # Different design
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    setup_module(sys.modules["__main__"])
+    from argparse import ArgumentParser
+    parser = ArgumentParser(__file__)
+    parser.add_argument("--display", help="Display backend")
+    args, argv = parser.parse_known_args()
+    display = args.display
+    unittest.main(failfast=True, argv=[__file__] + argv)
@@ -0,0 +1,367 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+import lsst.utils.tests
+
+from pfs.datamodel import Identity, MaskHelper, PfsConfig, TargetType, FiberStatus, writeFitsMany
+from pfs.datamodel import resampleSpectra
+from pfs.datamodel.drp import PfsArm, PfsSingle
+
+display = None
+
+
+class PfsFiberArraySetTestCase(lsst.utils.tests.TestCase):
+    def setUp(self):
+        self.numSpectra = 20
+        self.length = 512
+        self.minWavelength = 600.0
+        self.maxWavelength = 900.0
+        rng = np.random.RandomState(12345)
+
+        self.identity = Identity(12345, "r", 1, 0x123456789abcdef)
+        self.fiberId = 2*np.arange(self.numSpectra, dtype=np.int32) + 3
+        self.wavelength = (np.linspace(self.minWavelength, self.maxWavelength, self.length)[np.newaxis, :] +
+                           rng.uniform(size=(self.numSpectra, 1))).astype(np.float32)
+        self.flux = rng.uniform(size=(self.numSpectra, self.length)).astype(np.float32)
+        self.mask = rng.choice([0, 1, 2, 4], size=(self.numSpectra, self.length)).astype(np.int32)
+        self.sky = rng.uniform(size=(self.numSpectra, self.length)).astype(np.float32)
+        self.covar = rng.uniform(size=(self.numSpectra, 3, self.length)).astype(np.float32)
+        self.flags = MaskHelper(BAD=0, SAT=1, NO_DATA=2)
+        self.metadata = dict(FOO=123, BAR=4.56)
+
+        self.spectra = PfsArm(self.identity, self.fiberId, self.wavelength, self.flux, self.mask, self.sky,
+                              self.covar, self.flags, self.metadata)
+
+        self.dirName = os.path.splitext(__file__)[0]
+        if not os.path.exists(self.dirName):
+            os.makedirs(self.dirName)
+        self.filename = os.path.join(self.dirName, PfsArm.getFilename(self.identity.getDict()))
+
+    def tearDown(self):
+        if os.path.exists(self.filename):
+            os.unlink(self.filename)
+
+    def assertSpectra(self, spectra, select=Ellipsis, pixels=slice(None)):
+        """Assert that the spectra match what we put in
+
+        Parameters
+        ----------
+        spectra : `pfs.datamodel.PfsFiberArraySet`
+            Spectra to check.
+        select : index, optional
+            Selection of spectra expected.
+        pixels : `slice`, optional
+            Selection of pixels expected.
+        """
+        self.assertEqual(spectra.identity.getDict(), self.identity.getDict())
+        self.assertFloatsEqual(spectra.fiberId, self.fiberId[select])
+        self.assertFloatsEqual(spectra.wavelength, self.wavelength[select][:, pixels])
+        self.assertFloatsEqual(spectra.flux, self.flux[select][:, pixels])
+        self.assertFloatsEqual(spectra.mask, self.mask[select][:, pixels])
+        self.assertFloatsEqual(spectra.sky, self.sky[select][:, pixels])
+        self.assertFloatsEqual(spectra.covar, self.covar[select][:, :, pixels])
+        self.assertDictEqual(spectra.flags.flags, self.flags.flags)
+        for key, value in self.metadata.items():
+            self.assertEqual(spectra.metadata[key], value)
+
+    def testIO(self):
+        """Test round-trip through FITS"""
+        self.spectra.writeFits(self.filename)
+        copy = PfsArm.readFits(self.filename)
+        self.assertSpectra(copy)
+
+    def testLazy(self):
+        """Test lazy (memory-mapped) read"""
+        self.spectra.writeFits(self.filename)
+        with PfsArm.readFits(self.filename, lazy=True) as copy:
+            self.assertIsNotNone(copy._fits)
+            self.assertSpectra(copy)
+        self.assertIsNone(copy._fits)
+
+    def testCompression(self):
+        """Test round-trip through tile-compressed FITS"""
+        self.spectra.writeFits(self.filename, compress=True)
+        self.assertSpectra(PfsArm.readFits(self.filename))
+        select = np.array([3, 1])
+        pixels = slice(10, 20)
+        self.assertSpectra(PfsArm.readFits(self.filename, fiberId=self.fiberId[select], pixels=pixels),
+                           select, pixels)
+
+        # Lossy compression of floating-point images: the integer images and wavelength are still lossless
+        self.wavelength += np.random.RandomState(54321).normal(scale=1.0e-3, size=self.wavelength.shape)
+        self.spectra.wavelength = self.wavelength
+        self.spectra.writeFits(self.filename, compress=True, quantizeLevel=4)
+        copy = PfsArm.readFits(self.filename)
+        self.assertFloatsEqual(copy.fiberId, self.fiberId)
+        self.assertFloatsEqual(copy.mask, self.mask)
+        self.assertFloatsEqual(copy.wavelength, self.wavelength)
+        self.assertFloatsAlmostEqual(copy.flux, self.flux, atol=0.1)
+
+    def testCompactMask(self):
+        """Test writing the mask with the narrowest integer type"""
+        import astropy.io.fits
+        self.spectra.writeFits(self.filename, compactMask=True)
+        with astropy.io.fits.open(self.filename) as fits:
+            self.assertEqual(fits["MASK"].data.dtype.itemsize, 1)
+        copy = PfsArm.readFits(self.filename)
+        self.assertEqual(copy.mask.dtype, np.int32)
+        self.assertSpectra(copy)
+
+        # The mask is widened on read, so there's room for mask planes that don't fit in the compact type
+        for ii in range(8 - len(copy.flags)):
+            copy.flags.add("UNUSED%d" % (ii,))
+        wavelength = np.linspace(self.minWavelength - 10, self.maxWavelength, 100)
+        resampled = resampleSpectra(copy, wavelength, noData="FOO")
+        self.assertEqual(resampled.flags["FOO"], 2**8)
+        self.assertEqual(resampled.mask.dtype, np.int32)
+        self.assertTrue(np.all(resampled.flags.select(resampled.mask[:, 0], "FOO")))
+
+    def testCompactMaskSignBit(self):
+        """Test compact masks using the top bit of a 16- or 32-bit integer"""
+        for high in (15, 31):
+            flags = MaskHelper(**{"PLANE%d" % (ii,): ii for ii in range(high + 1)})
+            mask = np.where(self.mask != 0, 2**high, 0) | self.mask
+            spectra = PfsArm(self.identity, self.fiberId, self.wavelength, self.flux, mask, self.sky,
+                             self.covar, flags, self.metadata)
+            spectra.writeFits(self.filename, compactMask=True)
+            copy = PfsArm.readFits(self.filename)
+            self.assertFloatsEqual(copy.mask, mask)
+
+            # Adding a plane above the top bit mustn't overflow, or pick up sign-extended bits
+            value = copy.flags.add("NEW")
+            self.assertEqual(value, 2**(high + 1))
+            self.assertFalse(np.any(copy.flags.select(copy.mask, "NEW")))
+            copy.mask |= value
+            self.assertTrue(np.all(copy.flags.select(copy.mask, "NEW")))
+            self.assertFloatsEqual(copy.mask & ~value, mask)
+
+    def testWavelengthModel(self):
+        """Test writing the wavelength as polynomial coefficients"""
+        import astropy.io.fits
+        self.spectra.writeFits(self.filename, wavelengthOrder=3)
+        with astropy.io.fits.open(self.filename) as fits:
+            self.assertEqual(fits["WAVELENGTH"].data.shape, (self.numSpectra, 4))
+        copy = PfsArm.readFits(self.filename)
+        self.assertIsNotNone(copy.wavelengthModel)
+        self.assertLessEqual(copy.wavelengthModel.maxResidual, 1.0e-4)
+        self.assertIsNone(copy._wavelength)  # Not generated until used
+        self.assertEqual(copy.wavelength.dtype, self.wavelength.dtype)
+        self.assertFloatsAlmostEqual(copy.wavelength, self.wavelength, atol=1.0e-4)
+        select = np.array([6, 2])
+        pixels = slice(30, 40)
+        subset = PfsArm.readFits(self.filename, fiberId=self.fiberId[select], pixels=pixels)
+        self.assertFloatsEqual(subset.wavelength, copy.wavelength[select, pixels])
+
+        # A common linear solution is stored once
+        self.spectra.wavelength = np.array(np.broadcast_to(self.wavelength[0], self.wavelength.shape))
+        self.spectra.writeFits(self.filename, wavelengthOrder=3)
+        copy = PfsArm.readFits(self.filename)
+        self.assertTrue(copy.wavelengthModel.isShared)
+        self.assertEqual(copy.wavelengthModel.order, 1)
+        self.assertFloatsAlmostEqual(copy.wavelength, self.spectra.wavelength, atol=1.0e-4)
+
+        # Residuals above the tolerance
+        self.spectra.wavelength = self.wavelength
+        with self.assertRaises(RuntimeError):
+            self.spectra.writeFits(self.filename, wavelengthOrder=3, wavelengthTolerance=1.0e-6)
+
+    def testWavelengthModelRoundTrip(self):
+        """Test that the wavelength solutions are only written on request"""
+        import astropy.io.fits
+        polyFilename = self.filename.replace(".fits", "-poly.fits")
+        self.spectra.writeFits(polyFilename, wavelengthOrder=3)
+        try:
+            original = PfsArm.readFits(polyFilename)
+            with astropy.io.fits.open(polyFilename) as fits:
+                coeffs = fits["WAVELENGTH"].data.copy()
+
+            # Not requested: the full image, as evaluated from the solutions
+            original.writeFits(self.filename)
+            with astropy.io.fits.open(self.filename) as fits:
+                self.assertNotIn("WLMODEL", fits["WAVELENGTH"].header)
+            copy = PfsArm.readFits(self.filename)
+            self.assertIsNone(copy.wavelengthModel)
+            self.assertFloatsEqual(copy.wavelength, original.wavelength)
+
+            # Requested: the same solutions, not refit
+            original.writeFits(self.filename, wavelengthOrder=3)
+            with astropy.io.fits.open(self.filename) as fits:
+                self.assertFloatsEqual(fits["WAVELENGTH"].data, coeffs)
+        finally:
+            os.unlink(polyFilename)
+
+    def testSubset(self):
+        """Test reading a subset of fibers and pixels"""
+        self.spectra.writeFits(self.filename)
+
+        # Non-contiguous, unordered fibers
+        select = np.array([7, 2, 3, 15])
+        copy = PfsArm.readFits(self.filename, fiberId=self.fiberId[select])
+        self.assertSpectra(copy, select)
+
+        # Contiguous fibers, with a pixel range
+        select = slice(4, 9)
+        pixels = slice(100, 200)
+        copy = PfsArm.readFits(self.filename, fiberId=self.fiberId[select], pixels=pixels)
+        self.assertSpectra(copy, select, pixels)
+
+        # Wavelength range
+        select = np.array([5])
+        minWavelength = 700.0
+        maxWavelength = 750.0
+        copy = PfsArm.readFits(self.filename, fiberId=self.fiberId[select],
+                               wavelengthRange=(minWavelength, maxWavelength))
+        indices = np.nonzero((self.wavelength[5] >= minWavelength) & (self.wavelength[5] <= maxWavelength))[0]
+        self.assertSpectra(copy, select, slice(indices[0], indices[-1] + 1))
+
+        with self.assertRaises(RuntimeError):
+            PfsArm.readFits(self.filename, fiberId=[12345])
+        with self.assertRaises(RuntimeError):
+            PfsArm.readFits(self.filename, wavelengthRange=(700, 750), pixels=slice(0, 10))
+        with self.assertRaises(RuntimeError):
+            PfsArm.readFits(self.filename, lazy=True, fiberId=self.fiberId[:2])
+
+    def testMerge(self):
+        """Test merging spectra, from memory and from file"""
+        half = self.numSpectra//2
+        first = PfsArm(self.identity, self.fiberId[:half], self.wavelength[:half],
+                       self.flux[:half], self.mask[:half], self.sky[:half],
+                       self.covar[:half], self.flags, self.metadata)
+        self.spectra.writeFits(self.filename)
+        second = PfsArm.readFits(self.filename, fiberId=self.fiberId[half:])
+        second.writeFits(self.filename)
+
+        for inputs in ([first, second], (ss for ss in [first, second]), [first, self.filename]):
+            merged = PfsArm.fromMerge(inputs, metadata=self.metadata)
+            self.assertSpectra(merged)
+            for attr in ("fiberId", "wavelength", "flux", "mask", "sky", "covar"):
+                self.assertEqual(getattr(merged, attr).dtype, getattr(self.spectra, attr).dtype, attr)
+
+        # Second half uses different bits for the same mask planes
+        flags = MaskHelper(SAT=0, NO_DATA=1, BAD=2)
+        mask = np.zeros_like(second.mask)
+        for name in self.flags:
+            mask[(second.mask & self.flags[name]) != 0] |= flags[name]
+        second = PfsArm(self.identity, second.fiberId, second.wavelength, second.flux, mask, second.sky,
+                        second.covar, flags, self.metadata)
+        with self.assertRaises(RuntimeError):
+            PfsArm.fromMerge([first, second])
+        for inputs in ([first, second], (ss for ss in [first, second])):
+            merged = PfsArm.fromMerge(inputs, metadata=self.metadata, remapMasks=True)
+            self.assertSpectra(merged)
+        with self.assertRaises(RuntimeError):
+            PfsArm.fromMerge(iter([]))
+
+    def testReadMany(self):
+        """Test reading many files in parallel"""
+        visits = [123, 456, 789]
+        identities = [dict(visit=vv, arm=self.identity.arm, spectrograph=self.identity.spectrograph) for
+                      vv in visits]
+        filenames = [os.path.join(self.dirName, PfsArm.getFilename(ident)) for ident in identities]
+        try:
+            for vv, ff in zip(visits, filenames):
+                self.spectra.identity = Identity(vv, self.identity.arm, self.identity.spectrograph,
+                                                 self.identity.pfsDesignId)
+                self.spectra.writeFits(ff)
+            spectraList = PfsArm.readMany(identities, self.dirName, workers=2)
+            with self.assertRaises(RuntimeError):
+                PfsArm.readMany(identities, self.dirName, workers=2, lazy=True)
+        finally:
+            for ff in filenames:
+                if os.path.exists(ff):
+                    os.unlink(ff)
+        self.assertEqual(len(spectraList), len(visits))
+        for vv, spectra in zip(visits, spectraList):
+            self.assertEqual(spectra.identity.visit, vv)
+            self.identity.visit = vv
+            self.assertSpectra(spectra)
+            self.assertTrue(spectra.flux.dtype.isnative)
+
+    def testWriteMany(self):
+        """Test writing many files in parallel"""
+        pfsConfig = self.makePfsConfig()
+        filenames = [os.path.join(self.dirName, "single-%d.fits" % ff) for ff in self.fiberId]
+        try:
+            stats = writeFitsMany(self.spectra.extractFibers(PfsSingle, pfsConfig), filenames, workers=3)
+            self.assertEqual(stats.filenames, filenames)
+            self.assertEqual(stats.numBytes, sum(os.path.getsize(ff) for ff in filenames))
+            for ii, ff in enumerate(filenames):
+                single = PfsSingle.readFits(ff)
+                self.assertFloatsEqual(single.flux, self.flux[ii])
+                self.assertFloatsEqual(single.mask, self.mask[ii])
+
+            with self.assertRaises(RuntimeError):
+                writeFitsMany(self.spectra.extractFibers(PfsSingle, pfsConfig), filenames[:-1], workers=3)
+        finally:
+            for ff in filenames:
+                if os.path.exists(ff):
+                    os.unlink(ff)
+
+    def makePfsConfig(self):
+        """Construct a PfsConfig to go with our spectra
+
+        The fibers are in a different order from the spectra, and there are
+        extra fibers.
+        """
+        num = self.numSpectra + 5
+        fiberId = np.concatenate((self.fiberId, 2*np.arange(5) + 100))[::-1]
+        rng = np.random.RandomState(54321)
+        return PfsConfig(self.identity.pfsDesignId, self.identity.visit, 12.3, 45.6, fiberId,
+                         rng.randint(10000, size=num), ["%d,%d" % (ii % 9, ii % 7) for ii in range(num)],
+                         rng.uniform(size=num), rng.uniform(size=num), rng.randint(10, size=num),
+                         rng.randint(2**40, size=num), np.full(num, TargetType.SCIENCE),
+                         np.full(num, FiberStatus.GOOD), [np.array([22.0, 23.0])]*num, [["g", "i"]]*num,
+                         rng.uniform(size=(num, 2)), rng.uniform(size=(num, 2)))
+
+    def testExtractFibers(self):
+        """Test extracting fibers into PfsSingle"""
+        pfsConfig = self.makePfsConfig()
+        fiberId = self.fiberId[[4, 0, 9]]
+        spectra = list(self.spectra.extractFibers(PfsSingle, pfsConfig, fiberId))
+        self.assertEqual(len(spectra), len(fiberId))
+        for ff, single in zip(fiberId, spectra):
+            ii = self.fiberId.tolist().index(ff)
+            jj = pfsConfig.fiberId.tolist().index(ff)
+            self.assertEqual(single.target.objId, pfsConfig.objId[jj])
+            self.assertEqual(single.target.patch, pfsConfig.patch[jj])
+            self.assertDictEqual(single.target.fiberMags, dict(g=22.0, i=23.0))
+            self.assertFloatsEqual(single.observations.fiberId, [ff])
+            self.assertFloatsEqual(single.observations.pfiCenter, pfsConfig.pfiCenter[jj:jj + 1])
+            self.assertFloatsEqual(single.flux, self.flux[ii])
+            self.assertFloatsEqual(single.covar, self.covar[ii])
+
+            # Single fiber extraction
+            other = self.spectra.extractFiber(PfsSingle, pfsConfig, ff)
+            self.assertEqual(other.target.objId, single.target.objId)
+            self.assertFloatsEqual(other.flux, single.flux)
+
+        # Covariances are not shared
+        spectra[0].covar[:] = 0.0
+        spectra[0].covar2[:] = 1.0
+        self.assertFloatsEqual(self.spectra.covar, self.covar)
+        self.assertFloatsEqual(spectra[1].covar2, 0.0)
+
+        self.assertEqual(len(list(self.spectra.extractFibers(PfsSingle, pfsConfig))), self.numSpectra)
+        with self.assertRaises(RuntimeError):
+            self.spectra.extractFibers(PfsSingle, pfsConfig, [100])  # Not in spectra
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    setup_module(sys.modules["__main__"])
+    from argparse import ArgumentParser
+    parser = ArgumentParser(__file__)
+    parser.add_argument("--display", help="Display backend")
+    args, argv = parser.parse_known_args()
+    display = args.display
+    unittest.main(failfast=True, argv=[__file__] + argv)
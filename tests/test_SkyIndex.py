@@ -0,0 +1,149 @@
+import os
+import sys
+import shutil
+import unittest
+
+import numpy as np
+
+import lsst.utils.tests
+
+from pfs.datamodel import PfsDesign, PfsConfig, SkyIndex, TargetType, FiberStatus
+
+display = None
+
+
+class SkyIndexTestCase(lsst.utils.tests.TestCase):
+    def setUp(self):
+        self.rng = np.random.RandomState(12345)
+        self.numFibers = 300
+        self.radius = 60.0  # arcsec
+        self.dirName = os.path.splitext(__file__)[0]
+        if os.path.exists(self.dirName):
+            shutil.rmtree(self.dirName)
+        os.makedirs(self.dirName)
+
+    def tearDown(self):
+        shutil.rmtree(self.dirName)
+
+    def makeDesign(self, pfsDesignId, raBoresight, decBoresight, visit0=None):
+        """Construct a design (or config) with fibers around the boresight
+
+        Fibers are scattered within a degree of the boresight (which may be
+        near RA=0 or the pole, to exercise the edge cases), and the last
+        fiber has no position.
+        """
+        num = self.numFibers
+        fiberId = np.arange(1, num + 1, dtype=int)
+        dec = np.clip(decBoresight + self.rng.uniform(-1.0, 1.0, num), -90.0, 90.0)
+        ra = (raBoresight + self.rng.uniform(-1.0, 1.0, num)) % 360.0
+        ra[-1] = np.nan
+        dec[-1] = np.nan
+        args = (fiberId, np.zeros(num, dtype=int), ["0,0"]*num, ra, dec, np.zeros(num, dtype=int),
+                np.arange(num, dtype=int), np.full(num, int(TargetType.SCIENCE)),
+                np.full(num, int(FiberStatus.GOOD)), [[]]*num, [[]]*num)
+        if visit0 is None:
+            return PfsDesign(pfsDesignId, raBoresight, decBoresight, *args, np.zeros((num, 2)))
+        return PfsConfig(pfsDesignId, visit0, raBoresight, decBoresight, *args, np.zeros((num, 2)),
+                         np.zeros((num, 2)))
+
+    def bruteForce(self, designs, ra, dec, radius):
+        """Find matches by comparing every query with every fiber
+
+        Returns a set of (index, pfsDesignId, visit0, fiberId).
+        """
+        matches = set()
+        for design in designs:
+            ra1, dec1 = np.radians(ra)[:, np.newaxis], np.radians(dec)[:, np.newaxis]
+            ra2, dec2 = np.radians(design.ra), np.radians(design.dec)
+            cosSep = np.sin(dec1)*np.sin(dec2) + np.cos(dec1)*np.cos(dec2)*np.cos(ra1 - ra2)
+            with np.errstate(invalid="ignore"):
+                separation = 3600.0*np.degrees(np.arccos(np.clip(cosSep, -1.0, 1.0)))
+            visit0 = getattr(design, "visit0", -1)
+            for ii, jj in zip(*np.nonzero(separation < radius)):
+                matches.add((ii, design.pfsDesignId, visit0, design.fiberId[jj]))
+        return matches
+
+    def assertMatches(self, index, designs):
+        """Check that cross-matching agrees with brute force"""
+        choice = self.rng.randint(len(designs), size=200)
+        ra = np.array([designs[cc].raBoresight for cc in choice]) + self.rng.uniform(-1.0, 1.0, len(choice))
+        dec = np.clip(np.array([designs[cc].decBoresight for cc in choice]) +
+                      self.rng.uniform(-1.0, 1.0, len(choice)), -90.0, 90.0)
+        matches = index.crossMatch(ra, dec, self.radius)
+        self.assertGreater(len(matches), 0)
+        self.assertTrue(np.all(matches.separation <= self.radius))
+        self.assertTrue(np.all(np.diff(matches.index) >= 0))
+        self.assertSetEqual(set(zip(matches.index.tolist(), matches.pfsDesignId.tolist(),
+                                    matches.visit0.tolist(), matches.fiberId.tolist())),
+                            self.bruteForce(designs, ra, dec, self.radius))
+
+    def testCrossMatch(self):
+        """Test cross-matching and cone searches, including RA wrapping and the pole"""
+        designs = [self.makeDesign(1, 0.2, 10.0), self.makeDesign(2, 359.9, -30.0),
+                   self.makeDesign(3, 150.0, 89.5), self.makeDesign(3, 150.0, 89.5, visit0=123),
+                   self.makeDesign(0xfedcba9876543210, 150.3, 0.0)]
+        index = SkyIndex()
+        for design in designs:
+            index.add(design)
+        self.assertEqual(len(index), len(designs)*(self.numFibers - 1))
+        self.assertMatches(index, designs)
+
+        design = designs[-1]
+        cone = index.coneSearch(design.ra[5], design.dec[5], 0.1)
+        self.assertEqual(len(cone), 1)
+        self.assertEqual(cone.pfsDesignId[0], design.pfsDesignId)
+        self.assertEqual(cone.fiberId[0], design.fiberId[5])
+        self.assertFloatsAlmostEqual(cone.separation[0], 0.0, atol=1.0e-6)
+
+        # Replacing a design
+        designs[0] = self.makeDesign(1, 200.0, 10.0)
+        index.add(designs[0])
+        self.assertEqual(len(index), len(designs)*(self.numFibers - 1))
+        self.assertMatches(index, designs)
+
+    def testFiles(self):
+        """Test incremental indexing of files, and persistence"""
+        designs = [self.makeDesign(1, 10.0, 10.0), self.makeDesign(2, 20.0, 20.0, visit0=456)]
+        filenames = []
+        for design in designs:
+            design.write(self.dirName)
+            filenames.append(os.path.join(self.dirName, design.filename))
+
+        index = SkyIndex()
+        self.assertEqual(index.addFiles(filenames), 2)
+        self.assertIn((1, -1), index)
+        self.assertIn((2, 456), index)
+        self.assertMatches(index, designs)
+
+        filename = os.path.join(self.dirName, "skyIndex.fits")
+        index.writeFits(filename)
+        copy = SkyIndex.readFits(filename)
+        self.assertEqual(len(copy), len(index))
+        self.assertMatches(copy, designs)
+
+        designs.append(self.makeDesign(3, 30.0, 30.0))
+        designs[-1].write(self.dirName)
+        filenames.append(os.path.join(self.dirName, designs[-1].filename))
+        self.assertEqual(copy.addFiles(filenames), 1)  # Only the new file is read
+        self.assertMatches(copy, designs)
+
+        with self.assertRaises(RuntimeError):
+            copy.addFile(filename)
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    setup_module(sys.modules["__main__"])
+    from argparse import ArgumentParser
+    parser = ArgumentParser(__file__)
+    parser.add_argument("--display", help="Display backend")
+    args, argv = parser.parse_known_args()
+    display = args.display
+    unittest.main(failfast=True, argv=[__file__] + argv)
@@ -0,0 +1,185 @@
+import os
+import sys
+import shutil
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import lsst.utils.tests
+
+from pfs.datamodel import Target, TargetType, Observations, MaskHelper, SpectrumArchive
+from pfs.datamodel.wavelengthArray import WavelengthArray
+from pfs.datamodel.drp import PfsSingle, PfsObject
+
+display = None
+
+
+def makeSpectrum(FiberArrayClass, objId, visits, length=100, seed=0):
+    """Construct a spectrum
+
+    Parameters
+    ----------
+    FiberArrayClass : `type`
+        Class of spectrum to construct.
+    objId : `int`
+        Object identifier.
+    visits : iterable of `int`
+        Visits contributing to the spectrum.
+    length : `int`, optional
+        Number of pixels.
+    seed : `int`, optional
+        Random number seed.
+
+    Returns
+    -------
+    spectrum : ``FiberArrayClass``
+        Spectrum.
+    """
+    rng = np.random.RandomState(seed)
+    num = len(visits)
+    target = Target(1, 2, "3,4", objId, 10.0, 20.0, TargetType.SCIENCE, {"g": 22.0})
+    observations = Observations(np.array(visits), ["r"]*num, np.ones(num, dtype=int),
+                                np.full(num, 0x1234), np.arange(num) + 5, rng.uniform(size=(num, 2)),
+                                rng.uniform(size=(num, 2)))
+    covar = rng.uniform(size=(3, length)).astype(np.float32)
+    return FiberArrayClass(target, observations, WavelengthArray(600.0, 900.0, length),
+                           rng.uniform(size=length).astype(np.float32), rng.randint(4, size=length),
+                           rng.uniform(size=length).astype(np.float32), covar,
+                           np.zeros((1, 1), dtype=np.float32), MaskHelper(BAD=0, CR=1), dict(FOO=seed))
+
+
+def appendSpectra(archive, objIds):
+    """Append PfsSingle spectra to the archive, in a worker process"""
+    archive.appendMany(makeSpectrum(PfsSingle, objId, [7], seed=objId) for objId in objIds)
+    archive.close()
+    return len(objIds)
+
+
+class SpectrumArchiveTestCase(lsst.utils.tests.TestCase):
+    def setUp(self):
+        self.dirName = os.path.splitext(__file__)[0]
+        if os.path.exists(self.dirName):
+            shutil.rmtree(self.dirName)
+
+    def tearDown(self):
+        if os.path.exists(self.dirName):
+            shutil.rmtree(self.dirName)
+
+    def assertSpectrum(self, spectrum, expect):
+        """Assert that spectra are equal"""
+        self.assertEqual(type(spectrum), type(expect))
+        self.assertEqual(spectrum.target.identity, expect.target.identity)
+        self.assertFloatsEqual(spectrum.observations.visit, expect.observations.visit)
+        for attr in ("wavelength", "flux", "mask", "sky", "covar"):
+            self.assertFloatsEqual(getattr(spectrum, attr), getattr(expect, attr))
+
+    def testArchive(self):
+        """Test round-trip through an archive"""
+        objIds = [1, 2, 2**63 + 5]
+        singles = [makeSpectrum(PfsSingle, objId, [123], seed=ii) for ii, objId in enumerate(objIds)]
+        coadd = makeSpectrum(PfsObject, objIds[0], [123, 456], seed=10)
+        with SpectrumArchive(self.dirName, chunkSize=20000) as archive:
+            archive.appendMany(singles)
+            archive.append(coadd)
+            self.assertEqual(len(archive), 4)
+            with self.assertRaises(RuntimeError):
+                archive.append(singles[0])
+
+            # Duplicates within a batch are rejected, and nothing from the batch is added
+            duplicates = [makeSpectrum(PfsSingle, 5, [123], seed=seed) for seed in (1, 2)]
+            with self.assertRaises(RuntimeError):
+                archive.appendMany(duplicates)
+            self.assertEqual(len(archive), 4)
+            archive.appendMany(duplicates, overwrite=True)
+            self.assertEqual(len(archive), 5)
+            self.assertSpectrum(archive.read(duplicates[0].getIdentity()), duplicates[1])
+
+            identity = dict(singles[2].target.identity, visit=123)
+            self.assertIn(identity, archive)
+            self.assertSpectrum(archive.read(identity), singles[2])
+            self.assertSpectrum(archive.read(coadd.getIdentity()), coadd)
+            with self.assertRaises(RuntimeError):
+                archive.read(singles[0].target.identity)  # Ambiguous: both single and coadd
+            self.assertSpectrum(archive.read(singles[0].target.identity, PfsObject), coadd)
+            self.assertEqual(len(archive.query(objId=objIds[0])), 2)
+            self.assertEqual(sorted(ii["objId"] for ii in archive.query(className="PfsSingle")),
+                             sorted(objIds + [5]))
+
+            # Verbatim extraction matches writeFits
+            filename = os.path.join(self.dirName, "coadd.fits")
+            expected = os.path.join(self.dirName, "expected.fits")
+            archive.extract(coadd.getIdentity(), filename)
+            coadd.writeFits(expected)
+            with open(filename, "rb") as fd1, open(expected, "rb") as fd2:
+                self.assertEqual(fd1.read(), fd2.read())
+
+            # Verbatim ingest
+            archive.appendFile(expected, PfsObject, overwrite=True)
+            self.assertEqual(len(archive), 5)
+            self.assertSpectrum(archive.read(coadd.getIdentity()), coadd)
+
+        # Reopen
+        with SpectrumArchive(self.dirName) as archive:
+            self.assertEqual(len(archive), 5)
+            self.assertSpectrum(archive.read(dict(singles[1].target.identity, visit=123)), singles[1])
+
+    def chunkSizes(self):
+        """Return the total size of the chunk files"""
+        return sum(os.path.getsize(os.path.join(self.dirName, filename)) for
+                   filename in os.listdir(self.dirName) if filename.startswith("chunk-"))
+
+    def testCompact(self):
+        """Test that unused data is discarded or reclaimed"""
+        spectra = [makeSpectrum(PfsSingle, objId, [123], seed=objId) for objId in range(4)]
+        with SpectrumArchive(self.dirName, chunkSize=20000) as archive:
+            archive.appendMany(spectra)
+            size = self.chunkSizes()
+
+            # A failed addition leaves nothing behind
+            with self.assertRaises(RuntimeError):
+                archive.appendMany([makeSpectrum(PfsSingle, 10, [123]), spectra[1]])
+            self.assertEqual(self.chunkSizes(), size)
+            self.assertEqual(len(archive), len(spectra))
+
+            # Replacements leave the old data until compacted
+            replacements = [makeSpectrum(PfsSingle, objId, [123], seed=objId + 100) for objId in (0, 2)]
+            archive.appendMany(replacements, overwrite=True)
+            self.assertGreater(self.chunkSizes(), size)
+            self.assertGreater(archive.compact(), 0)
+            self.assertEqual(self.chunkSizes(), size)
+            self.assertEqual(archive.compact(), 0)
+            for expect in (replacements[0], spectra[1], replacements[1], spectra[3]):
+                self.assertSpectrum(archive.read(expect.getIdentity()), expect)
+            archive.append(makeSpectrum(PfsSingle, 10, [123]))
+            self.assertEqual(len(archive), len(spectra) + 1)
+
+    def testMultipleWriters(self):
+        """Test appending from multiple processes"""
+        archive = SpectrumArchive(self.dirName)
+        objIds = [list(range(10)), list(range(10, 25)), list(range(25, 30))]
+        with ProcessPoolExecutor(2) as executor:
+            self.assertEqual(sum(executor.map(appendSpectra, [archive]*len(objIds), objIds)), 30)
+        self.assertEqual(len(archive), 30)
+        for objId in (0, 17, 29):
+            spectrum = archive.read(dict(catId=1, tract=2, patch="3,4", objId=objId, visit=7))
+            self.assertSpectrum(spectrum, makeSpectrum(PfsSingle, objId, [7], seed=objId))
+        archive.close()
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    setup_module(sys.modules["__main__"])
+    from argparse import ArgumentParser
+    parser = ArgumentParser(__file__)
+    parser.add_argument("--display", help="Display backend")
+    args, argv = parser.parse_known_args()
+    display = args.display
+    unittest.main(failfast=True, argv=[__file__] + argv)
@@ -1,4 +1,5 @@
 import sys
+import pickle
 import unittest
 
 import numpy as np
@@ -58,6 +59,48 @@ class WavelengthArrayTestCase(lsst.utils.tests.TestCase):
             self.assertFloatsAlmostEqual(wlArray[ii], wcs.pixel_to_world(ii + 1).to(astropy.units.nm).value,
                                          atol=1.0e-4)
 
+    def testPickle(self):
+        """Test pickling, including of arrays that differ from the construction parameters"""
+        wlArray = WavelengthArray(600, 900, 50)
+        copy = pickle.loads(pickle.dumps(wlArray))
+        self.assertEqual(type(copy), WavelengthArray)
+        self.assertFloatsEqual(copy, wlArray)
+
+        for array in (wlArray[10:20], wlArray[::-1], wlArray.copy()*2):
+            copy = pickle.loads(pickle.dumps(array))
+            self.assertEqual(type(copy), np.ndarray)
+            self.assertFloatsEqual(copy, array)
+
+    def testHeaderParsing(self):
+        """Test parsing headers directly, and falling back to astropy.wcs"""
+        size = 50
+        wlArray = WavelengthArray(600, 900, size)
+        self.assertIs(WavelengthArray.fromFitsHeader(wlArray.toFitsHeader(), size),
+                      WavelengthArray.fromFitsHeader(wlArray.toFitsHeader(), size))
+
+        # Header written by astropy.wcs, in different units, and with a WCS that requires astropy.wcs
+        wcs = astropy.wcs.WCS(wlArray.toFitsHeader())
+        headers = [wcs.to_header()]
+        header = wlArray.toFitsHeader()
+        header["CUNIT1"] = "Angstrom"
+        header["CRVAL1"] *= 10
+        header["CDELT1"] *= 10
+        headers.append(header)
+        header = wlArray.toFitsHeader()
+        header["PC1_1"] = 0.5
+        header["CDELT1"] *= 2
+        headers.append(header)
+        for header in headers:
+            copy = WavelengthArray.fromFitsHeader(header, size)
+            self.assertFloatsAlmostEqual(copy, wlArray, atol=1.0e-4)
+            self.assertFloatsAlmostEqual(copy.minWavelength, 600.0, atol=1.0e-9)
+            self.assertFloatsAlmostEqual(copy.maxWavelength, 900.0, atol=1.0e-9)
+
+        header = wlArray.toFitsHeader()
+        del header["CTYPE1"]
+        with self.assertRaises(RuntimeError):
+            WavelengthArray.fromFitsHeader(header, size)
+
 
 class TestMemory(lsst.utils.tests.MemoryTestCase):
     pass
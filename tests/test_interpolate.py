@@ -0,0 +1,107 @@
+import sys
+import unittest
+
+import numpy as np
+
+import lsst.utils.tests
+
+from pfs.datamodel import Identity, MaskHelper
+from pfs.datamodel.wavelengthArray import WavelengthArray
+from pfs.datamodel import interpolateFlux, interpolateMask, interpolateCovariance
+from pfs.datamodel.drp import PfsArm, PfsMerged
+
+display = None
+
+
+class InterpolateTestCase(lsst.utils.tests.TestCase):
+    def setUp(self):
+        self.numSpectra = 7
+        self.length = 200
+        rng = np.random.RandomState(12345)
+        # Irregular, increasing wavelength arrays that differ between fibers
+        steps = rng.uniform(0.5, 1.5, size=(self.numSpectra, self.length))
+        self.wavelength = 600.0 + np.cumsum(steps, axis=1) + rng.uniform(0, 20, size=(self.numSpectra, 1))
+        self.flux = rng.normal(size=(self.numSpectra, self.length))
+        self.mask = rng.choice([0, 1, 2], p=[0.9, 0.05, 0.05], size=(self.numSpectra, self.length))
+        self.covar = np.zeros((self.numSpectra, 3, self.length))
+        self.covar[:, 0] = rng.uniform(1.0, 2.0, size=(self.numSpectra, self.length))
+        self.covar[:, 1, :-1] = rng.uniform(-0.3, 0.3, size=(self.numSpectra, self.length - 1))
+        self.covar[:, 2, :-2] = rng.uniform(-0.1, 0.1, size=(self.numSpectra, self.length - 2))
+        self.target = WavelengthArray(590.0, 860.0, 321, dtype=float)
+
+    def testFlux(self):
+        """Test that flux interpolation matches numpy.interp"""
+        flux = interpolateFlux(self.wavelength, self.flux, self.target, fill=np.nan)
+        for ii in range(self.numSpectra):
+            expect = np.interp(self.target, self.wavelength[ii], self.flux[ii], left=np.nan, right=np.nan)
+            self.assertFloatsAlmostEqual(flux[ii], expect, atol=1.0e-12, ignoreNaNs=True)
+        self.assertFloatsAlmostEqual(interpolateFlux(self.wavelength[0], self.flux[0], self.target, np.nan),
+                                     flux[0], atol=0.0, ignoreNaNs=True)
+
+    def testMask(self):
+        """Test that mask interpolation ORs the contributing pixels"""
+        mask = interpolateMask(self.wavelength, self.mask, self.target, fill=4)
+        for ii in range(self.numSpectra):
+            for jj, wl in enumerate(self.target):
+                if wl < self.wavelength[ii, 0] or wl > self.wavelength[ii, -1]:
+                    self.assertEqual(mask[ii, jj], 4)
+                    continue
+                index = np.searchsorted(self.wavelength[ii], wl)
+                expect = self.mask[ii, index]
+                if self.wavelength[ii, index] != wl:
+                    expect |= self.mask[ii, index - 1]
+                self.assertEqual(mask[ii, jj], expect)
+
+    def testCovariance(self):
+        """Test propagation of covariance against the dense calculation"""
+        covar = interpolateCovariance(self.wavelength, self.covar, self.target)
+        for ii in range(self.numSpectra):
+            # Interpolation matrix: interpolate each unit vector
+            weights = np.array([np.interp(self.target, self.wavelength[ii], unit, left=0, right=0) for
+                                unit in np.eye(self.length)]).T
+            dense = np.zeros((self.length, self.length))
+            for band in range(3):
+                dense += np.diag(self.covar[ii, band, :self.length - band], band)
+                if band > 0:
+                    dense += np.diag(self.covar[ii, band, :self.length - band], -band)
+            expect = weights @ dense @ weights.T
+            for band in range(3):
+                self.assertFloatsAlmostEqual(covar[ii, band, :len(self.target) - band],
+                                             np.diagonal(expect, band), atol=1.0e-12)
+
+    def testResample(self):
+        """Test resampling a PfsFiberArraySet"""
+        spectra = PfsArm(Identity(12345, "r", 1, 0x123456789abcdef), np.arange(self.numSpectra),
+                         self.wavelength, self.flux.astype(np.float32), self.mask.astype(np.int32),
+                         self.flux[::-1].astype(np.float32), self.covar.astype(np.float32),
+                         MaskHelper(BAD=0, SAT=1), dict(FOO=1))
+        resampled = spectra.resample(self.target, PfsMerged)
+        self.assertIsInstance(resampled, PfsMerged)
+        self.assertEqual(resampled.flux.dtype, np.float32)
+        self.assertFloatsEqual(resampled.wavelength, np.broadcast_to(self.target, resampled.wavelength.shape))
+        noData = resampled.flags["NO_DATA"]
+        self.assertFloatsEqual(resampled.flux,
+                               interpolateFlux(self.wavelength, spectra.flux, self.target).astype(np.float32))
+        self.assertFloatsEqual(resampled.sky,
+                               interpolateFlux(self.wavelength, spectra.sky, self.target).astype(np.float32))
+        self.assertFloatsEqual(resampled.mask, interpolateMask(self.wavelength, spectra.mask, self.target,
+                                                               noData))
+        self.assertNotIn("NO_DATA", spectra.flags)
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    setup_module(sys.modules["__main__"])
+    from argparse import ArgumentParser
+    parser = ArgumentParser(__file__)
+    parser.add_argument("--display", help="Display backend")
+    args, argv = parser.parse_known_args()
+    display = args.display
+    unittest.main(failfast=True, argv=[__file__] + argv)
@@ -0,0 +1,89 @@
+import os
+import sys
+import shutil
+import unittest
+
+import numpy as np
+
+import lsst.utils.tests
+
+from pfs.datamodel import Identity, Target, TargetType, Observations, MaskHelper, readMetadataMany
+from pfs.datamodel.wavelengthArray import WavelengthArray
+from pfs.datamodel.drp import PfsArm, PfsObject
+
+display = None
+
+
+class ReadMetadataTestCase(lsst.utils.tests.TestCase):
+    def setUp(self):
+        self.dirName = os.path.splitext(__file__)[0]
+        os.makedirs(self.dirName, exist_ok=True)
+        self.length = 1000
+        self.flags = MaskHelper(BAD=0, CR=3)
+        rng = np.random.RandomState(12345)
+
+        numSpectra = 10
+        self.identity = Identity(12345, "r", 1, 0x123456789abcdef)
+        self.arm = PfsArm(self.identity, np.arange(numSpectra), rng.uniform(size=(numSpectra, self.length)),
+                          rng.uniform(size=(numSpectra, self.length)), np.zeros((numSpectra, self.length)),
+                          rng.uniform(size=(numSpectra, self.length)),
+                          rng.uniform(size=(numSpectra, 3, self.length)), self.flags, dict(FOO=123))
+
+        self.objects = []
+        for ii in range(5):
+            target = Target(1, 2, "3,4", 1000 + ii, 10.0 + ii, 20.0, TargetType.SCIENCE, {"g": 22.0 + ii})
+            observations = Observations(np.array([100, 200 + ii]), ["r", "b"], np.array([1, 2]),
+                                        np.array([5, 6]), np.array([7, 8]), rng.uniform(size=(2, 2)),
+                                        rng.uniform(size=(2, 2)))
+            self.objects.append(PfsObject(target, observations, WavelengthArray(600.0, 900.0, self.length),
+                                          rng.uniform(size=self.length), np.zeros(self.length, dtype=int),
+                                          rng.uniform(size=self.length), rng.uniform(size=(3, self.length)),
+                                          np.zeros((10, 10)), self.flags))
+
+    def tearDown(self):
+        shutil.rmtree(self.dirName)
+
+    def testReadMetadata(self):
+        """Test reading metadata from many files"""
+        filenames = [os.path.join(self.dirName, "arm.fits")]
+        self.arm.writeFits(filenames[0], compress=True)
+        for ii, obj in enumerate(self.objects):
+            filenames.append(os.path.join(self.dirName, "object-%d.fits" % (ii,)))
+            obj.writeFits(filenames[-1])
+
+        for workers in (1, 2):
+            results = readMetadataMany(filenames, workers=workers)
+            self.assertEqual([rr.filename for rr in results], filenames)
+
+            arm = results[0]
+            self.assertEqual(arm.identity.getDict(), self.identity.getDict())
+            self.assertIsNone(arm.target)
+            self.assertIsNone(arm.observations)
+            self.assertEqual(arm.flags.flags, self.flags.flags)
+            self.assertEqual(arm.metadata["FOO"], 123)
+
+            for obj, rr in zip(self.objects, results[1:]):
+                self.assertIsNone(rr.identity)
+                self.assertEqual(rr.target.identity, obj.target.identity)
+                self.assertEqual(rr.target.fiberMags, obj.target.fiberMags)
+                self.assertFloatsEqual(rr.observations.visit, obj.observations.visit)
+                self.assertEqual(list(rr.observations.arm), obj.observations.arm)
+                self.assertEqual(rr.flags.flags, self.flags.flags)
+
+
+class TestMemory(lsst.utils.tests.MemoryTestCase):
+    pass
+
+
+def setup_module(module):
+    lsst.utils.tests.init()
+
+
+if __name__ == "__main__":
+    setup_module(sys.modules["__main__"])
+    from argparse import ArgumentParser
+    parser = ArgumentParser(__file__)
+    parser.add_argument("--display", help="Display backend")
+    args, argv = parser.parse_known_args()
+    display = args.display
+    unittest.main(failfast=True, argv=[__file__] + argv)